@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import duckdb
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(REPO_ROOT))
+
+from smoke_db import SMOKE_QUERIES
+from ui.db import resolve_db_path, run_sql
+from ui.quick_queries import QUICK_QUERIES
+from ui.rollups import route_to_rollup
+from ui.tracing import profile_metrics
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DB_PATH = REPO_ROOT / "data" / "duckdb" / "bank_txn_analytics.duckdb"
+TABLES = ["Customers_Bank", "Cards_Master", "Merchants_Master", "Transactions_Bank"]
+
+WORKLOADS = {
+    "smoke": list(SMOKE_QUERIES),
+    "quick": list(QUICK_QUERIES.items()),
+}
+
+# compare: a query regresses when its p95 grows by more than --threshold
+# (relative) AND more than MIN_DELTA_MS, so sub-millisecond noise is ignored.
+MIN_DELTA_MS = 5.0
+
+
+def percentile(samples: list[float], q: float) -> float:
+    """Linear-interpolated percentile, q in [0, 100]."""
+    xs = sorted(samples)
+    if len(xs) == 1:
+        return xs[0]
+    pos = (len(xs) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (pos - lo)
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def bench_query(con: duckdb.DuckDBPyConnection, sql: str, iterations: int, warmup: int, use_rollups: bool) -> dict:
+    routed, rollup = route_to_rollup(con, sql) if use_rollups else (sql, None)
+    metrics = profile_metrics(con, routed)
+
+    for _ in range(warmup):
+        run_sql(con, sql, use_rollups=use_rollups, cache=None)
+    samples = []
+    rows = 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        rows = len(run_sql(con, sql, use_rollups=use_rollups, cache=None))
+        samples.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        "mean_ms": round(sum(samples) / len(samples), 3),
+        "rows_returned": rows,
+        "rows_scanned": metrics.get("rows_scanned"),
+        "peak_buffer_mb": round((metrics.get("peak_buffer_bytes") or 0) / 2**20, 1),
+        "rollup": rollup,
+    }
+
+
+def run(db_path: str, workloads: list[str], iterations: int, warmup: int, use_rollups: bool) -> dict:
+    con = duckdb.connect(db_path, read_only=True)
+    try:
+        counts = {t: con.execute(f"SELECT COUNT(*) FROM bank.{t}").fetchone()[0] for t in TABLES}
+        queries = {}
+        for workload in workloads:
+            for name, sql in WORKLOADS[workload]:
+                key = f"{workload}/{name}"
+                queries[key] = bench_query(con, sql.strip(), iterations, warmup, use_rollups)
+                q = queries[key]
+                print(
+                    f"{key}: p50 {q['p50_ms']:.1f} ms, p95 {q['p95_ms']:.1f} ms, p99 {q['p99_ms']:.1f} ms, "
+                    f"{q['rows_scanned'] or 0:,} rows scanned",
+                    flush=True,
+                )
+    finally:
+        con.close()
+
+    return {
+        "meta": {
+            "db": db_path,
+            "row_counts": counts,
+            "duckdb": duckdb.__version__,
+            "python": platform.python_version(),
+            "machine": f"{platform.system()} {platform.machine()} ({os.cpu_count()} cpus)",
+            "iterations": iterations,
+            "warmup": warmup,
+            "rollups": use_rollups,
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        },
+        "peak_rss_mb": peak_rss_mb(),
+        "queries": queries,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """Returns one line per regression of `current` against `baseline`."""
+    problems = []
+    for key, q in current["queries"].items():
+        base = baseline["queries"].get(key)
+        if base is None:
+            continue
+        delta = q["p95_ms"] - base["p95_ms"]
+        if delta > MIN_DELTA_MS and q["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            problems.append(f"{key}: p95 {base['p95_ms']:.1f} -> {q['p95_ms']:.1f} ms")
+        if (q["rows_scanned"] or 0) > (base["rows_scanned"] or 0) * (1 + threshold):
+            problems.append(f"{key}: rows scanned {base['rows_scanned']:,} -> {q['rows_scanned']:,}")
+    base_rss, rss = baseline.get("peak_rss_mb"), current.get("peak_rss_mb")
+    if base_rss and rss and rss > base_rss * (1 + threshold):
+        problems.append(f"peak RSS {base_rss:.0f} -> {rss:.0f} MB")
+    if baseline["meta"].get("row_counts") != current["meta"].get("row_counts"):
+        print("WARNING: baseline was recorded on a database with different row counts")
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Time the smoke and quick-query workloads and record/compare a JSON baseline."
+    )
+    parser.add_argument(
+        "--db",
+        default=os.getenv("DUCKDB_PATH", str(DB_PATH)),
+        help="database to benchmark (default: DUCKDB_PATH or the published snapshot)",
+    )
+    parser.add_argument("--workload", nargs="+", choices=list(WORKLOADS), default=list(WORKLOADS))
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument(
+        "--rollups",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="route aggregates to rollup tables as the app does",
+    )
+    parser.add_argument("--out", type=Path, default=None, help="write the results as JSON here")
+    parser.add_argument("--compare", type=Path, default=None, help="baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown (default 0.2)")
+    args = parser.parse_args()
+
+    version, db_path = resolve_db_path(args.db)
+    if not Path(db_path).exists():
+        print(f"ERROR: DB file not found: {db_path}")
+        return 2
+    print(f"DB: {db_path} (snapshot: {version})")
+
+    result = run(db_path, args.workload, max(1, args.iterations), max(0, args.warmup), args.rollups)
+    print(f"Peak RSS: {result['peak_rss_mb']} MB")
+
+    if args.out is not None:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+        print("Wrote", args.out)
+
+    if args.compare is not None:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        problems = compare(result, baseline, args.threshold)
+        if problems:
+            print(f"REGRESSIONS against {args.compare}:")
+            for line in problems:
+                print("-", line)
+            return 1
+        print(f"OK: no regressions against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
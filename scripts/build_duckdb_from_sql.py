@@ -1,10 +1,26 @@
 ﻿from __future__ import annotations
 
+import argparse
+import codecs
+import hashlib
+import json
+import os
 import re
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from datetime import datetime, timezone
+from typing import Callable, Iterator, Optional
+import sys
+
 import duckdb
+import pyarrow as pa
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(REPO_ROOT))
+
+from ui.rollups import ROLLUPS, rollup_create_sql
 
 SQL_DIR = REPO_ROOT / "data" / "raw" / "bank_txn_analytics_sql"
 SQL_CREATE = SQL_DIR / "Create_Tables.sql"
@@ -12,9 +28,24 @@ SQL_INSERT = SQL_DIR / "Insert_Table.sql"
 
 OUT_DB = REPO_ROOT / "data" / "duckdb" / "bank_txn_analytics.duckdb"
 SCHEMA = "bank"
+VIEW = "v_transactions_enriched"
+# Physical copy of the view (--materialize), clustered on (TransactionDate, TransactionID)
+ENRICHED_TABLE = "t_transactions_enriched"
+FACT_TABLE = "Transactions_Bank"
 
-def read_text(p: Path) -> str:
-    return p.read_text(encoding="utf-8", errors="ignore").replace("\ufeff", "")
+# Streaming loader knobs: bytes read per chunk, rows buffered per table before a
+# bulk insert, and seconds between progress lines.
+CHUNK_SIZE = 1 << 20
+BATCH_ROWS = 100_000
+PROGRESS_EVERY = 5.0
+
+# Snapshots: every build writes snapshots/<stem>-<version>.duckdb and then
+# publishes it by atomically replacing the <stem>.current pointer file, which
+# ui.db follows. Old snapshots are deleted once no reader holds a fresh lease.
+SNAPSHOT_DIR = OUT_DB.parent / "snapshots"
+POINTER = OUT_DB.with_suffix(".current")
+KEEP_SNAPSHOTS = 2
+LEASE_TTL = 3600.0
 
 def normalize_sql(sql: str) -> str:
     # Remove SQL Server-ish inline FK syntax like: CustomerID INT FOREIGN KEY REFERENCES Customers_Bank(CustomerID)
@@ -33,38 +64,324 @@ def normalize_sql(sql: str) -> str:
 
     return sql
 
-def split_statements(sql: str) -> list[str]:
-    # split on semicolons
-    parts = [s.strip() for s in sql.split(";")]
-    return [p for p in parts if p]
+# Characters that can change tokenizer state: statement end, quotes and comment starts.
+_SPECIAL_RE = re.compile(r"[;'\"\[\-/]")
 
-def main() -> None:
-    if not SQL_CREATE.exists():
-        raise FileNotFoundError(f"Missing: {SQL_CREATE}")
-    if not SQL_INSERT.exists():
-        raise FileNotFoundError(f"Missing: {SQL_INSERT}")
 
-    OUT_DB.parent.mkdir(parents=True, exist_ok=True)
+def iter_statements(
+    path: Path,
+    chunk_size: int = CHUNK_SIZE,
+    on_chunk: Optional[Callable[[int], None]] = None,
+) -> Iterator[str]:
+    """
+    Yields the ';'-terminated statements of a SQL file, reading it in chunks.
+    Quote-aware: semicolons inside '...', "..." or [...] and inside -- / /* */
+    comments do not end a statement. Comments are dropped from the output.
+    `on_chunk` receives the number of bytes read so far (for progress).
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    bytes_read = 0
 
-    con = duckdb.connect(str(OUT_DB))
-    con.execute(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA};")
+    with path.open("rb") as f:
+        buf = ""
+        eof = False
+        start = 0          # start of the current statement in buf
+        i = 0              # scan position
+        cuts: list[tuple[int, int]] = []  # comment spans inside the current statement
 
-    # Rebuild: drop tables if present (ignore errors)
-    for t in ["Transactions_Bank", "Merchants_Master", "Cards_Master", "Customers_Bank"]:
-        con.execute(f"DROP TABLE IF EXISTS {SCHEMA}.{t};")
+        def more() -> bool:
+            nonlocal buf, eof, bytes_read
+            if eof:
+                return False
+            raw = f.read(chunk_size)
+            bytes_read += len(raw)
+            if on_chunk is not None:
+                on_chunk(bytes_read)
+            if not raw:
+                eof = True
+                buf += decoder.decode(b"", final=True)
+                return False
+            buf += decoder.decode(raw).replace("\ufeff", "")
+            return True
 
-    create_sql = normalize_sql(read_text(SQL_CREATE))
-    insert_sql = normalize_sql(read_text(SQL_INSERT))
+        def emit(end: int) -> Optional[str]:
+            if cuts:
+                pieces, pos = [], start
+                for a, b in cuts:
+                    pieces.append(buf[pos:a])
+                    pos = b
+                pieces.append(buf[pos:end])
+                stmt = " ".join(pieces)
+            else:
+                stmt = buf[start:end]
+            stmt = stmt.strip()
+            return stmt or None
 
-    for stmt in split_statements(create_sql):
-        con.execute(stmt)
+        def find(token: str, pos: int) -> int:
+            # Position of `token` at or after pos, reading more input as needed (-1 at EOF).
+            while True:
+                k = buf.find(token, pos)
+                if k != -1:
+                    return k
+                pos = max(pos, len(buf) - len(token) + 1)
+                if not more():
+                    return -1
 
-    for stmt in split_statements(insert_sql):
-        con.execute(stmt)
+        more()
+        while True:
+            if start >= chunk_size:
+                # Drop consumed statements so the buffer stays around one chunk.
+                buf = buf[start:]
+                i -= start
+                cuts = [(a - start, b - start) for a, b in cuts]
+                start = 0
 
-    # Optional: a join-friendly view for Text2SQL (only if all tables exist)
-    con.execute(f"""
-        CREATE OR REPLACE VIEW {SCHEMA}.v_transactions_enriched AS
+            m = _SPECIAL_RE.search(buf, i)
+            if m is None:
+                i = len(buf)
+                if not more():
+                    break
+                continue
+
+            ch = m.group()
+            k = m.start()
+            # Two-character tokens need a lookahead character.
+            if ch in "-/" and k + 1 >= len(buf):
+                if more():
+                    continue
+                i = len(buf)
+                continue
+
+            if ch == ";":
+                stmt = emit(k)
+                start = i = k + 1
+                cuts = []
+                if stmt:
+                    yield stmt
+            elif ch == "'":
+                # '' is an escaped quote inside a string literal
+                pos = k + 1
+                while True:
+                    close = find("'", pos)
+                    if close == -1:
+                        i = len(buf)
+                        break
+                    if close + 1 >= len(buf):
+                        more()
+                    if close + 1 < len(buf) and buf[close + 1] == "'":
+                        pos = close + 2
+                        continue
+                    i = close + 1
+                    break
+            elif ch in "\"[":
+                close = find('"' if ch == '"' else "]", k + 1)
+                i = len(buf) if close == -1 else close + 1
+            elif ch == "-" and buf[k + 1] == "-":
+                close = find("\n", k + 2)
+                end = len(buf) if close == -1 else close
+                cuts.append((k, end))
+                i = end
+            elif ch == "/" and buf[k + 1] == "*":
+                close = find("*/", k + 2)
+                end = len(buf) if close == -1 else close + 2
+                cuts.append((k, end))
+                i = end
+            else:
+                i = k + 1
+
+        tail = emit(len(buf))
+        if tail:
+            yield tail
+
+
+_INSERT_HEAD_RE = re.compile(
+    r"\s*INSERT\s+INTO\s+(?:(\w+)\.)?(\w+)\s*(?:\(([^)]*)\))?\s*VALUES\s*\(",
+    re.IGNORECASE,
+)
+# One literal plus the separator that follows it (',' or ')').
+_VALUE_RE = re.compile(
+    r"""\s*(?:
+        N?'((?:[^']|'')*)'                              # 1: string literal
+      | (NULL)\b                                        # 2: NULL
+      | ([-+]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?)  # 3: number
+    )\s*([,)])""",
+    re.IGNORECASE | re.VERBOSE,
+)
+_ROW_SEP_RE = re.compile(r"\s*(?:(,)\s*\(|$)")
+
+
+def parse_insert_values(stmt: str) -> Optional[tuple[str, str, Optional[list[str]], list[list[Optional[str]]]]]:
+    """
+    Parses `INSERT INTO [schema.]table [(cols)] VALUES (...), (...)` made of
+    plain literals into (schema, table, columns, rows). Values stay as text
+    (None for NULL) and are cast to the column types on load. Returns None for
+    anything else (expressions, INSERT ... SELECT), which is then executed as-is.
+    """
+    head = _INSERT_HEAD_RE.match(stmt)
+    if head is None:
+        return None
+    schema = head.group(1) or SCHEMA
+    table, col_list = head.group(2), head.group(3)
+    cols = [c.strip().strip('"[]') for c in col_list.split(",")] if col_list else None
+
+    rows: list[list[Optional[str]]] = []
+    row: list[Optional[str]] = []
+    pos = head.end()
+    match_value = _VALUE_RE.match
+    while True:
+        m = match_value(stmt, pos)
+        if m is None:
+            return None
+        text, null, number, sep = m.groups()
+        if number is not None:
+            row.append(number)
+        elif null is not None:
+            row.append(None)
+        else:
+            row.append(text.replace("''", "'") if "''" in text else text)
+        pos = m.end()
+        if sep == ",":
+            continue
+        rows.append(row)
+        row = []
+        sep = _ROW_SEP_RE.match(stmt, pos)
+        if sep is None:
+            return None
+        if sep.group(1) is None:
+            return schema, table, cols, rows
+        pos = sep.end()
+
+
+class BulkLoader:
+    """
+    Buffers parsed INSERT rows column-wise per table and bulk-loads them through
+    a registered Arrow table, so memory stays bounded by `batch_rows`.
+    """
+
+    def __init__(self, con: duckdb.DuckDBPyConnection, batch_rows: int = BATCH_ROWS):
+        self.con = con
+        self.batch_rows = batch_rows
+        self.rows_added = 0
+        self.rows_loaded = 0
+        self._pending: dict[tuple[str, str, tuple[str, ...]], list[list[Optional[str]]]] = {}
+        self._pending_rows = 0
+        self._types: dict[tuple[str, str], list[tuple[str, str]]] = {}
+
+    def _columns(self, schema: str, table: str) -> list[tuple[str, str]]:
+        key = (schema.lower(), table.lower())
+        if key not in self._types:
+            self._types[key] = self.con.execute(
+                """
+                SELECT column_name, data_type
+                FROM information_schema.columns
+                WHERE lower(table_schema) = ? AND lower(table_name) = ?
+                ORDER BY ordinal_position
+                """,
+                list(key),
+            ).fetchall()
+            if not self._types[key]:
+                raise RuntimeError(f"INSERT into unknown table: {schema}.{table}")
+        return self._types[key]
+
+    def add(self, schema: str, table: str, cols: Optional[list[str]], rows: list[list[Optional[str]]]) -> None:
+        if cols is None:
+            cols = [c for c, _ in self._columns(schema, table)]
+        key = (schema, table, tuple(cols))
+        columns = self._pending.get(key)
+        if columns is None:
+            columns = self._pending[key] = [[] for _ in cols]
+        for row in rows:
+            if len(row) != len(cols):
+                raise ValueError(f"{schema}.{table}: expected {len(cols)} values, got {len(row)}: {row}")
+            for values, v in zip(columns, row):
+                values.append(v)
+        self._pending_rows += len(rows)
+        self.rows_added += len(rows)
+        if self._pending_rows >= self.batch_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        for (schema, table, cols), columns in self._pending.items():
+            if not columns[0]:
+                continue
+            types = {c.lower(): t for c, t in self._columns(schema, table)}
+            batch = pa.table({f"c{i}": pa.array(v, type=pa.string()) for i, v in enumerate(columns)})
+            select = ", ".join(f'CAST(c{i} AS {types[c.lower()]})' for i, c in enumerate(cols))
+            target = ", ".join(f'"{c}"' for c in cols)
+            self.con.register("_bulk_batch", batch)
+            try:
+                self.con.execute(f"INSERT INTO {schema}.{table} ({target}) SELECT {select} FROM _bulk_batch")
+            finally:
+                self.con.unregister("_bulk_batch")
+            self.rows_loaded += len(columns[0])
+        self._pending.clear()
+        self._pending_rows = 0
+
+
+class Progress:
+    """Prints bytes read, rows loaded and rows/s at most every `every` seconds."""
+
+    def __init__(self, label: str, total_bytes: int, every: float = PROGRESS_EVERY):
+        self.label = label
+        self.total_bytes = max(total_bytes, 1)
+        self.every = every
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.bytes_read = 0
+
+    def update(self, rows: int, force: bool = False) -> None:
+        now = time.perf_counter()
+        if not force and now - self._last < self.every:
+            return
+        self._last = now
+        elapsed = max(now - self.started, 1e-9)
+        pct = 100.0 * min(self.bytes_read, self.total_bytes) / self.total_bytes
+        print(f"[{self.label}] {pct:5.1f}% | {rows:,} rows | {rows / elapsed:,.0f} rows/s | {elapsed:,.1f}s")
+
+
+_INSERT_TABLE_RE = re.compile(r"\s*INSERT\s+INTO\s+(?:\w+\.)?(\w+)", re.IGNORECASE)
+_CREATE_TABLE_RE = re.compile(r"\s*CREATE\s+TABLE\s+(?:\w+\.)?(\w+)", re.IGNORECASE)
+
+
+def load_sql_file(
+    con: duckdb.DuckDBPyConnection,
+    path: Path,
+    batch_rows: int = BATCH_ROWS,
+    tables: Optional[set[str]] = None,
+) -> int:
+    """
+    Streams a SQL file into `con`: plain-literal INSERTs are bulk-loaded via
+    BulkLoader, every other statement is executed directly (after flushing so
+    statement order is preserved). With `tables` (lower-case names) only the
+    INSERTs into those tables are loaded. Returns the number of bulk-loaded rows.
+    """
+    loader = BulkLoader(con, batch_rows=batch_rows)
+    progress = Progress(path.name, path.stat().st_size)
+
+    def on_chunk(n: int) -> None:
+        progress.bytes_read = n
+
+    for stmt in iter_statements(path, on_chunk=on_chunk):
+        if tables is not None:
+            target = _INSERT_TABLE_RE.match(stmt)
+            if target is None or target.group(1).lower() not in tables:
+                continue
+        parsed = parse_insert_values(stmt)
+        if parsed is None:
+            loader.flush()
+            con.execute(normalize_sql(stmt))
+        else:
+            loader.add(*parsed)
+        progress.update(loader.rows_added)
+
+    loader.flush()
+    progress.update(loader.rows_loaded, force=True)
+    return loader.rows_loaded
+
+
+def enriched_select_sql() -> str:
+    # A join-friendly shape for Text2SQL
+    return f"""
         SELECT
             t.*,
             c.CustomerName,
@@ -76,35 +393,479 @@ def main() -> None:
             m.MerchantName,
             m.Category AS MerchantCategory,
             m.City AS MerchantCity
-        FROM {SCHEMA}.Transactions_Bank t
+        FROM {SCHEMA}.{FACT_TABLE} t
         JOIN {SCHEMA}.Customers_Bank c ON t.CustomerID = c.CustomerID
         JOIN {SCHEMA}.Cards_Master cm ON t.CardID = cm.CardID
-        JOIN {SCHEMA}.Merchants_Master m ON t.MerchantID = m.MerchantID;
+        JOIN {SCHEMA}.Merchants_Master m ON t.MerchantID = m.MerchantID
+    """
+
+
+def enriched_view_sql(materialized: bool = False) -> str:
+    # With a materialized table the view stays as the stable name the allowlist uses.
+    if materialized:
+        return f"CREATE OR REPLACE VIEW {SCHEMA}.{VIEW} AS SELECT * FROM {SCHEMA}.{ENRICHED_TABLE};"
+    return f"CREATE OR REPLACE VIEW {SCHEMA}.{VIEW} AS {enriched_select_sql()};"
+
+
+def materialize_enriched(con: duckdb.DuckDBPyConnection, incremental: bool) -> int:
+    """
+    (Re)builds bank.t_transactions_enriched sorted on (TransactionDate,
+    TransactionID) so DuckDB's per-row-group min/max zone maps can skip data
+    for date ranges and "latest" queries.
+
+    The incremental path assumes only transactions changed: rows whose
+    TransactionID disappeared are deleted and new TransactionIDs are appended
+    in sorted order. Edits to existing transactions need a full refresh;
+    check with fact_rows_edited() first. Returns the number of rows written.
+    """
+    target = f"{SCHEMA}.{ENRICHED_TABLE}"
+    if not incremental:
+        con.execute(f"""
+            CREATE OR REPLACE TABLE {target} AS
+            {enriched_select_sql()}
+            ORDER BY TransactionDate, TransactionID
+        """)
+        return con.execute(f"SELECT COUNT(*) FROM {target}").fetchone()[0]
+
+    con.execute(f"""
+        DELETE FROM {target}
+        WHERE TransactionID NOT IN (SELECT TransactionID FROM {SCHEMA}.{FACT_TABLE})
     """)
+    return con.execute(f"""
+        INSERT INTO {target}
+        {enriched_select_sql()}
+        WHERE t.TransactionID NOT IN (SELECT TransactionID FROM {target})
+        ORDER BY TransactionDate, TransactionID
+    """).fetchone()[0]
 
-    # Print validation
-    tables = con.execute(f"""
-        SELECT table_name
-        FROM information_schema.tables
-        WHERE table_schema = '{SCHEMA}'
-        ORDER BY table_name
-    """).fetchall()
 
-    counts = {}
-    for (tn,) in tables:
-        if tn.startswith("v_"):
+def fact_rows_edited(con: duckdb.DuckDBPyConnection) -> bool:
+    """
+    True when a transaction present in both the reloaded fact table and the
+    materialized table differs between them, i.e. the dump edited rows in
+    place rather than only appending or deleting them. Compares an
+    order-independent fingerprint of the fact columns over the shared IDs.
+    """
+    cols = [
+        r[0]
+        for r in con.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_schema = ? AND table_name = ? "
+            "ORDER BY ordinal_position",
+            [SCHEMA, FACT_TABLE],
+        ).fetchall()
+    ]
+    row_hash = "hash(" + ", ".join(f'"{c}"' for c in cols) + ")"
+    fact, target = f"{SCHEMA}.{FACT_TABLE}", f"{SCHEMA}.{ENRICHED_TABLE}"
+    old, new = con.execute(f"""
+        SELECT
+            (SELECT bit_xor({row_hash}) FROM {target}
+             WHERE TransactionID IN (SELECT TransactionID FROM {fact})),
+            (SELECT bit_xor({row_hash}) FROM {fact}
+             WHERE TransactionID IN (SELECT TransactionID FROM {target}))
+    """).fetchone()
+    return old != new
+
+
+# ----------------------------
+# Build manifest
+# ----------------------------
+
+def _sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def file_fingerprint(path: Path, previous: Optional[dict] = None) -> dict:
+    """
+    Size, mtime and sha256 of a source file. The hash is reused from the
+    previous manifest entry when size and mtime are unchanged.
+    """
+    st = path.stat()
+    fp = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if previous and all(previous.get(k) == v for k, v in fp.items()) and previous.get("sha256"):
+        fp["sha256"] = previous["sha256"]
+        return fp
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(block)
+    fp["sha256"] = h.hexdigest()
+    return fp
+
+
+def table_ddl(path: Path) -> tuple[dict[str, str], list[str]]:
+    """
+    Splits the create script into {table: normalized CREATE TABLE statement}
+    and the remaining statements (indexes etc.), in file order.
+    """
+    ddl: dict[str, str] = {}
+    other: list[str] = []
+    for stmt in iter_statements(path):
+        m = _CREATE_TABLE_RE.match(stmt)
+        if m:
+            ddl[m.group(1)] = normalize_sql(stmt)
+        else:
+            other.append(normalize_sql(stmt))
+    return ddl, other
+
+
+def table_digests(path: Path) -> dict[str, str]:
+    """
+    sha256 of the INSERT statements per (lower-case) table in a shared dump.
+    Statements that are not INSERTs are hashed under "*".
+    """
+    hashes: dict = {}
+    for stmt in iter_statements(path):
+        m = _INSERT_TABLE_RE.match(stmt)
+        key = m.group(1).lower() if m else "*"
+        h = hashes.get(key)
+        if h is None:
+            h = hashes[key] = hashlib.sha256()
+        h.update(stmt.encode("utf-8"))
+        h.update(b";")
+    return {k: h.hexdigest() for k, h in hashes.items()}
+
+
+def load_manifest(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def write_manifest(path: Path, manifest: dict) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def table_sources(tables: list[str]) -> dict[str, Path]:
+    """
+    Data file per table: a dedicated `Insert_<Table>.sql` next to the create
+    script when present, otherwise the shared Insert_Table.sql dump.
+    """
+    sources = {}
+    for t in tables:
+        dedicated = SQL_DIR / f"Insert_{t}.sql"
+        sources[t] = dedicated if dedicated.exists() else SQL_INSERT
+    return sources
+
+
+def _existing_tables(con: duckdb.DuckDBPyConnection) -> set[str]:
+    rows = con.execute(
+        "SELECT table_name FROM information_schema.tables WHERE table_schema = ?", [SCHEMA]
+    ).fetchall()
+    return {r[0].lower() for r in rows}
+
+
+def _reload(con: duckdb.DuckDBPyConnection, path: Path, ddl: dict[str, str]) -> None:
+    # Runs in a worker thread on its own cursor; tables from one file share a pass.
+    cur = con.cursor()
+    try:
+        for t, create in ddl.items():
+            cur.execute(f"DROP TABLE IF EXISTS {SCHEMA}.{t};")
+            cur.execute(create)
+        load_sql_file(cur, path, tables={t.lower() for t in ddl})
+    finally:
+        cur.close()
+
+# ----------------------------
+# Snapshots
+# ----------------------------
+
+def read_pointer() -> Optional[dict]:
+    try:
+        return json.loads(POINTER.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def publish_snapshot(path: Path, version: str) -> None:
+    pointer = {
+        "version": version,
+        "path": os.path.relpath(path, POINTER.parent),
+        "published_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    tmp = POINTER.with_name(POINTER.name + ".tmp")
+    tmp.write_text(json.dumps(pointer, indent=2), encoding="utf-8")
+    os.replace(tmp, POINTER)
+
+
+def gc_snapshots(current: Path, keep: int = KEEP_SNAPSHOTS) -> list[Path]:
+    """
+    Deletes snapshots (and their manifests) other than the `keep` newest ones,
+    skipping any that still have a lease refreshed within LEASE_TTL. Files that
+    are still open elsewhere (Windows) are left for the next run.
+    """
+    snaps = sorted(SNAPSHOT_DIR.glob(f"{OUT_DB.stem}-*.duckdb"), reverse=True)
+    removed = []
+    now = time.time()
+    for snap in snaps[keep:]:
+        if snap == current:
+            continue
+        leases = list(snap.parent.glob(snap.name + ".*.lease"))
+        if any(now - lease.stat().st_mtime < LEASE_TTL for lease in leases):
             continue
         try:
-            counts[tn] = con.execute(f"SELECT COUNT(*) FROM {SCHEMA}.{tn}").fetchone()[0]
-        except Exception:
-            counts[tn] = None
+            for extra in [*leases, snap.with_suffix(".manifest.json"), snap.with_name(snap.name + ".wal")]:
+                extra.unlink(missing_ok=True)
+            snap.unlink()
+            removed.append(snap)
+        except OSError as e:
+            print(f"Snapshot kept ({e}): {snap}")
+    return removed
+
+
+def plan_build(
+    con: Optional[duckdb.DuckDBPyConnection],
+    old: dict,
+    full: bool,
+    materialize: Optional[bool] = None,
+    rollups: Optional[bool] = None,
+) -> dict:
+    """
+    Compares the sources with the previous manifest (and the tables in `con`,
+    the database being replaced) and returns the new manifest plus the tables
+    to reload and whether the view and the materialized table must be refreshed.
+    `materialize=None` / `rollups=None` keep the previous build's choice
+    (rollups default to on).
+    """
+    old_files = old.get("files", {})
+    old_tables = old.get("tables", {})
+
+    ddl, other_ddl = table_ddl(SQL_CREATE)
+    sources = table_sources(list(ddl))
+
+    files = {SQL_CREATE.name: file_fingerprint(SQL_CREATE, old_files.get(SQL_CREATE.name))}
+    for src in set(sources.values()):
+        files[src.name] = file_fingerprint(src, old_files.get(src.name))
+
+    # Per-table data hashes: the file hash for dedicated dumps, statement
+    # digests for the shared dump (recomputed only when the file changed).
+    shared_digests: Optional[dict[str, str]] = None
+    if SQL_INSERT in sources.values():
+        if old_files.get(SQL_INSERT.name, {}).get("sha256") == files[SQL_INSERT.name]["sha256"]:
+            shared_digests = old.get("shared_digests")
+        if shared_digests is None:
+            shared_digests = table_digests(SQL_INSERT)
+
+    existing = _existing_tables(con) if con is not None else set()
+
+    other_hash = _sha256_text(";".join(other_ddl))
+    full = full or con is None or old.get("other_ddl") != other_hash
+    if shared_digests is not None and shared_digests.get("*") != (old.get("shared_digests") or {}).get("*"):
+        full = True
+
+    tables: dict[str, dict] = {}
+    changed: list[str] = []
+    for t, create in ddl.items():
+        src = sources[t]
+        data_hash = files[src.name]["sha256"] if src != SQL_INSERT else shared_digests.get(t.lower(), "")
+        entry = {"ddl": _sha256_text(create), "source": src.name, "data": data_hash}
+        prev = old_tables.get(t, {})
+        stale = (
+            full
+            or t.lower() not in existing
+            or any(prev.get(k) != v for k, v in entry.items())
+            or con.execute(f"SELECT COUNT(*) FROM {SCHEMA}.{t}").fetchone()[0] != prev.get("rows")
+        )
+        if stale:
+            changed.append(t)
+        else:
+            entry["rows"] = prev["rows"]
+        tables[t] = entry
+
+    # Recreate the view only when its definition or a base table's shape changed.
+    if materialize is None:
+        materialize = bool(old.get("materialized"))
+    view_hash = _sha256_text(enriched_view_sql(materialize))
+    ddl_changed = any(tables[t]["ddl"] != old_tables.get(t, {}).get("ddl") for t in tables)
+    view_stale = ddl_changed or old.get("view") != view_hash or VIEW.lower() not in existing
+
+    # The materialized table can be topped up in place when only transactions changed.
+    refresh = None
+    if materialize:
+        if view_stale or ENRICHED_TABLE.lower() not in existing or any(t != FACT_TABLE for t in changed):
+            refresh = "full"
+        elif FACT_TABLE in changed:
+            refresh = "incremental"
+
+    # Rollups are recomputed from the view whenever any of its data changed.
+    if rollups is None:
+        rollups = old.get("rollups", True)
+    rollup_hash = _sha256_text(";".join(rollup_create_sql(r) for r in ROLLUPS)) if rollups else None
+    rollups_stale = bool(rollups) and (
+        view_stale
+        or bool(changed)
+        or old.get("rollup_hash") != rollup_hash
+        or any(r.lower() not in existing for r in ROLLUPS)
+    )
+    drop_rollups = [r for r in ROLLUPS if not rollups and r.lower() in existing]
+
+    return {
+        "ddl": ddl,
+        "other_ddl": other_ddl if full else [],
+        "sources": sources,
+        "changed": changed,
+        "view_stale": view_stale,
+        "refresh": refresh,
+        "drop_materialized": not materialize and ENRICHED_TABLE.lower() in existing,
+        "rollups_stale": rollups_stale,
+        "drop_rollups": drop_rollups,
+        "manifest": {
+            "materialized": materialize,
+            "rollups": rollups,
+            "rollup_hash": rollup_hash,
+            "files": files,
+            "tables": tables,
+            "shared_digests": shared_digests,
+            "other_ddl": other_hash,
+            "view": view_hash,
+        },
+    }
 
+
+def plan_snapshot(
+    base: Optional[Path],
+    old: dict,
+    full: bool,
+    materialize: Optional[bool] = None,
+    rollups: Optional[bool] = None,
+) -> tuple[dict, bool]:
+    """
+    Plans the new snapshot against the published database `base` (or None).
+    Returns (plan, copy_base): unchanged tables are carried over by copying
+    base. When every table changed nothing is copied, so the plan is redone
+    against an empty database: the view, the other DDL, the materialized
+    table and the rollups are then all created from scratch.
+    """
+    base_con = duckdb.connect(str(base), read_only=True) if base is not None else None
+    try:
+        plan = plan_build(base_con, old, full=full, materialize=materialize, rollups=rollups)
+    finally:
+        if base_con is not None:
+            base_con.close()
+    if base is not None and len(plan["changed"]) < len(plan["ddl"]):
+        return plan, True
+    if base is not None:
+        plan = plan_build(None, old, full=True, materialize=materialize, rollups=rollups)
+    return plan, False
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build or refresh the bank DuckDB snapshot from the SQL dumps.")
+    parser.add_argument("--full", action="store_true", help="ignore the build manifest and reload every table")
+    parser.add_argument("--jobs", type=int, default=4, help="source files loaded in parallel")
+    parser.add_argument(
+        "--materialize",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help=f"store {SCHEMA}.{VIEW} as a sorted table (default: keep the previous build's choice)",
+    )
+    parser.add_argument(
+        "--rollups",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="maintain the pre-aggregated rollup tables used by ui.db.run_sql (default: on)",
+    )
+    args = parser.parse_args()
+
+    if not SQL_CREATE.exists():
+        raise FileNotFoundError(f"Missing: {SQL_CREATE}")
+    if not SQL_INSERT.exists():
+        raise FileNotFoundError(f"Missing: {SQL_INSERT}")
+
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+
+    # The published snapshot (or a pre-snapshot OUT_DB) is the base we diff against.
+    pointer = read_pointer()
+    if pointer is not None:
+        base = (POINTER.parent / pointer["path"]).resolve()
+    else:
+        base = OUT_DB
+    if not base.exists():
+        base = None
+    old = {} if args.full or base is None else load_manifest(base.with_suffix(".manifest.json"))
+
+    plan, copy_base = plan_snapshot(base, old, full=args.full, materialize=args.materialize, rollups=args.rollups)
+
+    changed = plan["changed"]
+    if not (
+        changed
+        or plan["view_stale"]
+        or plan["other_ddl"]
+        or plan["drop_materialized"]
+        or plan["rollups_stale"]
+        or plan["drop_rollups"]
+    ):
+        print("Up to date: no source changes since the last build.")
+        print("Current snapshot:", base)
+        return
+
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    snap = SNAPSHOT_DIR / f"{OUT_DB.stem}-{version}.duckdb"
+    if copy_base:
+        # Unchanged tables are carried over from the base by copying the file.
+        shutil.copyfile(base, snap)
+
+    con = duckdb.connect(str(snap))
+    con.execute(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA};")
+
+    # Independent tables load in parallel: one job per source file.
+    jobs: dict[Path, dict[str, str]] = {}
+    for t in changed:
+        jobs.setdefault(plan["sources"][t], {})[t] = plan["ddl"][t]
+    if jobs:
+        print("Reloading:", changed)
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+            for fut in [pool.submit(_reload, con, path, job) for path, job in jobs.items()]:
+                fut.result()
+
+    for stmt in plan["other_ddl"]:
+        con.execute(stmt)
+
+    refresh = plan["refresh"]
+    if refresh == "incremental" and fact_rows_edited(con):
+        # Existing transactions were edited: appending new IDs would keep the old values.
+        refresh = "full"
+    if refresh:
+        n = materialize_enriched(con, incremental=refresh == "incremental")
+        print(f"Materialized ({refresh}): {SCHEMA}.{ENRICHED_TABLE} +{n:,} rows")
+
+    if plan["view_stale"]:
+        con.execute(enriched_view_sql(plan["manifest"]["materialized"]))
+        print(f"View recreated: {SCHEMA}.{VIEW}")
+
+    if plan["drop_materialized"]:
+        con.execute(f"DROP TABLE IF EXISTS {SCHEMA}.{ENRICHED_TABLE};")
+
+    if plan["rollups_stale"]:
+        for name in ROLLUPS:
+            con.execute(rollup_create_sql(name))
+        print("Rollups rebuilt:", [f"{SCHEMA}.{r}" for r in ROLLUPS])
+    for name in plan["drop_rollups"]:
+        con.execute(f"DROP TABLE IF EXISTS {SCHEMA}.{name};")
+
+    manifest = plan["manifest"]
+    counts = {}
+    for t in manifest["tables"]:
+        counts[t] = con.execute(f"SELECT COUNT(*) FROM {SCHEMA}.{t}").fetchone()[0]
+        manifest["tables"][t]["rows"] = counts[t]
+    manifest["version"] = version
+
+    con.execute("CHECKPOINT;")
     con.close()
 
-    print("OK: built", OUT_DB)
-    print("Tables:", [t[0] for t in tables])
+    write_manifest(snap.with_suffix(".manifest.json"), manifest)
+    publish_snapshot(snap, version)
+    removed = gc_snapshots(snap)
+
+    print("OK: built", snap)
+    print("Published:", POINTER, "->", version)
+    print("Tables:", list(counts))
     print("Row counts:", counts)
-    print(f"View: {SCHEMA}.v_transactions_enriched")
+    print(f"View: {SCHEMA}.{VIEW}")
+    if removed:
+        print("Removed old snapshots:", [r.name for r in removed])
 
 if __name__ == "__main__":
     main()
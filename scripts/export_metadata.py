@@ -1,50 +1,146 @@
 ﻿from pathlib import Path
 import json
+import sys
 import duckdb
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(REPO_ROOT))
+
+from ui.catalog import VALUE_COLUMNS
+from ui.db import resolve_db_path
+
 DB_PATH = REPO_ROOT / "data" / "duckdb" / "bank_txn_analytics.duckdb"
 OUT_DIR = REPO_ROOT / "data" / "metadata"
 SCHEMA = "bank"
 
-def main():
-    OUT_DIR.mkdir(parents=True, exist_ok=True)
-    con = duckdb.connect(str(DB_PATH))
+# Tables larger than this are profiled on a reservoir sample of this many rows.
+# Views are profiled in full: a sample of a view still computes all of it.
+SAMPLE_ROWS = 200_000
+SAMPLE_SEED = 42
+# VALUE_COLUMNS with at most this many distinct values get their values listed.
+# The list is read from the whole relation, so rare values are never missing.
+TOP_K = 20
+# Types whose min/max are worth recording
+RANGE_TYPES = ("TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT", "FLOAT", "DOUBLE", "DECIMAL",
+               "DATE", "TIMESTAMP")
+VALUE_TYPES = ("VARCHAR", "BOOLEAN")
+
 
-    tables = con.execute("""
-        SELECT table_schema, table_name, table_type
-        FROM information_schema.tables
-        WHERE table_schema = ?
-        ORDER BY table_name
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def list_relations(con):
+    """All tables/views of SCHEMA with their columns and estimated row counts, in one query."""
+    rows = con.execute("""
+        SELECT t.table_name, t.table_type, c.column_name, c.data_type, d.estimated_size
+        FROM information_schema.tables t
+        JOIN information_schema.columns c
+          ON c.table_schema = t.table_schema AND c.table_name = t.table_name
+        LEFT JOIN duckdb_tables() d
+          ON d.schema_name = t.table_schema AND d.table_name = t.table_name
+        WHERE t.table_schema = ?
+        ORDER BY t.table_name, c.ordinal_position
     """, [SCHEMA]).fetchall()
 
+    relations = {}
+    for tn, tt, cn, ct, size in rows:
+        rel = relations.setdefault(tn, {"type": tt, "row_count": size, "columns": []})
+        rel["columns"].append((cn, ct))
+    return relations
+
+
+def profile_relation(con, fq, columns, row_count):
+    """
+    One scan (of a sample, for large tables) computing, per column:
+    approximate distinct count, null fraction and min/max for numeric and date
+    columns. The values of low-cardinality VALUE_COLUMNS are then listed
+    exactly, most frequent first, from the whole relation.
+    """
+    exprs = ["COUNT(*)"]
+    for name, dtype in columns:
+        base = dtype.split("(")[0].upper()
+        col = _quote(name)
+        exprs += [f"approx_count_distinct({col})", f"COUNT({col})"]
+        exprs += [f"MIN({col})", f"MAX({col})"] if base in RANGE_TYPES else ["NULL", "NULL"]
+
+    sampled = row_count is not None and row_count > SAMPLE_ROWS
+    sample = f" USING SAMPLE reservoir({SAMPLE_ROWS} ROWS) REPEATABLE ({SAMPLE_SEED})" if sampled else ""
+    values = con.execute(f"SELECT {', '.join(exprs)} FROM {fq}{sample}").fetchone()
+
+    scanned, stats, listed = values[0], {}, []
+    for i, (name, dtype) in enumerate(columns):
+        distinct, non_null, lo, hi = values[1 + 4 * i: 5 + 4 * i]
+        stats[name] = {
+            "distinct": distinct,
+            "null_frac": round(1 - non_null / scanned, 4) if scanned else None,
+        }
+        if lo is not None:
+            stats[name]["min"], stats[name]["max"] = lo, hi
+        # The approximate (and, on a sample, low) count only rules out clearly larger columns
+        if name in VALUE_COLUMNS and dtype.split("(")[0].upper() in VALUE_TYPES and distinct <= 2 * TOP_K:
+            listed.append(name)
+    for name, top in column_values(con, fq, listed).items():
+        if len(top) <= TOP_K:
+            stats[name]["values"] = top
+    return {"profiled_rows": scanned, "sampled": sampled and scanned >= SAMPLE_ROWS, "columns": stats}
+
+
+def column_values(con, fq, names):
+    """
+    Up to TOP_K + 1 non-null values of each of `names` over the whole
+    relation, most frequent first; one scan (GROUPING SETS) for all of them.
+    """
+    if not names:
+        return {}
+    cols = [_quote(n) for n in names]
+    rows = con.execute(f"""
+        SELECT {', '.join(f"grouping({c})" for c in cols)}, {', '.join(cols)}, count(*) AS n
+        FROM {fq}
+        GROUP BY GROUPING SETS ({', '.join(f"({c})" for c in cols)})
+    """).fetchall()
+    out = {}
+    for i, name in enumerate(names):
+        # grouping() is 0 for the column a row is grouped by
+        counts = [(r[-1], r[len(names) + i]) for r in rows if r[i] == 0 and r[len(names) + i] is not None]
+        counts.sort(key=lambda x: (-x[0], str(x[1])))
+        out[name] = [v for _, v in counts[:TOP_K + 1]]
+    return out
+
+
+def main():
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    _, db_path = resolve_db_path(str(DB_PATH))
+    con = duckdb.connect(db_path, read_only=True)
+
     schema_json = {"schema": SCHEMA, "tables": []}
     allowlist = {"schema": SCHEMA, "tables": {}}
 
-    for ts, tn, tt in tables:
-        cols = con.execute("""
-            SELECT column_name, data_type
-            FROM information_schema.columns
-            WHERE table_schema = ? AND table_name = ?
-            ORDER BY ordinal_position
-        """, [ts, tn]).fetchall()
-
-        row_count = None
-        if tt.upper() == "BASE TABLE":
-            row_count = con.execute(f"SELECT COUNT(*) FROM {ts}.{tn}").fetchone()[0]
+    for tn, rel in list_relations(con).items():
+        fq = f"{SCHEMA}.{tn}"
+        cols = rel["columns"]
+        row_count = rel["row_count"] if rel["type"].upper() == "BASE TABLE" else None
+        profile = profile_relation(con, fq, cols, row_count)
+        # An unsampled scan counted every row; otherwise the catalog's estimate is all we have
+        estimated = profile["sampled"]
+        if not estimated:
+            row_count = profile["profiled_rows"]
 
-        fq = f"{ts}.{tn}"
         schema_json["tables"].append({
             "table": fq,
-            "type": tt,
+            "type": rel["type"],
             "row_count": row_count,
-            "columns": [{"name": c, "type": t} for c, t in cols]
+            "row_count_estimated": estimated,
+            "profiled_rows": profile["profiled_rows"],
+            "sampled": profile["sampled"],
+            "columns": [{"name": c, "type": t, "stats": profile["columns"][c]} for c, t in cols]
         })
         allowlist["tables"][fq] = [c for c, _ in cols]
 
     con.close()
 
-    (OUT_DIR / "schema.json").write_text(json.dumps(schema_json, indent=2), encoding="utf-8")
+    # default=str: dates/timestamps/decimals in min/max and value lists
+    (OUT_DIR / "schema.json").write_text(json.dumps(schema_json, indent=2, default=str), encoding="utf-8")
     (OUT_DIR / "allowlist.json").write_text(json.dumps(allowlist, indent=2), encoding="utf-8")
     print("OK: wrote data/metadata/schema.json and data/metadata/allowlist.json")
 
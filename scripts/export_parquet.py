@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import argparse
+import shutil
+import sys
+from datetime import date
+from pathlib import Path
+from typing import Optional
+
+import duckdb
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(REPO_ROOT))
+
+from ui.db import resolve_db_path
+from ui.parquet import DIMENSIONS, PARTITION_COLUMNS, SCHEMA, VIEW
+
+DB_PATH = REPO_ROOT / "data" / "duckdb" / "bank_txn_analytics.duckdb"
+OUT_DIR = REPO_ROOT / "data" / "parquet"
+
+# Rows per Parquet row group; each carries min/max statistics, and rows are
+# sorted by (TransactionDate, TransactionID) so those ranges are tight.
+ROW_GROUP_SIZE = 122_880
+
+SOURCES = {
+    "transactions": f"{SCHEMA}.Transactions_Bank",
+    "transactions_enriched": f"{SCHEMA}.{VIEW}",
+}
+
+
+def export_partitioned(
+    con: duckdb.DuckDBPyConnection,
+    source: str,
+    target: Path,
+    since: Optional[date] = None,
+    row_group_size: int = ROW_GROUP_SIZE,
+) -> list[str]:
+    """
+    Writes `source` to target/year=YYYY/month=M/*.parquet. With `since`, only
+    the months from `since` on are rewritten and older partitions are kept;
+    otherwise partitions no longer in the source are removed. Each partition
+    is written to a staging directory first and swapped in whole, so readers
+    never see a half-written month. Returns the partitions written.
+    """
+    staging = target.with_name(target.name + ".staging")
+    # Partitions being replaced are parked next to target, never inside it,
+    # so readers globbing target/year=*/month=* cannot see them
+    replaced = target.with_name(target.name + ".replaced")
+    recover_partitions(target, replaced)
+    shutil.rmtree(staging, ignore_errors=True)
+    where = f"WHERE TransactionDate >= DATE '{since.replace(day=1).isoformat()}'" if since else ""
+    con.execute(f"""
+        COPY (
+            SELECT *, year(TransactionDate) AS year, month(TransactionDate) AS month
+            FROM {source}
+            {where}
+            ORDER BY TransactionDate, TransactionID
+        ) TO '{staging.as_posix()}' (
+            FORMAT parquet,
+            PARTITION_BY ({', '.join(PARTITION_COLUMNS)}),
+            COMPRESSION zstd,
+            ROW_GROUP_SIZE {int(row_group_size)}
+        )
+    """)
+
+    written = []
+    target.mkdir(parents=True, exist_ok=True)
+    new_parts = sorted(p.relative_to(staging) for p in staging.glob("year=*/month=*")) if staging.exists() else []
+    for rel in new_parts:
+        dest = target / rel
+        old = replaced / rel
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        if dest.exists():
+            old.parent.mkdir(parents=True, exist_ok=True)
+            dest.replace(old)
+        (staging / rel).replace(dest)
+        shutil.rmtree(old, ignore_errors=True)
+        written.append(rel.as_posix())
+
+    if since is None:
+        keep = set(new_parts)
+        for part in target.glob("year=*/month=*"):
+            if part.relative_to(target) not in keep:
+                shutil.rmtree(part)
+        for year in target.glob("year=*"):
+            if not any(year.iterdir()):
+                year.rmdir()
+    shutil.rmtree(staging, ignore_errors=True)
+    shutil.rmtree(replaced, ignore_errors=True)
+    return written
+
+
+def recover_partitions(target: Path, replaced: Path) -> None:
+    """
+    Cleans up after an export that died mid-swap: a partition parked in
+    `replaced` whose replacement never arrived is moved back into target,
+    and `month=M.old` directories left inside target by older versions of
+    this script are removed.
+    """
+    for old in sorted(replaced.glob("year=*/month=*")):
+        dest = target / old.relative_to(replaced)
+        if not dest.exists():
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            old.replace(dest)
+    shutil.rmtree(replaced, ignore_errors=True)
+    for stale in target.glob("year=*/month=*.old"):
+        shutil.rmtree(stale, ignore_errors=True)
+
+
+def export_dimension(con: duckdb.DuckDBPyConnection, table: str, out_dir: Path) -> None:
+    out = out_dir / f"{table}.parquet"
+    tmp = out.with_name(out.name + ".tmp")
+    con.execute(f"COPY {SCHEMA}.{table} TO '{tmp.as_posix()}' (FORMAT parquet, COMPRESSION zstd)")
+    tmp.replace(out)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Export transactions and the enriched view as Parquet partitioned by year/month."
+    )
+    parser.add_argument("--db", default=str(DB_PATH), help="database to export (default: published snapshot)")
+    parser.add_argument("--out", type=Path, default=OUT_DIR)
+    parser.add_argument(
+        "--since",
+        default=None,
+        help="YYYY-MM: rewrite only this month and later, keeping older partitions (default: full export)",
+    )
+    parser.add_argument("--row-group-size", type=int, default=ROW_GROUP_SIZE)
+    args = parser.parse_args()
+
+    since = date.fromisoformat(f"{args.since}-01") if args.since else None
+    version, db_path = resolve_db_path(args.db)
+    print(f"DB: {db_path} (snapshot: {version})")
+    con = duckdb.connect(db_path, read_only=True)
+    try:
+        args.out.mkdir(parents=True, exist_ok=True)
+        for sub, source in SOURCES.items():
+            parts = export_partitioned(con, source, args.out / sub, since, args.row_group_size)
+            print(f"{source} -> {args.out / sub}: {len(parts)} partitions written")
+        for table in DIMENSIONS:
+            export_dimension(con, table, args.out)
+        print("Dimensions:", DIMENSIONS)
+    finally:
+        con.close()
+    print(f"OK: serve it with PARQUET_DIR={args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import duckdb
+import numpy as np
+import pyarrow as pa
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(REPO_ROOT))
+
+from build_duckdb_from_sql import SCHEMA, VIEW, enriched_view_sql, materialize_enriched
+from ui.rollups import ROLLUPS, rollup_create_sql
+
+OUT_DIR = REPO_ROOT / "data" / "duckdb" / "synthetic"
+
+# Transactions generated per chunk. Part of the output's identity: every chunk
+# draws from its own seeded stream, so a given (seed, scale) always produces
+# the same database however the chunks are scheduled.
+CHUNK_ROWS = 1_000_000
+
+# Same columns and types as data/metadata/schema.json
+DDL = {
+    "Customers_Bank": """
+        CustomerID INTEGER, CustomerName VARCHAR, Gender VARCHAR, Age INTEGER, City VARCHAR
+    """,
+    "Cards_Master": """
+        CardID INTEGER, CardType VARCHAR, IssuerBank VARCHAR, CustomerID INTEGER
+    """,
+    "Merchants_Master": """
+        MerchantID INTEGER, MerchantName VARCHAR, Category VARCHAR, City VARCHAR
+    """,
+    "Transactions_Bank": """
+        TransactionID INTEGER, TransactionDate DATE, CustomerID INTEGER, CardID INTEGER,
+        MerchantID INTEGER, Amount DECIMAL(10,2), TransactionType VARCHAR, Mode VARCHAR, City VARCHAR
+    """,
+}
+
+# City populations roughly follow Türkiye's largest cities
+CITIES = ["İstanbul", "Ankara", "İzmir", "Bursa", "Antalya", "Adana", "Konya", "Gaziantep", "Kayseri", "Eskişehir"]
+CITY_WEIGHTS = [0.36, 0.14, 0.11, 0.07, 0.06, 0.05, 0.05, 0.05, 0.05, 0.06]
+FIRST_NAMES = [
+    "Ayşe", "Fatma", "Elif", "Zeynep", "Emine", "Merve", "Derya", "Selin",
+    "Mehmet", "Mustafa", "Ahmet", "Ali", "Hüseyin", "Emre", "Can", "Burak",
+]
+LAST_NAMES = ["Yılmaz", "Kaya", "Demir", "Şahin", "Çelik", "Yıldız", "Aydın", "Öztürk", "Arslan", "Doğan"]
+CARD_TYPES = ["Debit", "Credit", "Prepaid"]
+CARD_TYPE_WEIGHTS = [0.55, 0.40, 0.05]
+BANKS = ["Ziraat", "İş Bankası", "Garanti BBVA", "Akbank", "Yapı Kredi", "Halkbank", "VakıfBank", "QNB"]
+# Category -> median ticket size
+CATEGORIES = {
+    "Grocery": 450.0, "Restaurant": 600.0, "Fuel": 1200.0, "Clothing": 1500.0, "Electronics": 6000.0,
+    "Travel": 8000.0, "Health": 900.0, "Entertainment": 500.0, "Utilities": 1100.0, "Education": 3500.0,
+}
+MODES = ["POS", "Online", "Mobile", "ATM"]
+MODE_WEIGHTS = [0.45, 0.30, 0.20, 0.05]
+TRANSACTION_TYPES = ["Debit", "Credit"]
+TRANSACTION_TYPE_WEIGHTS = [0.92, 0.08]
+
+# Seasonality: month multipliers (November/December shopping peak, quiet
+# January/February) and weekday multipliers, Monday first.
+MONTH_FACTOR = [0.85, 0.85, 0.95, 1.0, 1.0, 1.0, 1.1, 1.1, 1.0, 1.0, 1.2, 1.35]
+WEEKDAY_FACTOR = [0.9, 0.95, 0.95, 1.0, 1.2, 1.2, 0.8]
+
+
+def parse_scale(text: str) -> int:
+    """'1M' -> 1_000_000, '250k' -> 250_000, '100000' -> 100_000."""
+    text = text.strip().lower().replace("_", "")
+    mult = {"k": 1_000, "m": 1_000_000, "b": 1_000_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if mult > 1 else text) * mult)
+
+
+def dimension_sizes(transactions: int) -> dict:
+    customers = max(100, transactions // 100)
+    return {
+        "customers": customers,
+        "cards": customers + customers // 2,
+        "merchants": max(50, transactions // 1000),
+    }
+
+
+def _rng(seed: int, *stream: int) -> np.random.Generator:
+    return np.random.default_rng([seed, *stream])
+
+
+def _choice(rng: np.random.Generator, values: list, size: int, p=None) -> np.ndarray:
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=size, p=p)]
+
+
+def zipf_weights(n: int, s: float) -> np.ndarray:
+    w = 1.0 / np.arange(1, n + 1, dtype=np.float64) ** s
+    return w / w.sum()
+
+
+def day_weights(start: date, days: int) -> np.ndarray:
+    w = np.array(
+        [
+            MONTH_FACTOR[d.month - 1] * WEEKDAY_FACTOR[d.weekday()]
+            for d in (start + timedelta(days=i) for i in range(days))
+        ]
+    )
+    return w / w.sum()
+
+
+def customers_table(seed: int, n: int) -> pa.Table:
+    rng = _rng(seed, 1)
+    first = _choice(rng, FIRST_NAMES, n)
+    last = _choice(rng, LAST_NAMES, n)
+    female = np.isin(first, FIRST_NAMES[:8])
+    return pa.table({
+        "CustomerID": np.arange(1, n + 1, dtype=np.int32),
+        "CustomerName": [f"{a} {b}" for a, b in zip(first, last)],
+        "Gender": np.where(female, "F", "M"),
+        "Age": np.clip(rng.normal(41, 13, n), 18, 85).astype(np.int32),
+        "City": _choice(rng, CITIES, n, CITY_WEIGHTS),
+    })
+
+
+def cards_table(seed: int, n: int, customers: int) -> pa.Table:
+    rng = _rng(seed, 2)
+    # Every customer has one card; the rest go to random customers
+    owners = np.concatenate([np.arange(1, customers + 1), rng.integers(1, customers + 1, n - customers)])
+    return pa.table({
+        "CardID": np.arange(1, n + 1, dtype=np.int32),
+        "CardType": _choice(rng, CARD_TYPES, n, CARD_TYPE_WEIGHTS),
+        "IssuerBank": _choice(rng, BANKS, n, zipf_weights(len(BANKS), 0.8)),
+        "CustomerID": owners.astype(np.int32),
+    })
+
+
+def merchants_table(seed: int, n: int) -> pa.Table:
+    rng = _rng(seed, 3)
+    category = _choice(rng, list(CATEGORIES), n)
+    return pa.table({
+        "MerchantID": np.arange(1, n + 1, dtype=np.int32),
+        "MerchantName": [f"{c} Merchant {i}" for i, c in enumerate(category, start=1)],
+        "Category": category,
+        "City": _choice(rng, CITIES, n, CITY_WEIGHTS),
+    })
+
+
+class TransactionGenerator:
+    """
+    Produces bank.Transactions_Bank in chunks. Merchants are drawn from a Zipf
+    distribution (a few merchants take most transactions), days follow
+    MONTH_FACTOR/WEEKDAY_FACTOR, and TransactionID grows with the date as in a
+    real ledger.
+    """
+
+    def __init__(self, seed: int, transactions: int, start: date, days: int, zipf_s: float,
+                 customers: pa.Table, cards: pa.Table, merchants: pa.Table):
+        self.seed = seed
+        self.transactions = transactions
+        self.start = start
+        # Transactions per day are fixed up front so each chunk knows its dates
+        per_day = _rng(seed, 4).multinomial(transactions, day_weights(start, days))
+        self._day_ends = np.cumsum(per_day)
+        self._merchant_p = zipf_weights(merchants.num_rows, zipf_s)
+        self._card_owner = cards["CustomerID"].to_numpy()
+        self._customer_city = np.asarray(customers["City"].to_pylist(), dtype=object)
+        self._merchant_city = np.asarray(merchants["City"].to_pylist(), dtype=object)
+        medians = {c: np.log(m) for c, m in CATEGORIES.items()}
+        self._merchant_mu = np.array([medians[c] for c in merchants["Category"].to_pylist()])
+
+    def chunks(self) -> int:
+        return -(-self.transactions // CHUNK_ROWS)
+
+    def chunk(self, k: int) -> pa.Table:
+        lo, hi = k * CHUNK_ROWS, min((k + 1) * CHUNK_ROWS, self.transactions)
+        n = hi - lo
+        rng = _rng(self.seed, 5, k)
+        ids = np.arange(lo, hi, dtype=np.int64)
+        day = np.searchsorted(self._day_ends, ids, side="right")
+        card = rng.integers(0, len(self._card_owner), n)
+        customer = self._card_owner[card]
+        merchant = rng.choice(len(self._merchant_p), size=n, p=self._merchant_p)
+        amount = np.round(np.clip(rng.lognormal(self._merchant_mu[merchant], 0.9), 1.0, 9_999_999.0), 2)
+        # Mostly spent in the customer's home city
+        at_home = rng.random(n) < 0.8
+        city = np.where(at_home, self._customer_city[customer - 1], self._merchant_city[merchant])
+        return pa.table({
+            "TransactionID": (ids + 1).astype(np.int32),
+            "TransactionDate": pa.array(np.datetime64(self.start, "D") + day.astype("timedelta64[D]")),
+            "CustomerID": customer.astype(np.int32),
+            "CardID": (card + 1).astype(np.int32),
+            "MerchantID": (merchant + 1).astype(np.int32),
+            "Amount": amount,
+            "TransactionType": _choice(rng, TRANSACTION_TYPES, n, TRANSACTION_TYPE_WEIGHTS),
+            "Mode": _choice(rng, MODES, n, MODE_WEIGHTS),
+            "City": city,
+        })
+
+
+def _insert(con: duckdb.DuckDBPyConnection, table: str, data: pa.Table) -> None:
+    con.register("_synthetic_chunk", data)
+    try:
+        con.execute(f"INSERT INTO {SCHEMA}.{table} SELECT * FROM _synthetic_chunk")
+    finally:
+        con.unregister("_synthetic_chunk")
+
+
+def generate(
+    out: Path,
+    transactions: int,
+    seed: int = 42,
+    start: date = date(2023, 1, 1),
+    days: int = 730,
+    zipf_s: float = 1.1,
+    materialize: bool = False,
+    rollups: bool = True,
+) -> dict:
+    """Writes a bank.* database with `transactions` rows to `out`; returns row counts."""
+    sizes = dimension_sizes(transactions)
+    customers = customers_table(seed, sizes["customers"])
+    cards = cards_table(seed, sizes["cards"], sizes["customers"])
+    merchants = merchants_table(seed, sizes["merchants"])
+    gen = TransactionGenerator(seed, transactions, start, days, zipf_s, customers, cards, merchants)
+
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(out.name + ".tmp")
+    tmp.unlink(missing_ok=True)
+    con = duckdb.connect(str(tmp))
+    try:
+        con.execute(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA};")
+        for table, cols in DDL.items():
+            con.execute(f"CREATE TABLE {SCHEMA}.{table} ({cols});")
+        _insert(con, "Customers_Bank", customers)
+        _insert(con, "Cards_Master", cards)
+        _insert(con, "Merchants_Master", merchants)
+
+        started = time.perf_counter()
+        for k in range(gen.chunks()):
+            _insert(con, "Transactions_Bank", gen.chunk(k))
+            done = min((k + 1) * CHUNK_ROWS, transactions)
+            rate = done / max(time.perf_counter() - started, 1e-9)
+            print(f"  Transactions_Bank: {done:,}/{transactions:,} rows ({rate:,.0f} rows/s)", flush=True)
+
+        if materialize:
+            materialize_enriched(con, incremental=False)
+        con.execute(enriched_view_sql(materialize))
+        if rollups:
+            for name in ROLLUPS:
+                con.execute(rollup_create_sql(name))
+
+        counts = {t: con.execute(f"SELECT COUNT(*) FROM {SCHEMA}.{t}").fetchone()[0] for t in DDL}
+        con.execute("CHECKPOINT;")
+    finally:
+        con.close()
+    tmp.replace(out)
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Generate a deterministic synthetic bank DuckDB at production scale for benchmarking."
+    )
+    parser.add_argument("--transactions", default="1M", help="fact table rows, e.g. 1M, 10M, 100M")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--start", default="2023-01-01", help="first transaction date")
+    parser.add_argument("--days", type=int, default=730, help="days covered by the transactions")
+    parser.add_argument("--zipf", type=float, default=1.1, help="merchant popularity skew (Zipf exponent)")
+    parser.add_argument("--materialize", action="store_true", help=f"store {SCHEMA}.{VIEW} as a sorted table")
+    parser.add_argument(
+        "--rollups",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="build the rollup tables used by ui.db.run_sql",
+    )
+    parser.add_argument("--out", type=Path, default=None, help="output file (default: data/duckdb/synthetic/...)")
+    args = parser.parse_args()
+
+    transactions = parse_scale(args.transactions)
+    out = args.out or OUT_DIR / f"bank_synth_{args.transactions.lower()}_s{args.seed}.duckdb"
+    print(f"Generating {transactions:,} transactions (seed {args.seed}) -> {out}")
+    counts = generate(
+        out,
+        transactions,
+        seed=args.seed,
+        start=date.fromisoformat(args.start),
+        days=args.days,
+        zipf_s=args.zipf,
+        materialize=args.materialize,
+        rollups=args.rollups,
+    )
+    print("Row counts:", counts)
+    print(f"OK: run the app or scripts/benchmark.py with DUCKDB_PATH={out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(REPO_ROOT))
+
+from benchmark import percentile
+from openrouter_stub import add_stub_arguments, config_from_args, serve
+from ui.db import SnapshotManager
+from ui.graph_client import FALLBACK_SQL, _build_messages, _openrouter_chat, _validate_sql
+from ui.intents import intents_enabled, match_intent
+from ui.result_cache import RESULT_CACHE
+from ui.validators import enforce_readonly
+
+DB_PATH = REPO_ROOT / "data" / "duckdb" / "bank_txn_analytics.duckdb"
+
+DEFAULT_QUESTIONS = [
+    "En çok harcama yapılan 10 merchant hangileri?",
+    "Kategori bazında toplam harcama nedir?",
+    "Ödeme tiplerine göre işlem sayısı",
+    "Son 10 işlem?",
+    "Cinsiyete göre harcama dağılımı",
+]
+
+# The path text2sql + the app take for one question, timed stage by stage
+STAGES = ["intent", "prompt", "llm", "validate", "readonly", "execute"]
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.completed = 0
+        self.rejected = 0
+
+    def add(self, timings: Dict[str, float], error_stage: str = "", rejected: bool = False) -> None:
+        with self._lock:
+            for stage, ms in timings.items():
+                self.samples[stage].append(ms)
+            if error_stage:
+                self.errors[error_stage] += 1
+            else:
+                self.completed += 1
+            self.rejected += int(rejected)
+
+
+def one_question(
+    db: SnapshotManager, question: str, role: str, model: str, limit: int, cache, stream: bool = False,
+    intents: bool = False,
+) -> tuple:
+    """Runs one question through the full pipeline; returns (stage timings ms, error stage, rejected)."""
+    t: Dict[str, float] = {}
+    start = mark = time.perf_counter()
+
+    def lap(stage: str) -> None:
+        nonlocal mark
+        now = time.perf_counter()
+        t[stage] = (now - mark) * 1000
+        mark = now
+
+    match = match_intent(question) if intents else None
+    if intents:
+        lap("intent")
+    if match is not None:
+        sql, ok, llm_failed = match.sql, True, False
+    else:
+        sql, ok, llm_failed = _ask_llm(question, role, model, stream, lap)
+    rejected = not ok and not llm_failed
+    if not ok:
+        sql = FALLBACK_SQL
+    error_stage = "llm" if llm_failed else ""
+    try:
+        safe_sql = enforce_readonly(sql, default_limit=limit)
+        lap("readonly")
+        db.query(safe_sql, role=role, cache=cache)
+        lap("execute")
+    except Exception:
+        error_stage = "execute"
+    t["total"] = (time.perf_counter() - start) * 1000
+    return t, error_stage, rejected
+
+
+def _ask_llm(question: str, role: str, model: str, stream: bool, lap) -> tuple:
+    """Prompt + LLM call + validation; returns (sql, valid, llm failed)."""
+    messages = _build_messages(question, role)
+    lap("prompt")
+    try:
+        sql = (_openrouter_chat(messages, model=model, debug=False, stream=stream)["obj"].get("sql") or "").strip()
+        lap("llm")
+        ok, _ = _validate_sql(sql)
+        lap("validate")
+    except Exception:
+        # text2sql answers with the fallback query when the LLM call fails
+        lap("llm")
+        sql, ok = FALLBACK_SQL, False
+        llm_failed = True
+    else:
+        llm_failed = False
+    return sql, ok, llm_failed
+
+
+def user_loop(
+    db: SnapshotManager,
+    recorder: Recorder,
+    questions: List[str],
+    deadline: float,
+    requests: int,
+    think_ms: float,
+    rng: random.Random,
+    **kwargs,
+) -> None:
+    done = 0
+    while time.monotonic() < deadline and (requests <= 0 or done < requests):
+        timings, error_stage, rejected = one_question(db, rng.choice(questions), **kwargs)
+        recorder.add(timings, error_stage, rejected)
+        done += 1
+        if think_ms > 0:
+            time.sleep(rng.expovariate(1000 / think_ms))
+
+
+def report(recorder: Recorder, wall_s: float, users: int) -> dict:
+    stages = {}
+    for stage in STAGES + ["total"]:
+        xs = recorder.samples.get(stage)
+        if xs:
+            stages[stage] = {
+                "n": len(xs),
+                "p50_ms": round(percentile(xs, 50), 1),
+                "p95_ms": round(percentile(xs, 95), 1),
+                "p99_ms": round(percentile(xs, 99), 1),
+            }
+    return {
+        "users": users,
+        "wall_s": round(wall_s, 2),
+        "completed": recorder.completed,
+        "throughput_qps": round(recorder.completed / wall_s, 2) if wall_s else 0.0,
+        "rejected_sql": recorder.rejected,
+        "errors": dict(recorder.errors),
+        "stages": stages,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Drive N concurrent users through prompt build, LLM call, validation and DuckDB execution."
+    )
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds to run")
+    parser.add_argument("--requests", type=int, default=0, help="questions per user (0 = until --duration)")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="mean pause between a user's questions")
+    parser.add_argument("--questions", type=Path, default=None, help="file with one question per line")
+    parser.add_argument("--role", default="bank_employee", choices=["bank_employee", "manager", "auditor"])
+    parser.add_argument("--limit", type=int, default=200, help="default LIMIT for enforce_readonly")
+    parser.add_argument("--db", default=os.getenv("DUCKDB_PATH", str(DB_PATH)))
+    parser.add_argument("--result-cache", action="store_true",
+                        help="serve repeated queries from the result cache (off: every query hits DuckDB)")
+    parser.add_argument("--intents", action=argparse.BooleanOptionalAction, default=intents_enabled(),
+                        help="answer common question shapes locally (--no-intents: every question hits the LLM)")
+    parser.add_argument("--stream", action="store_true", help="read LLM answers as server-sent events")
+    parser.add_argument("--stub", action=argparse.BooleanOptionalAction, default=True,
+                        help="start the OpenRouter stub in-process (--no-stub: use OPENROUTER_BASE_URL)")
+    parser.add_argument("--out", type=Path, default=None, help="write the report as JSON here")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server = None
+    if args.stub:
+        stub_config = config_from_args(args)
+        server = serve(stub_config, port=0)
+        os.environ["OPENROUTER_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/api/v1"
+        os.environ.setdefault("OPENROUTER_API_KEY", "stub")
+    print("LLM endpoint:", os.getenv("OPENROUTER_BASE_URL", "(default OpenRouter)"))
+
+    questions = DEFAULT_QUESTIONS
+    if args.questions is not None:
+        questions = [q.strip() for q in args.questions.read_text(encoding="utf-8").splitlines() if q.strip()]
+    model = os.getenv("OPENROUTER_MODEL", "openai/gpt-5.1-codex-max").strip()
+
+    db = SnapshotManager(args.db)
+    recorder = Recorder()
+    seed = args.seed if args.seed is not None else 0
+    deadline = time.monotonic() + args.duration
+    threads = [
+        threading.Thread(
+            target=user_loop,
+            args=(db, recorder, questions, deadline, args.requests, args.think_ms, random.Random(seed + i)),
+            kwargs={"role": args.role, "model": model, "limit": args.limit,
+                    "cache": RESULT_CACHE if args.result_cache else None, "stream": args.stream,
+                    "intents": args.intents},
+            name=f"user-{i}",
+            daemon=True,
+        )
+        for i in range(max(1, args.users))
+    ]
+    started = time.perf_counter()
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    wall = time.perf_counter() - started
+
+    result = report(recorder, wall, len(threads))
+    if server is not None:
+        result["stub"] = dict(stub_config.counts)
+        server.shutdown()
+    db.close()
+
+    print(f"{result['completed']} questions in {result['wall_s']} s -> {result['throughput_qps']} q/s "
+          f"({result['users']} users)")
+    print("Errors:", result["errors"] or "none", "| rejected SQL:", result["rejected_sql"])
+    for stage, s in result["stages"].items():
+        print(f"  {stage:<9} n={s['n']:<6} p50 {s['p50_ms']:>8.1f} ms  p95 {s['p95_ms']:>8.1f} ms  "
+              f"p99 {s['p99_ms']:>8.1f} ms")
+    if args.out is not None:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+        print("Wrote", args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
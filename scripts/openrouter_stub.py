@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(REPO_ROOT))
+
+from ui.quick_queries import QUICK_QUERIES
+
+# Canned answers: the first whose pattern matches the question wins, otherwise
+# one is picked at random. Patterns are matched case-insensitively.
+DEFAULT_ANSWERS: List[Dict[str, str]] = [
+    {"match": r"merchant|mağaza|işyeri", "sql": QUICK_QUERIES["Top 10 merchant (harcama)"].strip(),
+     "answer": "En çok harcama yapılan 10 işyeri."},
+    {"match": r"kategori", "sql": QUICK_QUERIES["Kategori bazlı harcama"].strip(),
+     "answer": "Kategori bazında toplam harcama."},
+    {"match": r"ödeme|mode", "sql": QUICK_QUERIES["Ödeme tipi dağılımı"].strip(),
+     "answer": "Ödeme tiplerine göre işlem dağılımı."},
+    {"match": r"son|latest", "sql": """
+        SELECT TransactionID, TransactionDate, CustomerName, Amount, MerchantName
+        FROM bank.v_transactions_enriched
+        ORDER BY TransactionDate DESC, TransactionID DESC
+        LIMIT 10
+     """.strip(), "answer": "Son 10 işlem."},
+    {"match": r"cinsiyet|gender", "sql": """
+        SELECT Gender, SUM(Amount) AS total_spend, COUNT(*) AS txn_count
+        FROM bank.v_transactions_enriched
+        GROUP BY Gender
+        ORDER BY total_spend DESC
+        LIMIT 10
+     """.strip(), "answer": "Cinsiyete göre harcama."},
+]
+
+# Served with --invalid-rate to exercise the validation fallback
+INVALID_ANSWER = {"sql": "SELECT * FROM information_schema.tables", "answer": "Tüm tablolar."}
+
+# With "stream": true, the first chunk comes after this share of the sampled
+# latency and the remainder is spread evenly over chunks of this many characters
+STREAM_TTFT_SHARE = 0.3
+STREAM_CHUNK_CHARS = 16
+
+_QUESTION_RE = re.compile(r"Question \(Turkish\):\s*(.*)", re.S)
+
+
+class Latency:
+    """
+    Response delay in seconds, parsed from a spec:
+      fixed:MS | uniform:MIN_MS,MAX_MS | lognormal:MEDIAN_MS,SIGMA
+    """
+
+    def __init__(self, spec: str):
+        kind, _, args = spec.partition(":")
+        self.kind = kind.strip().lower()
+        self.args = [float(a) for a in args.split(",") if a.strip()]
+        if self.kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"unknown latency distribution: {spec}")
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            ms = self.args[0]
+        elif self.kind == "uniform":
+            ms = rng.uniform(self.args[0], self.args[1])
+        else:
+            ms = self.args[0] * rng.lognormvariate(0.0, self.args[1] if len(self.args) > 1 else 0.5)
+        return max(0.0, ms) / 1000
+
+
+class StubConfig:
+    def __init__(
+        self,
+        latency: str = "lognormal:800,0.5",
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        invalid_rate: float = 0.0,
+        answers: Optional[List[Dict[str, str]]] = None,
+        seed: Optional[int] = None,
+    ):
+        self.latency = Latency(latency)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.invalid_rate = invalid_rate
+        self.answers = answers or DEFAULT_ANSWERS
+        self._patterns = [re.compile(a["match"], re.IGNORECASE) for a in self.answers]
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0, "invalid": 0}
+
+    def roll(self) -> tuple[float, float]:
+        # One lock-protected draw per request keeps a seeded run reproducible
+        with self._lock:
+            return self._rng.random(), self.latency.sample(self._rng)
+
+    def answer(self, question: str, r: float) -> Dict[str, str]:
+        if r < self.invalid_rate:
+            return INVALID_ANSWER
+        for pattern, answer in zip(self._patterns, self.answers):
+            if pattern.search(question):
+                return answer
+        with self._lock:
+            return self._rng.choice(self.answers)
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.counts["requests"] += 1
+            self.counts[key] += 1
+
+
+def _handler(config: StubConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like OpenRouter
+
+        def log_message(self, format, *args):  # noqa: A002 - stdlib signature
+            pass
+
+        def _reply(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _stream(self, request: Dict[str, Any], content: str, duration: float) -> None:
+            """Sends `content` as OpenRouter-style SSE chunks spread over `duration` seconds."""
+            gen_id = f"gen-stub-{uuid.uuid4().hex[:16]}"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            def event(body: Any) -> None:
+                data = body if isinstance(body, str) else json.dumps(body, ensure_ascii=False)
+                self.wfile.write(f"data: {data}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            self.wfile.write(b": OPENROUTER PROCESSING\n\n")
+            chunks = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)]
+            for chunk in chunks:
+                event({"id": gen_id, "model": request.get("model", "stub"),
+                       "choices": [{"index": 0, "delta": {"role": "assistant", "content": chunk},
+                                    "finish_reason": None}]})
+                time.sleep(duration / max(1, len(chunks)))
+            event({"id": gen_id, "model": request.get("model", "stub"),
+                   "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                   "usage": {"prompt_tokens": 0, "completion_tokens": len(content) // 4,
+                             "total_tokens": len(content) // 4}})
+            event("[DONE]")
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/stats"):
+                self._reply(200, dict(config.counts))
+            else:
+                self._reply(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._reply(404, {"error": {"message": "not found"}})
+                return
+            try:
+                request = json.loads(body)
+                user = next(m["content"] for m in reversed(request["messages"]) if m["role"] == "user")
+            except (ValueError, KeyError, StopIteration):
+                self._reply(400, {"error": {"message": "malformed chat request"}})
+                return
+
+            r, delay = config.roll()
+            streamed = bool(request.get("stream"))
+            # Streamed replies start after part of the latency; the rest is spread over the chunks
+            time.sleep(delay * (STREAM_TTFT_SHARE if streamed else 1.0))
+            if r < config.rate_limit_rate:
+                config.count("rate_limited")
+                self._reply(429, {"error": {"message": "rate limited"}}, {"Retry-After": "1"})
+                return
+            if r < config.rate_limit_rate + config.error_rate:
+                config.count("errors")
+                self._reply(502, {"error": {"message": "upstream error"}})
+                return
+
+            match = _QUESTION_RE.search(user)
+            # Re-scale r so the invalid-answer draw is independent of the error draws
+            spent = config.rate_limit_rate + config.error_rate
+            answer = config.answer(match.group(1) if match else user, (r - spent) / max(1e-9, 1 - spent))
+            config.count("invalid" if answer is INVALID_ANSWER else "ok")
+            content = json.dumps({"sql": answer["sql"], "answer": answer["answer"]}, ensure_ascii=False)
+            if streamed:
+                self._stream(request, content, delay * (1 - STREAM_TTFT_SHARE))
+                return
+            self._reply(200, {
+                "id": f"gen-stub-{uuid.uuid4().hex[:16]}",
+                "model": request.get("model", "stub"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": len(body) // 4, "completion_tokens": len(content) // 4,
+                          "total_tokens": (len(body) + len(content)) // 4},
+            })
+
+    return Handler
+
+
+def serve(config: StubConfig, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    """Starts the stub on a daemon thread; its base URL is http://HOST:PORT/api/v1."""
+    server = ThreadingHTTPServer((host, port), _handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="openrouter-stub", daemon=True).start()
+    return server
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", default="lognormal:800,0.5",
+                        help="fixed:MS | uniform:MIN_MS,MAX_MS | lognormal:MEDIAN_MS,SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 502")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0,
+                        help="fraction of requests answered with 429 (Retry-After: 1)")
+    parser.add_argument("--invalid-rate", type=float, default=0.0,
+                        help="fraction of answers with SQL that fails validation")
+    parser.add_argument("--answers", type=Path, default=None,
+                        help='JSON list of {"match", "sql", "answer"} replacing the canned answers')
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def config_from_args(args: argparse.Namespace) -> StubConfig:
+    answers = json.loads(args.answers.read_text(encoding="utf-8")) if args.answers else None
+    return StubConfig(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        invalid_rate=args.invalid_rate,
+        answers=answers,
+        seed=args.seed,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Local OpenRouter-compatible /api/v1/chat/completions stub for load tests."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server = serve(config_from_args(args), args.host, args.port)
+    print(f"Stub listening: OPENROUTER_BASE_URL=http://{args.host}:{server.server_port}/api/v1")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
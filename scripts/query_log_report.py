@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(REPO_ROOT))
+
+from ui.query_log import DEFAULT_LOG_DIR, QueryLog
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Top questions, slowest SQL and cache hit rates from the app's query log."
+    )
+    parser.add_argument("--dir", type=Path, default=DEFAULT_LOG_DIR, help="query log directory (QUERY_LOG_DIR)")
+    parser.add_argument("--days", type=float, default=7, help="look back this many days (0 = everything)")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--compact", action="store_true", help="merge the log's segments into one file first")
+    args = parser.parse_args()
+
+    log = QueryLog(args.dir)
+    if args.compact:
+        print(f"Compacted {log.compact()} segments")
+    if not log.segments():
+        print(f"No query log under {args.dir}")
+        return
+    days = args.days or None
+
+    pd.set_option("display.width", 200)
+    pd.set_option("display.max_colwidth", 80)
+    print(f"Query log: {args.dir} ({len(log.segments())} segments)\n")
+    print("Top questions")
+    print(log.top_questions(args.top, days=days).to_string(index=False), "\n")
+    print("Slowest SQL (p95 exec ms)")
+    slowest = log.slowest_sql(args.top, days=days)
+    slowest["sql"] = slowest["sql"].str.split().str.join(" ")
+    print(slowest.to_string(index=False), "\n")
+    print("Cache hit rates per day")
+    print(log.cache_rates(days=days).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,84 @@ from pathlib import Path
 import duckdb
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(REPO_ROOT))
+
+from ui.db import resolve_db_path
+
 DB_PATH = REPO_ROOT / "data" / "duckdb" / "bank_txn_analytics.duckdb"
 
+# "Dashboard style" queries, also timed by scripts/benchmark.py
+SMOKE_QUERIES = [
+    (
+        "Preview enriched view",
+        "SELECT * FROM bank.v_transactions_enriched ORDER BY TransactionDate, TransactionID LIMIT 5;",
+    ),
+    (
+        "Top merchants by total spend",
+        """
+        SELECT MerchantName, SUM(Amount) AS total_spend
+        FROM bank.v_transactions_enriched
+        GROUP BY MerchantName
+        ORDER BY total_spend DESC
+        LIMIT 10;
+        """,
+    ),
+    (
+        "Spend by merchant category",
+        """
+        SELECT MerchantCategory, SUM(Amount) AS total_spend, COUNT(*) AS txn_count
+        FROM bank.v_transactions_enriched
+        GROUP BY MerchantCategory
+        ORDER BY total_spend DESC;
+        """,
+    ),
+    (
+        "Payment mode distribution",
+        """
+        SELECT Mode, COUNT(*) AS txn_count, SUM(Amount) AS total_amount
+        FROM bank.v_transactions_enriched
+        GROUP BY Mode
+        ORDER BY txn_count DESC;
+        """,
+    ),
+    (
+        "Gender-wise spend",
+        """
+        SELECT Gender, SUM(Amount) AS total_spend, COUNT(*) AS txn_count
+        FROM bank.v_transactions_enriched
+        GROUP BY Gender
+        ORDER BY total_spend DESC;
+        """,
+    ),
+    (
+        "Age group-wise spend (bucketed)",
+        """
+        SELECT
+          CASE
+            WHEN Age BETWEEN 18 AND 25 THEN '18-25'
+            WHEN Age BETWEEN 26 AND 35 THEN '26-35'
+            WHEN Age BETWEEN 36 AND 45 THEN '36-45'
+            WHEN Age BETWEEN 46 AND 60 THEN '46-60'
+            ELSE '60+'
+          END AS age_group,
+          SUM(Amount) AS total_spend,
+          COUNT(*) AS txn_count
+        FROM bank.v_transactions_enriched
+        GROUP BY age_group
+        ORDER BY total_spend DESC;
+        """,
+    ),
+    (
+        "Potential suspicious transactions (high amount)",
+        """
+        SELECT TransactionID, TransactionDate, CustomerName, Amount, Mode, MerchantName, MerchantCategory, City
+        FROM bank.v_transactions_enriched
+        WHERE Amount >= 10000
+        ORDER BY Amount DESC, TransactionDate DESC;
+        """,
+    ),
+]
+
 def run_query(con: duckdb.DuckDBPyConnection, name: str, sql: str, limit_preview: int = 10) -> None:
     print("\n" + "=" * 80)
     print(f"TEST: {name}")
@@ -33,11 +109,14 @@ def assert_exists(con: duckdb.DuckDBPyConnection, object_name: str) -> None:
         raise RuntimeError(f"Missing required object: {object_name}")
 
 def main() -> int:
-    if not DB_PATH.exists():
-        print(f"ERROR: DB file not found: {DB_PATH}")
+    # Follow the published snapshot if the builder wrote one
+    version, db_path = resolve_db_path(str(DB_PATH))
+    if not Path(db_path).exists():
+        print(f"ERROR: DB file not found: {db_path}")
         return 2
 
-    con = duckdb.connect(str(DB_PATH))
+    print(f"DB: {db_path} (snapshot: {version})")
+    con = duckdb.connect(db_path, read_only=True)
 
     # 1) Confirm objects exist
     required = [
@@ -71,66 +150,8 @@ def main() -> int:
     print(desc)
 
     # 5) Run “dashboard style” smoke queries
-    run_query(con, "Preview enriched view",
-              "SELECT * FROM bank.v_transactions_enriched ORDER BY TransactionDate, TransactionID LIMIT 5;")
-
-    run_query(con, "Top merchants by total spend",
-              """
-              SELECT MerchantName, SUM(Amount) AS total_spend
-              FROM bank.v_transactions_enriched
-              GROUP BY MerchantName
-              ORDER BY total_spend DESC
-              LIMIT 10;
-              """)
-
-    run_query(con, "Spend by merchant category",
-              """
-              SELECT MerchantCategory, SUM(Amount) AS total_spend, COUNT(*) AS txn_count
-              FROM bank.v_transactions_enriched
-              GROUP BY MerchantCategory
-              ORDER BY total_spend DESC;
-              """)
-
-    run_query(con, "Payment mode distribution",
-              """
-              SELECT Mode, COUNT(*) AS txn_count, SUM(Amount) AS total_amount
-              FROM bank.v_transactions_enriched
-              GROUP BY Mode
-              ORDER BY txn_count DESC;
-              """)
-
-    run_query(con, "Gender-wise spend",
-              """
-              SELECT Gender, SUM(Amount) AS total_spend, COUNT(*) AS txn_count
-              FROM bank.v_transactions_enriched
-              GROUP BY Gender
-              ORDER BY total_spend DESC;
-              """)
-
-    run_query(con, "Age group-wise spend (bucketed)",
-              """
-              SELECT
-                CASE
-                  WHEN Age BETWEEN 18 AND 25 THEN '18-25'
-                  WHEN Age BETWEEN 26 AND 35 THEN '26-35'
-                  WHEN Age BETWEEN 36 AND 45 THEN '36-45'
-                  WHEN Age BETWEEN 46 AND 60 THEN '46-60'
-                  ELSE '60+'
-                END AS age_group,
-                SUM(Amount) AS total_spend,
-                COUNT(*) AS txn_count
-              FROM bank.v_transactions_enriched
-              GROUP BY age_group
-              ORDER BY total_spend DESC;
-              """)
-
-    run_query(con, "Potential suspicious transactions (high amount)",
-              """
-              SELECT TransactionID, TransactionDate, CustomerName, Amount, Mode, MerchantName, MerchantCategory, City
-              FROM bank.v_transactions_enriched
-              WHERE Amount >= 10000
-              ORDER BY Amount DESC, TransactionDate DESC;
-              """)
+    for name, sql in SMOKE_QUERIES:
+        run_query(con, name, sql)
 
     con.close()
     print("\nOK: smoke test completed successfully.")
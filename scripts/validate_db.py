@@ -1,8 +1,17 @@
-﻿import duckdb
+﻿import sys
+from pathlib import Path
+import duckdb
 
-DB = r"data/duckdb/bank_txn_analytics.duckdb"
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(REPO_ROOT))
 
-con = duckdb.connect(DB)
+from ui.db import resolve_db_path
+
+DB_PATH = REPO_ROOT / "data" / "duckdb" / "bank_txn_analytics.duckdb"
+
+version, path = resolve_db_path(str(DB_PATH))
+print(f"DB: {path} (snapshot: {version})")
+con = duckdb.connect(path, read_only=True)
 
 print("Tables in schema bank:")
 print(con.execute("""
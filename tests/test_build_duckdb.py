@@ -0,0 +1,114 @@
+import sys
+
+import duckdb
+import pytest
+
+import build_duckdb_from_sql as build
+
+CREATE_SQL = """
+CREATE TABLE Customers_Bank (CustomerID INT PRIMARY KEY, CustomerName VARCHAR(50), Gender VARCHAR(10), Age INT, City VARCHAR(50));
+CREATE TABLE Cards_Master (CardID INT PRIMARY KEY, CardType VARCHAR(20), IssuerBank VARCHAR(50), CustomerID INT);
+CREATE TABLE Merchants_Master (MerchantID INT PRIMARY KEY, MerchantName VARCHAR(50), Category VARCHAR(30), City VARCHAR(50));
+CREATE TABLE Transactions_Bank (TransactionID INT PRIMARY KEY, TransactionDate DATE, CustomerID INT, CardID INT, MerchantID INT, Amount DECIMAL(10,2), TransactionType VARCHAR(10), Mode VARCHAR(20), City VARCHAR(50));
+CREATE INDEX idx_txn_date ON bank.Transactions_Bank (TransactionDate);
+"""
+
+
+def insert_sql(amount: str, age: int) -> str:
+    return f"""
+INSERT INTO Customers_Bank VALUES (1, 'Ayşe Yılmaz', 'F', {age}, 'Ankara');
+INSERT INTO Cards_Master VALUES (10, 'Debit', 'Ziraat {age}', 1);
+INSERT INTO Merchants_Master VALUES (100, 'Migros {age}', 'Grocery', 'Ankara');
+INSERT INTO Transactions_Bank VALUES (1000, '2024-03-01', 1, 10, 100, {amount}, 'Debit', 'POS', 'Ankara');
+"""
+
+
+@pytest.fixture
+def sources(tmp_path, monkeypatch):
+    sql_dir = tmp_path / "sql"
+    sql_dir.mkdir()
+    out_db = tmp_path / "duckdb" / "bank.duckdb"
+    monkeypatch.setattr(build, "SQL_DIR", sql_dir)
+    monkeypatch.setattr(build, "SQL_CREATE", sql_dir / "Create_Tables.sql")
+    monkeypatch.setattr(build, "SQL_INSERT", sql_dir / "Insert_Table.sql")
+    monkeypatch.setattr(build, "OUT_DB", out_db)
+    monkeypatch.setattr(build, "SNAPSHOT_DIR", out_db.parent / "snapshots")
+    monkeypatch.setattr(build, "POINTER", out_db.with_suffix(".current"))
+    build.SQL_CREATE.write_text(CREATE_SQL, encoding="utf-8")
+    return build.SQL_INSERT
+
+
+def run_build(monkeypatch, *args: str) -> duckdb.DuckDBPyConnection:
+    monkeypatch.setattr(sys, "argv", ["build_duckdb_from_sql.py", *args])
+    build.main()
+    pointer = build.read_pointer()
+    return duckdb.connect(str(build.POINTER.parent / pointer["path"]), read_only=True)
+
+
+def view_rows(con: duckdb.DuckDBPyConnection) -> list:
+    return con.execute(
+        f"SELECT Amount, Age, MerchantName FROM {build.SCHEMA}.{build.VIEW} ORDER BY TransactionID"
+    ).fetchall()
+
+
+@pytest.mark.parametrize("materialize", ["--no-materialize", "--materialize"])
+def test_rebuild_when_every_table_changed(sources, monkeypatch, materialize):
+    sources.write_text(insert_sql("250.00", 30), encoding="utf-8")
+    con = run_build(monkeypatch, materialize)
+    assert [(float(a), age, m) for a, age, m in view_rows(con)] == [(250.0, 30, "Migros 30")]
+    con.close()
+
+    # Every table's rows change: nothing is carried over from the base snapshot
+    sources.write_text(insert_sql("99.50", 41), encoding="utf-8")
+    base = build.POINTER.parent / build.read_pointer()["path"]
+    old = build.load_manifest(base.with_suffix(".manifest.json"))
+    plan, copy_base = build.plan_snapshot(base, old, full=False)
+    assert not copy_base
+    assert plan["view_stale"] and plan["rollups_stale"] and plan["other_ddl"]
+
+    con = run_build(monkeypatch)
+    try:
+        assert [(float(a), age, m) for a, age, m in view_rows(con)] == [(99.5, 41, "Migros 41")]
+        rollup = con.execute(f"SELECT txn_count, total_amount FROM {build.SCHEMA}.r_demographics").fetchall()
+        assert [(n, float(total)) for n, total in rollup] == [(1, 99.5)]
+        indexes = con.execute("SELECT index_name FROM duckdb_indexes()").fetchall()
+        assert ("idx_txn_date",) in indexes
+    finally:
+        con.close()
+
+
+def test_rebuild_carries_over_unchanged_tables(sources, monkeypatch):
+    sources.write_text(insert_sql("250.00", 30), encoding="utf-8")
+    run_build(monkeypatch).close()
+
+    # Only the transactions change
+    sources.write_text(insert_sql("99.50", 30), encoding="utf-8")
+    con = run_build(monkeypatch)
+    try:
+        assert [(float(a), age, m) for a, age, m in view_rows(con)] == [(99.5, 30, "Migros 30")]
+        assert con.execute(f"SELECT count(*) FROM {build.SCHEMA}.r_daily_merchant").fetchone()[0] == 1
+    finally:
+        con.close()
+
+
+def test_materialized_refresh_picks_up_edited_transactions(sources, monkeypatch, capsys):
+    sources.write_text(insert_sql("250.00", 30), encoding="utf-8")
+    run_build(monkeypatch, "--materialize").close()
+
+    # A new transaction only: topped up in place
+    appended = "INSERT INTO Transactions_Bank VALUES (1001, '2024-03-02', 1, 10, 100, 12.00, 'Debit', 'ATM', 'Ankara');\n"
+    sources.write_text(insert_sql("250.00", 30) + appended, encoding="utf-8")
+    capsys.readouterr()
+    con = run_build(monkeypatch)
+    assert "Materialized (incremental)" in capsys.readouterr().out
+    assert [(float(a), age, m) for a, age, m in view_rows(con)] == [(250.0, 30, "Migros 30"), (12.0, 30, "Migros 30")]
+    con.close()
+
+    # The existing transaction's amount is edited in place: falls back to a full rebuild
+    sources.write_text(insert_sql("99.50", 30) + appended, encoding="utf-8")
+    con = run_build(monkeypatch)
+    try:
+        assert "Materialized (full)" in capsys.readouterr().out
+        assert [(float(a), age, m) for a, age, m in view_rows(con)] == [(99.5, 30, "Migros 30"), (12.0, 30, "Migros 30")]
+    finally:
+        con.close()
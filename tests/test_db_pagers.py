@@ -0,0 +1,76 @@
+import threading
+
+import duckdb
+import pytest
+
+from ui.db import SnapshotManager
+from ui.paging import PagerSession
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = tmp_path / "pagers.duckdb"
+    con = duckdb.connect(str(path))
+    con.execute("CREATE TABLE t AS SELECT range AS x FROM range(5000)")
+    con.close()
+    manager = SnapshotManager(str(path), max_pagers=2)
+    yield manager
+    manager.close()
+
+
+def refs(db) -> int:
+    return sum(e["refs"] for e in db._open.values())
+
+
+def test_pager_cap_closes_the_oldest(db):
+    first = db.open_pager("SELECT x FROM t WHERE x < 100")
+    second = db.open_pager("SELECT x FROM t WHERE x < 200")
+    assert db.stats()["pagers_open"] == 2 and refs(db) == 2
+
+    third = db.open_pager("SELECT x FROM t WHERE x < 300")
+    assert first.closed and not second.closed and not third.closed
+    assert db.stats()["pagers_open"] == 2 and db.stats()["pagers_evicted"] == 1
+    assert refs(db) == 2
+    assert len(third.page(0, 50)) == 50
+
+    for pager in (second, third):
+        pager.close()
+    assert db.stats()["pagers_open"] == 0 and refs(db) == 0
+
+
+def test_failed_open_releases_its_place(db):
+    with pytest.raises(duckdb.Error):
+        db.open_pager("SELECT nope FROM t")
+    assert db.stats()["pagers_open"] == 0 and refs(db) == 0
+
+
+def test_concurrent_opens_stay_within_the_cap(db):
+    pagers, errors = [], []
+
+    def open_one(n):
+        try:
+            pagers.append(db.open_pager(f"SELECT x FROM t WHERE x < {n}"))
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=open_one, args=(n,)) for n in range(100, 2100, 100)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert sum(not p.closed for p in pagers) == db.stats()["pagers_open"] <= db.max_pagers
+    assert refs(db) == db.stats()["pagers_open"]
+
+
+def test_session_forgets_evicted_pagers(db):
+    session = PagerSession()
+    session.put("a", db.open_pager("SELECT x FROM t"))
+    session.put("b", db.open_pager("SELECT x FROM t WHERE x > 10"))
+    other = db.open_pager("SELECT x FROM t WHERE x > 20")  # another session's
+    assert session.get("a") is None
+    assert session.keys() == ["b"]
+    assert session.get("b") is not None
+    other.close()
+    session.close()
+    assert db.stats()["pagers_open"] == 0
@@ -0,0 +1,92 @@
+import json
+
+import duckdb
+import pytest
+
+import export_metadata
+import ui.graph_client as graph_client
+from ui.catalog import Catalog
+
+
+@pytest.fixture
+def metadata(tmp_path, monkeypatch):
+    db = tmp_path / "bank_txn.duckdb"
+    con = duckdb.connect(str(db))
+    con.execute("CREATE SCHEMA bank")
+    con.execute("""
+        CREATE TABLE bank.Customers_Bank AS SELECT * FROM (VALUES
+            (1, 'Ayşe Yılmaz', 'F', 30, 'Ankara'),
+            (2, 'Mehmet Kaya', 'M', 45, 'İzmir'),
+            (3, 'Elif Demir', 'F', 52, 'Ankara')
+        ) t(CustomerID, CustomerName, Gender, Age, City)
+    """)
+    con.execute("""
+        CREATE TABLE bank.Transactions_Bank AS SELECT * FROM (VALUES
+            (1, DATE '2024-03-01', 1, 250.00::DECIMAL(10,2), 'POS'),
+            (2, DATE '2024-03-02', 2, 99.50::DECIMAL(10,2), 'Online')
+        ) t(TransactionID, TransactionDate, CustomerID, Amount, Mode)
+    """)
+    con.execute("""
+        CREATE VIEW bank.v_transactions_enriched AS
+        SELECT t.*, c.CustomerName, c.Gender, c.Age, c.City
+        FROM bank.Transactions_Bank t JOIN bank.Customers_Bank c USING (CustomerID)
+    """)
+    con.close()
+
+    out = tmp_path / "metadata"
+    monkeypatch.setattr(export_metadata, "DB_PATH", db)
+    monkeypatch.setattr(export_metadata, "OUT_DIR", out)
+    export_metadata.main()
+    return out
+
+
+def test_values_listed_only_for_categorical_columns(metadata):
+    tables = {t["table"]: t for t in json.loads((metadata / "schema.json").read_text(encoding="utf-8"))["tables"]}
+    for table in tables.values():
+        listed = {c["name"] for c in table["columns"] if "values" in c["stats"]}
+        assert not listed & {"CustomerName", "Gender", "Age"}
+    view = {c["name"]: c["stats"] for c in tables["bank.v_transactions_enriched"]["columns"]}
+    assert sorted(view["Mode"]["values"]) == ["Online", "POS"]
+    assert sorted(view["City"]["values"]) == ["Ankara", "İzmir"]
+    assert view["Age"]["min"] == 30 and view["Age"]["max"] == 45
+
+
+def test_row_counts_are_exact_when_unsampled(metadata):
+    tables = {t["table"]: t for t in json.loads((metadata / "schema.json").read_text(encoding="utf-8"))["tables"]}
+    assert tables["bank.Customers_Bank"]["row_count"] == 3
+    assert tables["bank.Customers_Bank"]["row_count_estimated"] is False
+    # Views are profiled in full, so their count is exact too
+    assert tables["bank.v_transactions_enriched"]["row_count"] == 2
+    assert tables["bank.v_transactions_enriched"]["sampled"] is False
+
+
+def test_prompt_facts_skip_personal_columns(metadata, monkeypatch):
+    catalog = Catalog(metadata / "allowlist.json", metadata / "schema.json")
+    monkeypatch.setattr(graph_client, "CATALOG", catalog)
+    # A schema.json written before the value allowlist still lists names
+    catalog.column_stats("bank.v_transactions_enriched")["CustomerName"]["values"] = ["Ayşe Yılmaz"]
+    view = "bank.v_transactions_enriched"
+    assert graph_client._column_fact(view, "CustomerName") == ""
+    assert graph_client._column_fact(view, "Mode") in ("  Mode: 'POS', 'Online'", "  Mode: 'Online', 'POS'")
+
+
+def test_sampled_tables_list_every_value(tmp_path, monkeypatch):
+    con = duckdb.connect()
+    con.execute("CREATE SCHEMA bank")
+    con.execute("""
+        CREATE TABLE bank.Transactions_Bank AS
+        SELECT range AS TransactionID, CASE WHEN range = 4321 THEN 'ATM' ELSE 'POS' END AS Mode,
+               CASE WHEN range % 2 = 0 THEN 'Online' ELSE 'Offline' END AS TransactionType,
+               'customer ' || range AS CustomerName
+        FROM range(10000)
+    """)
+    monkeypatch.setattr(export_metadata, "SAMPLE_ROWS", 100)
+    cols = [("TransactionID", "BIGINT"), ("Mode", "VARCHAR"), ("TransactionType", "VARCHAR"),
+            ("CustomerName", "VARCHAR")]
+    profile = export_metadata.profile_relation(con, "bank.Transactions_Bank", cols, 10000)
+    assert profile["sampled"] and profile["profiled_rows"] == 100
+    # The one ATM row is listed even though the sample almost surely missed it
+    assert profile["columns"]["Mode"]["values"] == ["POS", "ATM"]
+    assert profile["columns"]["TransactionType"]["values"] == ["Offline", "Online"]
+    assert "values" not in profile["columns"]["CustomerName"]
+    con.close()
@@ -0,0 +1,62 @@
+import shutil
+from datetime import date
+
+import duckdb
+import pytest
+
+from export_parquet import export_partitioned
+from ui.parquet import connect_parquet
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    con.execute("CREATE SCHEMA bank")
+    con.execute("""
+        CREATE TABLE bank.Transactions_Bank AS
+        SELECT i AS TransactionID, DATE '2024-01-01' + INTERVAL (i * 7) DAY AS TransactionDate,
+               CAST(i * 10 AS DECIMAL(10,2)) AS Amount
+        FROM range(20) r(i)
+    """)
+    yield con
+    con.close()
+
+
+def months(root) -> list:
+    read = connect_parquet(root)
+    try:
+        return read.execute(
+            "SELECT month, count(*) FROM bank.Transactions_Bank GROUP BY ALL ORDER BY month"
+        ).fetchall()
+    finally:
+        read.close()
+
+
+def test_incremental_export_replaces_months(con, tmp_path):
+    target = tmp_path / "transactions"
+    export_partitioned(con, "bank.Transactions_Bank", target)
+    expected = months(tmp_path)
+
+    written = export_partitioned(con, "bank.Transactions_Bank", target, since=date(2024, 3, 15))
+    assert written == ["year=2024/month=3", "year=2024/month=4", "year=2024/month=5"]
+    assert months(tmp_path) == expected
+    assert not (tmp_path / "transactions.replaced").exists()
+
+
+def test_export_recovers_from_an_interrupted_swap(con, tmp_path):
+    target = tmp_path / "transactions"
+    export_partitioned(con, "bank.Transactions_Bank", target)
+    expected = months(tmp_path)
+
+    # Died between parking February and moving its replacement in
+    parked = tmp_path / "transactions.replaced" / "year=2024" / "month=2"
+    parked.parent.mkdir(parents=True)
+    (target / "year=2024" / "month=2").replace(parked)
+    # Left inside target by the previous in-place swap
+    shutil.copytree(target / "year=2024" / "month=3", target / "year=2024" / "month=3.old")
+
+    export_partitioned(con, "bank.Transactions_Bank", target, since=date(2024, 4, 1))
+    assert (target / "year=2024" / "month=2").is_dir()
+    assert not (target / "year=2024" / "month=3.old").exists()
+    assert not (tmp_path / "transactions.replaced").exists()
+    assert months(tmp_path) == expected
@@ -0,0 +1,40 @@
+from datetime import date
+
+import pytest
+
+from ui.intents import MAX_N, match_intent
+
+TODAY = date(2024, 5, 10)
+
+
+@pytest.mark.parametrize(
+    "question, params",
+    [
+        ("son 10 işlem", {"n": 10}),
+        ("Son 20 işlemler", {"n": 20}),
+        ("2023 yılındaki son işlemler", {"since": "2023-01-01", "until": "2024-01-01"}),
+        ("2023 yılındaki son 20 işlem", {"n": 20, "since": "2023-01-01", "until": "2024-01-01"}),
+        ("mart 2024 son 5 işlem", {"n": 5, "since": "2024-03-01", "until": "2024-04-01"}),
+        (f"Son {MAX_N} işlem", {"n": MAX_N}),
+    ],
+)
+def test_latest_transactions(question, params):
+    m = match_intent(question, TODAY)
+    assert m is not None and m.intent == "latest_transactions"
+    assert m.params == params
+    assert m.sql.endswith(f"LIMIT {params.get('n', 10)}")
+
+
+@pytest.mark.parametrize("question", ["son işlemlerin ortalama tutarı", "müşteri sayısı"])
+def test_unknown_shapes_go_to_the_llm(question):
+    assert match_intent(question, TODAY) is None
+
+
+# A year-like number after "son"/"last" is the count, not a year; above MAX_N
+# the template would have to cap it, so the LLM answers instead.
+@pytest.mark.parametrize(
+    "question",
+    [f"Son {MAX_N + 1} işlem", "Son 2000 işlem", "last 1999 transactions", "Son 2000 işlem 2023"],
+)
+def test_counts_above_max_n_go_to_the_llm(question):
+    assert match_intent(question, TODAY) is None
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from ui.json_stream import JsonFieldStream
+
+DOC = {
+    "meta": {"sql": "not this one", "tags": ["a", "}", {"x": "]"}], "n": 1},
+    "rows": [[1, 2], [3, "\"]"]],
+    "ok": True,
+    "score": -1.5e3,
+    "nothing": None,
+    "sql": "SELECT 'a\\\\b', \"Ad\" FROM t WHERE x = 'Ş' -- ç\n\tLIMIT 5",
+    "answer": "İşlemler: \"son 5\" \U0001F4B3 {tamam}",
+}
+TEXT = json.dumps(DOC, ensure_ascii=True)
+
+
+def feed_all(chunks):
+    parser = JsonFieldStream()
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    return parser, events
+
+
+def split_at(text, *cuts):
+    bounds = [0, *cuts, len(text)]
+    return [text[a:b] for a, b in zip(bounds, bounds[1:])]
+
+
+def test_whole_document():
+    parser, events = feed_all([TEXT])
+    assert events == [("sql", DOC["sql"]), ("answer", DOC["answer"])]
+    assert parser.done and parser.fields == {"sql": DOC["sql"], "answer": DOC["answer"]}
+
+
+def test_every_split_point():
+    # Splits every escape (\\, \", \n, \uXXXX and surrogate pairs) between chunks
+    for cut in range(1, len(TEXT)):
+        parser, events = feed_all(split_at(TEXT, cut))
+        assert events == [("sql", DOC["sql"]), ("answer", DOC["answer"])], cut
+        assert parser.done
+
+
+def test_one_character_at_a_time():
+    parser, events = feed_all(list(TEXT))
+    assert [k for k, _ in events] == ["sql", "answer"]
+    assert parser.fields["answer"] == DOC["answer"]
+
+
+def test_sql_reported_before_answer_arrives():
+    k = TEXT.index('"answer"')
+    parser = JsonFieldStream()
+    assert parser.feed(TEXT[:k]) == [("sql", DOC["sql"])]
+    assert not parser.done
+    assert parser.feed(TEXT[k:]) == [("answer", DOC["answer"])]
+
+
+@pytest.mark.parametrize(
+    "prefix, suffix",
+    [
+        ("Here is the query:\n```json\n", "\n```"),
+        ("```\n", "\n```\nHope this helps."),
+        ("   \n", ""),
+    ],
+)
+def test_text_around_the_object(prefix, suffix):
+    parser, events = feed_all(split_at(prefix + TEXT + suffix, 3, len(prefix) + 7))
+    assert [k for k, _ in events] == ["sql", "answer"]
+    assert parser.done
+
+
+def test_text_after_the_object_is_ignored():
+    parser, events = feed_all([TEXT + ' {"sql": "SELECT 2"}'])
+    assert parser.fields["sql"] == DOC["sql"]
+    assert len(events) == 2
+
+
+@pytest.mark.parametrize("marker", ['"answer": "İşlem', '"answer": ', '"answ'])
+def test_truncated_stream(marker):
+    text = json.dumps({"sql": "SELECT 1", "answer": "İşlemler"}, ensure_ascii=False)
+    parser, events = feed_all([text[: text.index(marker) + len(marker)]])
+    assert events == [("sql", "SELECT 1")]
+    assert not parser.done
+    assert parser.fields == {"sql": "SELECT 1"}
+
+
+def test_truncated_inside_sql():
+    parser, events = feed_all(['{"sql": "SELECT 1 FROM t WHE'])
+    assert events == [] and parser.fields == {} and not parser.done
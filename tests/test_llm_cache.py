@@ -0,0 +1,88 @@
+import sqlite3
+
+import pytest
+
+from ui import llm_cache
+from ui.llm_cache import LLMCache, normalize_question
+
+
+@pytest.mark.parametrize(
+    "question, expected",
+    [
+        # Turkish casing: İ -> i and I -> ı, then ı folds to i
+        ("İSTANBUL", "istanbul"),
+        ("IĞDIR", "igdir"),
+        ("Iğdır", "igdir"),
+        ("ıstakoz", "istakoz"),
+        # Decomposed İ (I + combining dot above) folds the same way
+        ("I\u0307stanbul", "istanbul"),
+        ("İşlem ÖZETİ", "islem ozeti"),
+        ("Çağrı Ümit", "cagri umit"),
+        # Punctuation and symbols become spaces
+        ("son 10 işlem?", "son 10 islem"),
+        ("Tutar>1.000,50 TL!", "tutar 1 000 50 tl"),
+        ("kart/kredi-kartı", "kart kredi karti"),
+        # Whitespace of any kind collapses
+        ("  son\t10\n işlem  ", "son 10 islem"),
+        # Non-ASCII digits
+        ("son ١٠ işlem", "son 10 islem"),
+        ("", ""),
+        (None, ""),
+    ],
+)
+def test_normalize_question(question, expected):
+    assert normalize_question(question) == expected
+
+
+def test_question_variants_share_a_cache_entry(tmp_path):
+    cache = LLMCache(path=tmp_path / "cache.sqlite", allowlist_path=tmp_path / "allowlist.json")
+    cache.put("İstanbul'daki son 10 işlem?", "analyst", "m", {"sql": "SELECT 1"})
+    assert cache.get("istanbul daki  SON 10 islem", "analyst", "m") == {"sql": "SELECT 1"}
+    assert cache.get("istanbul daki son 10 islem", "analyst", "other") is None
+
+
+def last_used(cache: LLMCache) -> list[float]:
+    con = sqlite3.connect(str(cache.path))
+    try:
+        return [r[0] for r in con.execute("SELECT last_used FROM llm_cache")]
+    finally:
+        con.close()
+
+
+def test_hits_touch_last_used_at_most_once_per_interval(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    cache = LLMCache(path=tmp_path / "cache.sqlite", allowlist_path=tmp_path / "allowlist.json", touch_interval=60)
+    cache.put("son işlemler", "analyst", "m", {"sql": "SELECT 1"})
+
+    now[0] = 1030.0
+    assert cache.get("son işlemler", "analyst", "m") == {"sql": "SELECT 1"}
+    assert last_used(cache) == [1000.0]
+
+    now[0] = 1060.0
+    assert cache.get("son işlemler", "analyst", "m") == {"sql": "SELECT 1"}
+    assert last_used(cache) == [1060.0]
+
+    now[0] = 1100.0
+    assert cache.get("son işlemler", "analyst", "m") is not None
+    assert last_used(cache) == [1060.0]
+
+
+def test_lru_eviction_follows_touched_entries(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    cache = LLMCache(
+        path=tmp_path / "cache.sqlite", allowlist_path=tmp_path / "allowlist.json", max_entries=2, touch_interval=60
+    )
+    cache.put("a", "analyst", "m", {"sql": "a"})
+    now[0] += 1
+    cache.put("b", "analyst", "m", {"sql": "b"})
+
+    # "a" is read after the interval, so it is newer than "b" when "c" arrives
+    now[0] += 60
+    assert cache.get("a", "analyst", "m") == {"sql": "a"}
+    now[0] += 1
+    cache.put("c", "analyst", "m", {"sql": "c"})
+    assert cache.get("b", "analyst", "m") is None
+    assert cache.get("a", "analyst", "m") == {"sql": "a"}
+    assert cache.get("c", "analyst", "m") == {"sql": "c"}
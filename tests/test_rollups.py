@@ -0,0 +1,45 @@
+import duckdb
+import pytest
+
+from ui.rollups import ROLLUPS, SCHEMA, SOURCE_VIEW, rollup_create_sql, route_to_rollup
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    con.execute(f"CREATE SCHEMA {SCHEMA}")
+    con.execute(f"""
+        CREATE TABLE {SCHEMA}.{SOURCE_VIEW} AS
+        SELECT * FROM (VALUES
+            (DATE '2024-03-01', 'Migros', 'Grocery', 'POS', 'F', 30, 250.00::DECIMAL(10,2)),
+            (DATE '2024-03-01', 'Migros', 'Grocery', 'Online', 'M', 52, NULL),
+            (DATE '2024-03-02', 'Opet', 'Fuel', 'POS', 'M', 41, 1200.00::DECIMAL(10,2))
+        ) t(TransactionDate, MerchantName, MerchantCategory, Mode, Gender, Age, Amount)
+    """)
+    for name in ROLLUPS:
+        con.execute(rollup_create_sql(name))
+    yield con
+    con.close()
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        f"SELECT COUNT(*) FROM {SCHEMA}.{SOURCE_VIEW} WHERE Mode = 'Nope'",
+        f"SELECT COUNT(Amount) AS n FROM {SCHEMA}.{SOURCE_VIEW} WHERE Mode = 'Nope'",
+        f"SELECT COUNT(*), COUNT(Amount), SUM(Amount) FROM {SCHEMA}.{SOURCE_VIEW} WHERE Gender = 'X'",
+        f"SELECT COUNT(*), COUNT(Amount) FROM {SCHEMA}.{SOURCE_VIEW}",
+        f"SELECT Mode, COUNT(*) AS n, SUM(Amount) FROM {SCHEMA}.{SOURCE_VIEW} GROUP BY Mode ORDER BY Mode",
+    ],
+)
+def test_routed_answers_match_the_view(con, sql):
+    routed, rollup = route_to_rollup(con, sql)
+    assert rollup is not None
+    assert con.execute(routed).fetchall() == con.execute(sql).fetchall()
+    assert con.sql(routed).columns == con.sql(sql).columns
+
+
+def test_empty_filter_counts_zero(con):
+    sql = f"SELECT COUNT(*) FROM {SCHEMA}.{SOURCE_VIEW} WHERE Mode = 'Nope'"
+    routed, _ = route_to_rollup(con, sql)
+    assert con.execute(routed).fetchall() == [(0,)]
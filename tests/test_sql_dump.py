@@ -0,0 +1,78 @@
+from decimal import Decimal
+
+import duckdb
+import pytest
+
+from build_duckdb_from_sql import iter_statements, load_sql_file, parse_insert_values
+
+# Starts with a byte order mark, which the reader drops
+DUMP = "\ufeff" + """-- header comment; with a semicolon
+CREATE TABLE Notes (ID INT, Body VARCHAR(100), Amount DECIMAL(10,2), Score DOUBLE);
+/* block comment; spanning
+   two lines with 'quote' */
+INSERT INTO Notes VALUES (1, 'a;b', 12.50, -3), (2, 'It''s; fine', -0.75, 1.5e3);
+INSERT INTO Notes (ID, Body, Amount, Score) VALUES (3, NULL, NULL, .5); -- trailing; comment
+INSERT INTO Notes VALUES (4, 'dash -- not a comment', 0, +7), (5, 'slash /* not */ a comment', 100.00, NULL);
+INSERT INTO Notes VALUES (6, 'Ağaç İşleri ''x''', -12.34, 2)
+"""
+
+STATEMENTS = [
+    "CREATE TABLE Notes (ID INT, Body VARCHAR(100), Amount DECIMAL(10,2), Score DOUBLE)",
+    "INSERT INTO Notes VALUES (1, 'a;b', 12.50, -3), (2, 'It''s; fine', -0.75, 1.5e3)",
+    "INSERT INTO Notes (ID, Body, Amount, Score) VALUES (3, NULL, NULL, .5)",
+    "INSERT INTO Notes VALUES (4, 'dash -- not a comment', 0, +7), (5, 'slash /* not */ a comment', 100.00, NULL)",
+    "INSERT INTO Notes VALUES (6, 'Ağaç İşleri ''x''', -12.34, 2)",
+]
+
+
+@pytest.fixture
+def dump(tmp_path):
+    path = tmp_path / "dump.sql"
+    path.write_text(DUMP, encoding="utf-8")
+    return path
+
+
+# 1 and 2 split every quote, '' escape, comment marker and multi-byte character
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 8, 13, 64, 1 << 20])
+def test_statements_across_chunk_sizes(dump, chunk_size):
+    assert list(iter_statements(dump, chunk_size=chunk_size)) == STATEMENTS
+
+
+def test_parse_insert_values():
+    assert parse_insert_values(STATEMENTS[0]) is None
+    assert parse_insert_values(STATEMENTS[1]) == (
+        "bank", "Notes", None, [["1", "a;b", "12.50", "-3"], ["2", "It's; fine", "-0.75", "1.5e3"]]
+    )
+    assert parse_insert_values(STATEMENTS[2]) == (
+        "bank", "Notes", ["ID", "Body", "Amount", "Score"], [["3", None, None, ".5"]]
+    )
+    assert parse_insert_values(STATEMENTS[4]) == ("bank", "Notes", None, [["6", "Ağaç İşleri 'x'", "-12.34", "2"]])
+    assert parse_insert_values("INSERT INTO x.Notes VALUES (1, 'a')")[:2] == ("x", "Notes")
+
+
+@pytest.mark.parametrize(
+    "stmt",
+    [
+        "INSERT INTO Notes VALUES (1, upper('a'))",
+        "INSERT INTO Notes SELECT * FROM other",
+        "INSERT INTO Notes VALUES (1, 'a') ON CONFLICT DO NOTHING",
+    ],
+)
+def test_parse_insert_values_leaves_expressions(stmt):
+    assert parse_insert_values(stmt) is None
+
+
+@pytest.mark.parametrize("batch_rows", [1, 100])
+def test_load_sql_file(dump, batch_rows):
+    con = duckdb.connect()
+    con.execute("CREATE SCHEMA bank")
+    assert load_sql_file(con, dump, batch_rows=batch_rows) == 6
+    assert con.execute("SELECT * FROM bank.Notes ORDER BY ID").fetchall() == [
+        (1, "a;b", Decimal("12.50"), -3.0),
+        (2, "It's; fine", Decimal("-0.75"), 1500.0),
+        (3, None, None, 0.5),
+        (4, "dash -- not a comment", Decimal("0.00"), 7.0),
+        (5, "slash /* not */ a comment", Decimal("100.00"), None),
+        (6, "Ağaç İşleri 'x'", Decimal("-12.34"), 2.0),
+    ]
+    con.close()
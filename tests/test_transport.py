@@ -0,0 +1,203 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from ui.execution import QueryCancelled, QueryControl
+from ui.transport import Transport
+
+
+class ScriptedServer:
+    """
+    Local HTTP server answering POSTs from a script: one
+    (status, headers, delay_s, body) per request, in arrival order.
+    A body that is a list is sent as server-sent events, `delay_s` apart.
+    """
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.requests = []  # arrival times
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive and chunked streams, like OpenRouter
+
+            def log_message(self, format, *args):  # noqa: A002 - stdlib signature
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with server.lock:
+                    server.requests.append(time.monotonic())
+                    status, headers, delay, body = server.script.pop(0)
+                try:
+                    if isinstance(body, list):
+                        self.send_response(status)
+                        self.send_header("Content-Type", "text/event-stream")
+                        self.send_header("Transfer-Encoding", "chunked")
+                        self.end_headers()
+                        for event in [*(json.dumps(e) for e in body), "[DONE]"]:
+                            data = f"data: {event}\n\n".encode("utf-8")
+                            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                            self.wfile.flush()
+                            time.sleep(delay)
+                        self.wfile.write(b"0\r\n\r\n")
+                        return
+                    time.sleep(delay)
+                    data = json.dumps(body).encode("utf-8")
+                    self.send_response(status)
+                    for k, v in headers.items():
+                        self.send_header(k, v)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/chat/completions"
+        threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(*script):
+        servers.append(ScriptedServer(script))
+        return servers[-1]
+
+    yield start
+    for s in servers:
+        s.close()
+
+
+def transport(**kwargs):
+    kwargs = {"max_retries": 2, "backoff_base": 0.01, "backoff_cap": 0.5, "read_timeout": 5.0, **kwargs}
+    return Transport(pool_size=4, **kwargs)
+
+
+OK = (200, {}, 0, {"ok": True})
+
+
+@pytest.mark.parametrize("status", [429, 500, 502, 503, 504])
+def test_retries_transient_statuses(serve, status):
+    server = serve((status, {}, 0, {"error": "busy"}), OK)
+    attempts = []
+    assert transport().post_json(server.url, {}, {}, attempts) == {"ok": True}
+    assert [a["status"] for a in attempts] == [status, 200]
+    assert [a["attempt"] for a in attempts] == [1, 2]
+
+
+def test_honours_retry_after(serve):
+    server = serve((429, {"Retry-After": "0.3"}, 0, {}), OK)
+    assert transport().post_json(server.url, {}, {}) == {"ok": True}
+    assert server.requests[1] - server.requests[0] >= 0.3
+
+
+def test_retry_after_is_capped(serve):
+    server = serve((503, {"Retry-After": "30"}, 0, {}), OK)
+    start = time.monotonic()
+    transport(backoff_cap=0.2).post_json(server.url, {}, {})
+    assert time.monotonic() - start < 2
+
+
+def test_gives_up_after_max_retries(serve):
+    server = serve(*[(502, {}, 0, {})] * 3)
+    attempts = []
+    with pytest.raises(requests.HTTPError):
+        transport(max_retries=2).post_json(server.url, {}, {}, attempts)
+    assert len(attempts) == 3 and len(server.requests) == 3
+
+
+@pytest.mark.parametrize("status", [400, 401, 403, 404, 422])
+def test_no_retry_on_client_errors(serve, status):
+    server = serve((status, {}, 0, {"error": "bad"}), OK)
+    attempts = []
+    with pytest.raises(requests.HTTPError):
+        transport().post_json(server.url, {}, {}, attempts)
+    assert len(attempts) == 1 and len(server.requests) == 1
+
+
+def test_hedge_returns_first_response_and_closes_the_loser(serve, monkeypatch):
+    server = serve((200, {}, 1.0, {"who": "slow"}), (200, {}, 0, {"who": "hedge"}))
+    t = transport(hedge_after=0.1)
+    closed = []
+    post = t.session.post
+
+    def spying_post(*args, **kwargs):
+        r = post(*args, **kwargs)
+        close = r.close
+        r.close = lambda: (closed.append(r.json()["who"]), close())
+        return r
+
+    monkeypatch.setattr(t.session, "post", spying_post)
+    attempts = []
+    start = time.monotonic()
+    assert t.post_json(server.url, {}, {}, attempts) == {"who": "hedge"}
+    assert time.monotonic() - start < 0.8
+    assert len(server.requests) == 2
+    # The slow attempt is closed once it answers, not read
+    deadline = time.monotonic() + 3
+    while "slow" not in closed and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert closed == ["slow"]
+    assert sorted(a["hedge"] for a in attempts) == [False, True]
+
+
+def test_no_hedge_when_the_first_answers_in_time(serve):
+    server = serve(OK, OK)
+    assert transport(hedge_after=0.5).post_json(server.url, {}, {}) == {"ok": True}
+    assert len(server.requests) == 1
+
+
+def test_cancel_while_waiting_for_the_response(serve):
+    server = serve((200, {}, 2.0, {"ok": True}))
+    control = QueryControl()
+    threading.Timer(0.2, control.cancel).start()
+    start = time.monotonic()
+    with pytest.raises(QueryCancelled):
+        transport().post_json(server.url, {}, {}, control=control)
+    assert time.monotonic() - start < 1.0
+
+
+def test_cancel_during_backoff(serve):
+    server = serve((429, {"Retry-After": "5"}, 0, {}), OK)
+    control = QueryControl()
+    threading.Timer(0.2, control.cancel).start()
+    start = time.monotonic()
+    with pytest.raises(QueryCancelled):
+        transport(backoff_cap=10).post_json(server.url, {}, {}, control=control)
+    assert time.monotonic() - start < 1.0
+    assert len(server.requests) == 1
+
+
+def test_stream_retries_then_streams(serve):
+    server = serve((503, {}, 0, {}), (200, {}, 0, [{"n": 1}, {"n": 2}]))
+    attempts = []
+    events = list(transport().post_stream(server.url, {}, {}, attempts))
+    assert events == [{"n": 1}, {"n": 2}]
+    assert [a["status"] for a in attempts] == [503, 200]
+
+
+def test_cancel_mid_stream(serve):
+    server = serve((200, {}, 1.0, [{"n": 1}, {"n": 2}, {"n": 3}]))
+    control = QueryControl()
+    received = []
+    start = time.monotonic()
+    with pytest.raises(QueryCancelled):
+        for event in transport().post_stream(server.url, {}, {}, control=control):
+            received.append(event)
+            threading.Timer(0.1, control.cancel).start()
+    assert received == [{"n": 1}]
+    assert time.monotonic() - start < 0.9
@@ -0,0 +1,35 @@
+import pytest
+
+from ui.graph_client import _validate_sql
+
+VIEW = "bank.v_transactions_enriched"
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        f"SELECT * FROM {VIEW} WHERE TransactionDate >= CURRENT_DATE - INTERVAL 30 DAY",
+        f"SELECT Amount FROM {VIEW} WHERE TransactionDate BETWEEN DATE '2024-01-01' AND current_date",
+        f"SELECT count(*) FROM {VIEW} WHERE TransactionDate < CAST(CURRENT_TIMESTAMP AS DATE)",
+        f"SELECT date_trunc('month', localtimestamp) AS m, sum(Amount) AS total FROM {VIEW}",
+        f"WITH t AS (SELECT Amount AS a FROM {VIEW}) SELECT a FROM t ORDER BY a LIMIT 5",
+    ],
+)
+def test_valid_queries_pass(sql):
+    assert _validate_sql(sql) == (True, "OK")
+
+
+@pytest.mark.parametrize(
+    "sql, error",
+    [
+        (f"SELECT Foo FROM {VIEW}", "Unknown column(s): ['foo']"),
+        # Only the bare keyword is exempt, not a column of that name
+        (f"SELECT v.current_date FROM {VIEW} v", "Unknown column(s): ['current_date']"),
+        ("SELECT * FROM bank.Customers_Bank", "Disallowed table(s)"),
+        (f"DELETE FROM {VIEW}", "Only SELECT/WITH allowed"),
+        (f"SELECT 1 FROM {VIEW}; SELECT 2", "Exactly one statement allowed"),
+    ],
+)
+def test_invalid_queries_fail(sql, error):
+    ok, message = _validate_sql(sql)
+    assert not ok and message.startswith(error)
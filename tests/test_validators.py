@@ -0,0 +1,60 @@
+import duckdb
+import pytest
+
+from ui.sql_analysis import analyze
+from ui.validators import enforce_readonly
+
+T = "range(100) t(x)"
+
+
+@pytest.fixture(scope="module")
+def con():
+    con = duckdb.connect()
+    con.execute(f"CREATE TABLE nums AS SELECT x FROM {T}")
+    yield con
+    con.close()
+
+
+@pytest.mark.parametrize(
+    "sql, expected, rows",
+    [
+        # No LIMIT: appended on its own line
+        ("SELECT x FROM nums ORDER BY x", "SELECT x FROM nums ORDER BY x\nLIMIT 7;", 7),
+        # Own outer LIMIT (with or without OFFSET) is kept as is
+        ("SELECT x FROM nums LIMIT 50", "SELECT x FROM nums LIMIT 50;", 50),
+        ("SELECT x FROM nums LIMIT 50 OFFSET 60", "SELECT x FROM nums LIMIT 50 OFFSET 60;", 40),
+        # A LIMIT inside a subquery or CTE does not bound the outer result
+        (
+            "SELECT * FROM (SELECT x FROM nums LIMIT 20) s",
+            "SELECT * FROM (SELECT x FROM nums LIMIT 20) s\nLIMIT 7;",
+            7,
+        ),
+        (
+            "WITH c AS (SELECT x FROM nums LIMIT 20) SELECT x FROM c",
+            "WITH c AS (SELECT x FROM nums LIMIT 20) SELECT x FROM c\nLIMIT 7;",
+            7,
+        ),
+        # LIMIT n% and OFFSET-only cannot take a second LIMIT clause: wrapped
+        ("SELECT x FROM nums LIMIT 50%", "SELECT * FROM (\nSELECT x FROM nums LIMIT 50%\n) LIMIT 7;", 7),
+        ("SELECT x FROM nums OFFSET 98", "SELECT * FROM (\nSELECT x FROM nums OFFSET 98\n) LIMIT 7;", 2),
+        # A trailing comment cannot swallow the LIMIT; a trailing ; is dropped
+        ("SELECT x FROM nums -- all of them", "SELECT x FROM nums -- all of them\nLIMIT 7;", 7),
+        ("SELECT x FROM nums LIMIT 10% -- some", "SELECT * FROM (\nSELECT x FROM nums LIMIT 10% -- some\n) LIMIT 7;", 7),
+        ("SELECT x FROM nums;", "SELECT x FROM nums\nLIMIT 7;", 7),
+        ("  SELECT x FROM nums LIMIT 3 ;  ", "SELECT x FROM nums LIMIT 3 ;", 3),
+    ],
+)
+def test_outer_limit(con, sql, expected, rows):
+    out = enforce_readonly(sql, default_limit=7)
+    assert out == expected
+    assert len(con.execute(out).fetchall()) == rows
+    assert analyze(out).outer_limit
+
+
+@pytest.mark.parametrize(
+    "sql",
+    ["", "DELETE FROM nums", "SELECT 1; SELECT 2", "SELECT * FROM nums; DROP TABLE nums", "SELEC 1"],
+)
+def test_rejected(sql):
+    with pytest.raises(ValueError):
+        enforce_readonly(sql)
@@ -1,20 +1,66 @@
 import os
 import sys
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
+from typing import Optional
 
 # Ensure repo root is importable when running `streamlit run ui/app.py`
 REPO_ROOT = Path(__file__).resolve().parents[1]
 sys.path.append(str(REPO_ROOT))
 
+import pandas as pd
 import streamlit as st
 
-from ui.db import init_conn, run_sql, get_schema_overview
+from ui.catalog import CATALOG
+from ui.db import SnapshotManager
+from ui.execution import ADMISSION, QueryCancelled, QueryControl
+from ui.jobs import CANCELLED, DONE, JOBS, LLM, QUEUED, SQL, Job, JobsFull
+from ui.paging import PagerSession
+from ui.query_log import QUERY_LOG
+from ui.quick_queries import QUICK_QUERIES
+from ui.result_cache import RESULT_CACHE
+from ui.tracing import profiling_enabled, start_exporters
 from ui.validators import enforce_readonly
-from ui.graph_client import text2sql
+from ui.graph_client import streaming_enabled, text2sql
+from ui.warmup import start_warmup
 
 
 st.set_page_config(page_title="Text2SQL", layout="wide")
 
+
+@st.cache_resource
+def shared_db(db_path: str, parquet_dir: Optional[str] = None) -> SnapshotManager:
+    # One read-only handle per snapshot for every session of this process;
+    # sessions only check out cursors. Follows published snapshots, so a
+    # rebuild never needs a restart.
+    return SnapshotManager(db_path, parquet_dir=parquet_dir)
+
+
+@st.cache_resource
+def early_pool() -> ThreadPoolExecutor:
+    # Opens result pagers for streamed SQL while the model is still writing its answer
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="early-sql")
+
+
+@st.cache_resource
+def cache_warmup(_db: SnapshotManager) -> dict:
+    # Once per process: replay the query log's most frequent questions and queries into the caches
+    return start_warmup(_db)
+
+
+# Entries kept in session state; older ones live on in the query log (ui.query_log)
+HISTORY_MAX = int(os.getenv("HISTORY_MAX", "50"))
+
+# METRICS_PORT / METRICS_FILE: Prometheus text export of stage timings (once per process)
+start_exporters()
+default_db = REPO_ROOT / "data" / "duckdb" / "bank_txn_analytics.duckdb"
+# PARQUET_DIR: serve bank.* from the partitioned export (scripts/export_parquet.py)
+db = shared_db(os.getenv("DUCKDB_PATH", str(default_db)), os.getenv("PARQUET_DIR") or None)
+warmup_status = cache_warmup(db)
+
 # ----------------------------
 # Session state init
 # ----------------------------
@@ -22,10 +68,401 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
 if "history" not in st.session_state:
     st.session_state.history = []
-if "conn" not in st.session_state:
-    default_db = REPO_ROOT / "data" / "duckdb" / "bank_txn_analytics.duckdb"
-    db_path = os.getenv("DUCKDB_PATH", str(default_db))
-    st.session_state.conn = init_conn(db_path)
+if "pagers" not in st.session_state:
+    # Open result cursors per history entry, under a per-session memory cap
+    st.session_state.pagers = PagerSession()
+if "controls" not in st.session_state:
+    # Cancel switch per history entry, shared by its pager's queries
+    st.session_state.controls = {}
+if "prefetch" not in st.session_state:
+    # (entry id, safe SQL) -> future of a pager opened before the answer finished
+    st.session_state.prefetch = {}
+
+
+def answer_job(
+    job: Job, question: str, role: str, debug: bool, stream: bool, auto_run: bool, limit: int, profile: bool,
+    pool: ThreadPoolExecutor,
+) -> dict:
+    """
+    Worker side of a question: the LLM answer and, with auto run, its pager,
+    left in job.outputs["prefetch"] (safe SQL -> future) for the result pane.
+    Runs off the script thread, so it must not touch st.session_state.
+    """
+    prefetch = job.outputs.setdefault("prefetch", {})
+
+    def start_early(sql: str, trace: dict) -> None:
+        # Streamed SQL passed validation: open its pager while the answer is still generating
+        if not auto_run:
+            return
+        safe_sql = enforce_readonly(sql, default_limit=limit)
+        prefetch[safe_sql] = pool.submit(
+            db.open_pager, safe_sql, trace=trace, role=role, control=job.control, profile=profile
+        )
+
+    job.stage(LLM)
+    result = text2sql(
+        question=question, role=role, debug=debug, stream=stream, on_sql=start_early, control=job.control
+    )
+    if not auto_run:
+        return result
+    job.stage(SQL)
+    try:
+        safe_sql = enforce_readonly(result["sql"], default_limit=limit)
+    except Exception:
+        return result  # the result pane reports it
+    for key in [k for k in prefetch if k != safe_sql]:
+        prefetch.pop(key).add_done_callback(_close_pager)
+    future = prefetch.get(safe_sql)
+    if future is not None:
+        # Opened while streaming: wait for it, so the job covers execution too
+        if future.exception() is not None and job.control.cancelled:
+            raise QueryCancelled("sorgu iptal edildi")
+    else:
+        future = prefetch[safe_sql] = Future()
+        try:
+            future.set_result(
+                db.open_pager(safe_sql, trace=result["trace"], role=role, control=job.control, profile=profile)
+            )
+        except QueryCancelled:
+            prefetch.pop(safe_sql)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+    return result
+
+
+def log_entry(entry: dict, tag: tuple, run: Optional[dict] = None, error: Optional[str] = None) -> None:
+    """
+    Appends the entry's query log record once per `tag`: ("run", run id) per
+    execution, ("error", message), ("cancel",), or ("unrun",) for a question
+    that leaves the history without having been executed.
+    """
+    logged = entry.setdefault("logged", set())
+    if QUERY_LOG is None or tag in logged:
+        return
+    logged.add(tag)
+    trace = entry.get("trace") or {}
+    exec_ms = None
+    if run is not None:
+        # A pager opened in the background was only waited for: take DuckDB's own time
+        exec_ms = trace.get("exec_ms", run["exec_ms"]) if run["early"] else run["exec_ms"]
+    QUERY_LOG.append({
+        "entry_id": entry["id"],
+        "question": entry.get("question"),
+        "role": entry.get("role"),
+        "model": trace.get("model"),
+        "path": trace.get("path") or ("quick" if trace.get("mode") == "quick_query" else None),
+        "intent": trace.get("intent"),
+        "sql": entry.get("sql") or None,
+        "executed_sql": run["key"][0] if run else None,
+        "sql_ok": trace.get("sql_ok"),
+        "answer": entry.get("answer") or None,
+        "error": error or trace.get("error"),
+        "cancelled": bool(entry.get("cancelled")),
+        "snapshot": run["key"][1] if run else None,
+        "llm_cache": trace.get("llm_cache"),
+        "result_cache": trace.get("result_cache"),
+        "rollup": trace.get("rollup"),
+        "llm_ms": sum(s["ms"] for s in trace.get("spans") or [] if s["stage"] == "llm_http") or None,
+        "queue_ms": trace.get("queue_ms"),
+        "exec_ms": exec_ms,
+        "fetch_ms": run["fetch_ms"] if run else None,
+        "total_rows": run["total_rows"] if run else None,
+    })
+
+
+def trim_history() -> None:
+    """Keeps the last HISTORY_MAX entries; older ones are logged (if never run) and their resources freed."""
+    history = st.session_state.history
+    while len(history) > HISTORY_MAX:
+        entry = history.pop(0)
+        if "job" in entry:
+            entry["job"].cancel()
+        if not entry.get("logged"):
+            log_entry(entry, ("unrun",))
+        forget_run(entry)
+        st.session_state.controls.pop(entry["id"], None)
+        for key in [k for k in st.session_state.pagers.keys() if k[0] == entry["id"]]:
+            st.session_state.pagers.discard(key)
+    # Two chat messages (question, answer) per entry
+    del st.session_state.messages[:-2 * HISTORY_MAX]
+
+
+def collect_jobs() -> None:
+    """Moves finished background answers into their history entries and the chat."""
+    for entry in st.session_state.history:
+        job = entry.get("job")
+        if job is None or not job.done:
+            continue
+        del entry["job"]
+        for safe_sql, future in job.outputs.get("prefetch", {}).items():
+            st.session_state.prefetch[(entry["id"], safe_sql)] = future
+        if job.state == DONE:
+            entry["sql"] = (job.result.get("sql") or "").strip()
+            entry["answer"] = (job.result.get("answer") or "").strip()
+            entry["trace"] = job.result.get("trace") or {}
+            content = entry["answer"] or "Sorgu üretildi."
+        elif job.state == CANCELLED:
+            entry["cancelled"] = True
+            content = "Soru iptal edildi."
+        else:
+            entry["trace"] = {"error": job.error}
+            content = f"Yanıt üretilemedi: {job.error}"
+        entry["trace"]["job"] = job.progress()
+        if job.state == CANCELLED:
+            log_entry(entry, ("cancel",))
+        elif job.state != DONE:
+            log_entry(entry, ("error", job.error), error=job.error)
+        st.session_state.messages.append({"role": "assistant", "content": content, "sql": entry["sql"]})
+    trim_history()
+
+
+STAGE_LABELS = {QUEUED: "Sırada", LLM: "LLM yanıtı bekleniyor", SQL: "Sorgu çalışıyor"}
+
+# Answers that come back this fast (templates, cached answers) are shown without a polling round
+INLINE_WAIT_S = 0.5
+
+
+@st.fragment(run_every=0.5)
+def pending_answers() -> None:
+    # Polls the session's background questions; a finished one reruns the whole app to show it
+    pending = [e for e in st.session_state.history if "job" in e]
+    if any(e["job"].done for e in pending):
+        st.rerun()
+    for entry in pending:
+        job = entry["job"]
+        with st.chat_message("assistant"):
+            st.caption(f"{STAGE_LABELS.get(job.state, job.state)}... {job.elapsed():.1f} sn")
+            if st.button("İptal et", key=f"cancel_{entry['id']}"):
+                job.cancel()
+
+
+def _close_pager(future) -> None:
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def drop_prefetch(keep=None) -> None:
+    """Closes early-opened pagers nobody will read (other entries, or SQL that changed)."""
+    prefetch = st.session_state.prefetch
+    for key in [k for k in prefetch if k != keep]:
+        prefetch.pop(key).add_done_callback(_close_pager)
+
+
+def run_cancellable(fn, control: QueryControl, status):
+    """
+    Runs fn() on a worker thread while the script keeps updating `status`.
+    Any rerun (the cancel button, or another widget) stops the script at one
+    of those updates; the query is then interrupted through `control`.
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        future = pool.submit(fn)
+        try:
+            while not future.done():
+                status.caption(f"Sorgu çalışıyor... {time.perf_counter() - start:.1f} sn")
+                time.sleep(0.2)
+        except BaseException:
+            control.cancel()
+            raise
+        finally:
+            status.empty()
+    return future.result()
+
+
+def timed(fn):
+    """fn wrapped to return (result, ms spent in fn), measured on the worker thread."""
+    def run():
+        start = time.perf_counter()
+        result = fn()
+        return result, round((time.perf_counter() - start) * 1000, 1)
+    return run
+
+
+def readonly_sql(entry: dict, limit: int) -> str:
+    """enforce_readonly once per (SQL, LIMIT) of a history entry, not on every rerun."""
+    memo_key = ((entry.get("sql") or "").strip(), limit)
+    if entry.get("safe_for") != memo_key:
+        entry["safe_sql"] = enforce_readonly(memo_key[0], default_limit=limit)
+        entry["safe_for"] = memo_key
+    return entry["safe_sql"]
+
+
+def forget_run(entry: dict) -> None:
+    """Drops an entry's execution result so the next run executes again."""
+    run = entry.pop("run", None)
+    if run is not None:
+        st.session_state.pagers.discard(run["pager_key"])
+
+
+def execute(entry: dict, safe_sql: str, key: tuple, role: str, profile_sql: bool, control, status) -> dict:
+    """Opens the entry's pager (or takes the one opened while streaming) and records the run."""
+    entry_id = entry["id"]
+    drop_prefetch(keep=(entry_id, safe_sql))
+    # Opened in the background: by the question's job, or while the answer was streaming
+    early = st.session_state.prefetch.pop((entry_id, safe_sql), None)
+    opened, exec_ms = run_cancellable(
+        timed(early.result if early is not None else lambda: db.open_pager(
+            safe_sql, trace=entry.setdefault("trace", {}), role=role, control=control, profile=profile_sql,
+        )),
+        control,
+        status,
+    )
+    pager_key = (entry_id,) + key
+    st.session_state.pagers.put(pager_key, opened)
+    entry["run"] = {
+        "id": uuid.uuid4().hex, "key": key, "pager_key": pager_key, "total_rows": opened.total_rows,
+        "exec_ms": exec_ms, "early": early is not None,
+        "page": None, "df": None, "fetch_ms": None, "reused": 0,
+    }
+    return entry["run"]
+
+
+@st.fragment
+def result_pane(last: dict, role: str, auto_run: bool, default_limit: int, profile_sql: bool, debug: bool) -> None:
+    # A fragment: its buttons and paging rerun only this pane, and a full
+    # rerun (sidebar, chat) reuses the entry's recorded run instead of executing again
+    sql_raw = (last.get("sql") or "").strip()
+    if "job" in last:
+        st.info("Yanıt hazırlanıyor; hazır olunca sonuç burada görünecek. Sohbetten iptal edebilirsiniz.")
+        return
+    if not sql_raw:
+        if last.get("cancelled"):
+            st.warning("Soru iptal edildi.")
+        else:
+            st.info("Bu soru için çalıştırılacak SQL yok.")
+        return
+
+    st.caption("Üretilen SQL")
+    st.code(sql_raw, language="sql")
+
+    col1, col2, col3 = st.columns([1, 1, 1])
+    with col1:
+        run_btn = st.button("SQL'i çalıştır", type="primary", use_container_width=True)
+    with col2:
+        explain_btn = st.button("Sadece doğrula (run yok)", type="secondary", use_container_width=True)
+    with col3:
+        cancel_btn = st.button("Sorguyu iptal et", type="secondary", use_container_width=True)
+
+    entry_id = last.setdefault("id", uuid.uuid4().hex)
+    controls = st.session_state.controls
+    if cancel_btn:
+        # The click already interrupted the running query (see run_cancellable)
+        last["cancelled"] = True
+        if "run" not in last:
+            log_entry(last, ("cancel",))
+        controls.pop(entry_id, QueryControl()).cancel()
+        drop_prefetch()
+        forget_run(last)
+        for key in [k for k in st.session_state.pagers.keys() if k[0] == entry_id]:
+            st.session_state.pagers.discard(key)
+    if run_btn:
+        last.pop("cancelled", None)
+
+    if last.get("cancelled"):
+        st.warning("Sorgu iptal edildi. Tekrar çalıştırmak için 'SQL'i çalıştır'a basın.")
+    elif auto_run or run_btn or "run" in last:
+        status = st.empty()
+        try:
+            safe_sql = readonly_sql(last, int(default_limit))
+            # The result stays valid until the SQL, the LIMIT or the snapshot changes
+            key = (safe_sql, db.fingerprint)
+            run = last.get("run")
+            if run is not None and run["key"] != key:
+                forget_run(last)
+                run = None
+            control = controls.setdefault(entry_id, QueryControl())
+            if run is None:
+                run = execute(last, safe_sql, key, role, profile_sql, control, status)
+
+            pcol1, pcol2 = st.columns([1, 1])
+            with pcol1:
+                page_size = st.selectbox("Sayfa boyutu", [50, 100, 200, 500], index=1, key="page_size")
+            with pcol2:
+                page_count = max(1, -(-run["total_rows"] // int(page_size)))
+                page_no = st.number_input(
+                    "Sayfa", min_value=1, max_value=page_count, value=1, step=1, key=f"page_{last['id']}"
+                )
+            page = (int(page_no), int(page_size))
+            if run["page"] == page:
+                run["reused"] += 1
+            else:
+                if st.session_state.pagers.get(run["pager_key"]) is None:
+                    # Evicted under the session's memory cap: execute again for the new page
+                    run = execute(last, safe_sql, key, role, profile_sql, control, status)
+                # Session state is not reachable from the worker thread: bind the pager session here
+                pagers, pager_key = st.session_state.pagers, run["pager_key"]
+                run["df"], run["fetch_ms"] = run_cancellable(
+                    timed(lambda: pagers.page(pager_key, page[0] - 1, page[1])), control, status
+                )
+                run["page"] = page
+                log_entry(last, ("run", run["id"]), run=run)
+            df = run["df"]
+            st.dataframe(df, use_container_width=True, height=420)
+            first = (page[0] - 1) * page[1]
+            st.caption(
+                f"Toplam {run['total_rows']} satır; {first + 1 if len(df) else 0}-{first + len(df)} "
+                f"gösteriliyor (sayfa {page[0]}/{page_count})."
+            )
+            timing = f"Çalıştırma {run['exec_ms']:.0f} ms, sayfa {run['fetch_ms']:.0f} ms"
+            if run["early"]:
+                timing = f"Çalıştırma arka planda, sayfa {run['fetch_ms']:.0f} ms"
+            if run["reused"]:
+                timing += " (önceki sonuç yeniden kullanıldı, sorgu tekrar çalışmadı)"
+            st.caption(timing)
+        except QueryCancelled as e:
+            # Timed out or cancelled: the pager cannot continue, open a fresh one next time
+            controls.pop(entry_id, None)
+            forget_run(last)
+            log_entry(last, ("error", str(e)), error=str(e))
+            st.error(f"Çalıştırma durduruldu: {e}")
+        except Exception as e:
+            log_entry(last, ("error", str(e)), error=str(e))
+            st.error(f"Çalıştırma hatası: {e}")
+
+    if explain_btn and not (auto_run or run_btn):
+        try:
+            safe_sql = readonly_sql(last, int(default_limit))
+            st.success("SQL read-only doğrulamasından geçti.")
+            st.code(safe_sql, language="sql")
+        except Exception as e:
+            st.error(f"Doğrulama hatası: {e}")
+
+    if debug:
+        trace = last.get("trace", {})
+        spans = trace.get("spans") or []
+        if spans:
+            st.caption("Aşama süreleri (ms)")
+            st.bar_chart(
+                pd.DataFrame(spans).groupby("stage", sort=False)["ms"].sum(), height=220
+            )
+        profile = trace.get("duckdb_profile")
+        if profile:
+            with st.expander("DuckDB sorgu profili", expanded=False):
+                st.json(profile)
+        st.caption("Trace")
+        st.json({k: v for k, v in trace.items() if k not in ("spans", "duckdb_profile")})
+        run = last.get("run")
+        if run is not None:
+            st.caption("Çalıştırma (bu kayıt)")
+            st.json({k: v for k, v in run.items() if k not in ("df", "pager_key", "key")})
+        st.caption("Sonuç önbelleği")
+        st.json(RESULT_CACHE.stats())
+        st.caption("Sayfalı sonuçlar (oturum)")
+        st.json(st.session_state.pagers.stats())
+        if QUERY_LOG is not None:
+            st.caption("Sorgu günlüğü")
+            st.json({**QUERY_LOG.stats(), "warmup": warmup_status})
+        st.caption("Arka plan soruları (tüm oturumlar)")
+        st.json(JOBS.stats())
+        st.caption("Sorgu kabulü (tüm oturumlar)")
+        st.json(ADMISSION.stats())
+        st.caption("DuckDB bağlantı havuzu (tüm oturumlar)")
+        st.json(db.stats())
+
+
+# Background questions that finished since the last run join the chat and history
+collect_jobs()
 
 
 # ----------------------------
@@ -35,15 +472,15 @@ st.sidebar.title("Ayarlar")
 
 role = st.sidebar.selectbox("Kullanıcı rolü", ["bank_employee", "manager", "auditor"])
 debug = st.sidebar.toggle("Debug/trace göster", value=True)
+profile_sql = st.sidebar.toggle("DuckDB profili yakala", value=profiling_enabled())
+stream_llm = st.sidebar.toggle("LLM yanıtını akışla al", value=streaming_enabled())
 auto_run = st.sidebar.toggle("SQL otomatik çalıştır", value=True)
 default_limit = st.sidebar.number_input("Varsayılan LIMIT", min_value=10, max_value=5000, value=200, step=10)
 
-# Show DB path
+# Show DB path and the snapshot version queries currently go to
 try:
-    # duckdb connection doesn't expose path reliably; store via env/default logic again
-    default_db = REPO_ROOT / "data" / "duckdb" / "bank_txn_analytics.duckdb"
-    db_path = os.getenv("DUCKDB_PATH", str(default_db))
-    st.sidebar.caption(f"DB: `{db_path}`")
+    st.sidebar.caption(f"DB: `{db.path}`")
+    st.sidebar.caption(f"Snapshot: `{db.version}`")
 except Exception:
     pass
 
@@ -53,7 +490,8 @@ st.sidebar.divider()
 st.sidebar.subheader("Şema (bank)")
 with st.sidebar.expander("Tablolar / View'lar", expanded=False):
     try:
-        schema_df = get_schema_overview(st.session_state.conn, schema_name="bank")
+        # Computed once per snapshot for all sessions, not on every rerun
+        schema_df = CATALOG.schema_overview(db, schema_name="bank")
         if schema_df.empty:
             st.info("Şema bilgisi bulunamadı. DB doğru mu?")
         else:
@@ -63,32 +501,16 @@ with st.sidebar.expander("Tablolar / View'lar", expanded=False):
 
 # Quick demo queries (optional but very useful in meetings)
 st.sidebar.subheader("Hızlı sorgular")
-quick_queries = {
-    "Top 10 merchant (harcama)": """
-        SELECT MerchantName, SUM(Amount) AS total_spend
-        FROM bank.v_transactions_enriched
-        GROUP BY MerchantName
-        ORDER BY total_spend DESC
-        LIMIT 10
-    """,
-    "Kategori bazlı harcama": """
-        SELECT MerchantCategory, SUM(Amount) AS total_spend, COUNT(*) AS txn_count
-        FROM bank.v_transactions_enriched
-        GROUP BY MerchantCategory
-        ORDER BY total_spend DESC
-        LIMIT 50
-    """,
-    "Ödeme tipi dağılımı": """
-        SELECT Mode, COUNT(*) AS txn_count, SUM(Amount) AS total_amount
-        FROM bank.v_transactions_enriched
-        GROUP BY Mode
-        ORDER BY txn_count DESC
-        LIMIT 50
-    """,
-}
-selected_quick = st.sidebar.selectbox("Seç", ["(yok)"] + list(quick_queries.keys()))
+selected_quick = st.sidebar.selectbox("Seç", ["(yok)"] + list(QUICK_QUERIES.keys()))
 run_quick = st.sidebar.button("Seçileni çalıştır", type="secondary", use_container_width=True)
 
+# Query log analytics: read from the log only while switched on
+show_log = False
+if QUERY_LOG is not None:
+    st.sidebar.subheader("Sorgu günlüğü")
+    show_log = st.sidebar.toggle("Günlük analizini göster", value=False)
+    log_days = st.sidebar.number_input("Son kaç gün", min_value=1, max_value=365, value=7, step=1)
+
 st.title("Text2SQL Chat (MVP)")
 
 left, right = st.columns([1, 1], gap="large")
@@ -103,25 +525,35 @@ with left:
     for m in st.session_state.messages:
         with st.chat_message(m["role"]):
             st.write(m["content"])
+            if m.get("sql"):
+                st.code(m["sql"], language="sql")
+
+    if any("job" in e for e in st.session_state.history):
+        pending_answers()
 
     question = st.chat_input("Sorunu yaz: örn. 'son 10 işlem?'")
     if question:
         st.session_state.messages.append({"role": "user", "content": question})
-        with st.chat_message("user"):
-            st.write(question)
-
-        result = text2sql(question=question, role=role, debug=debug)
-        sql = (result.get("sql") or "").strip()
-        answer = (result.get("answer") or "").strip()
-        trace = result.get("trace") or {}
-
-        st.session_state.history.append(
-            {"question": question, "sql": sql, "answer": answer, "trace": trace}
-        )
-
-        with st.chat_message("assistant"):
-            st.write(answer if answer else "Sorgu üretildi.")
-            st.code(sql, language="sql")
+        entry_id = uuid.uuid4().hex
+        drop_prefetch()
+        # The LLM call and first execution run on a shared worker; this script
+        # thread only polls, so the page stays usable and the job cancellable
+        job = Job(entry_id, st.session_state.controls.setdefault(entry_id, QueryControl()))
+        try:
+            JOBS.submit(job, partial(
+                answer_job, question=question, role=role, debug=debug, stream=stream_llm, auto_run=auto_run,
+                limit=int(default_limit), profile=profile_sql, pool=early_pool(),
+            ))
+            st.session_state.history.append(
+                {"id": entry_id, "question": question, "role": role, "sql": "", "answer": "", "trace": {}, "job": job}
+            )
+            trim_history()
+            deadline = time.perf_counter() + INLINE_WAIT_S
+            while not job.done and time.perf_counter() < deadline:
+                time.sleep(0.05)
+        except JobsFull as e:
+            st.session_state.messages.append({"role": "assistant", "content": str(e)})
+        st.rerun()
 
 
 # ----------------------------
@@ -132,43 +564,40 @@ with right:
 
     # Quick query execution block
     if run_quick and selected_quick != "(yok)":
-        sql_q = quick_queries[selected_quick].strip()
+        sql_q = QUICK_QUERIES[selected_quick].strip()
         st.session_state.history.append(
-            {"question": f"[quick] {selected_quick}", "sql": sql_q, "answer": "", "trace": {"mode": "quick_query"}}
+            {
+                "id": uuid.uuid4().hex,
+                "question": f"[quick] {selected_quick}",
+                "role": role,
+                "sql": sql_q,
+                "answer": "",
+                "trace": {"mode": "quick_query"},
+            }
         )
+        trim_history()
 
     if st.session_state.history:
-        last = st.session_state.history[-1]
-        sql_raw = (last.get("sql") or "").strip()
-
-        st.caption("Üretilen SQL")
-        st.code(sql_raw, language="sql")
-
-        col1, col2 = st.columns([1, 1])
-        with col1:
-            run_btn = st.button("SQL'i çalıştır", type="primary", use_container_width=True)
-        with col2:
-            explain_btn = st.button("Sadece doğrula (run yok)", type="secondary", use_container_width=True)
-
-        if auto_run or run_btn:
-            try:
-                safe_sql = enforce_readonly(sql_raw, default_limit=int(default_limit))
-                df = run_sql(st.session_state.conn, safe_sql)
-                st.dataframe(df, use_container_width=True, height=420)
-                st.caption(f"{len(df)} satır gösteriliyor.")
-            except Exception as e:
-                st.error(f"Çalıştırma hatası: {e}")
-
-        if explain_btn and not (auto_run or run_btn):
-            try:
-                safe_sql = enforce_readonly(sql_raw, default_limit=int(default_limit))
-                st.success("SQL read-only doğrulamasından geçti.")
-                st.code(safe_sql, language="sql")
-            except Exception as e:
-                st.error(f"Doğrulama hatası: {e}")
-
-        if debug:
-            st.caption("Trace")
-            st.json(last.get("trace", {}))
+        result_pane(st.session_state.history[-1], role, auto_run, int(default_limit), profile_sql, debug)
     else:
         st.info("Henüz soru sorulmadı.")
+
+
+# ----------------------------
+# Query log analytics
+# ----------------------------
+if show_log:
+    st.divider()
+    st.subheader(f"Sorgu günlüğü (son {int(log_days)} gün)")
+    try:
+        lcol1, lcol2 = st.columns([1, 1], gap="large")
+        with lcol1:
+            st.caption("En sık sorulan sorular")
+            st.dataframe(QUERY_LOG.top_questions(10, days=log_days), use_container_width=True, hide_index=True)
+        with lcol2:
+            st.caption("En yavaş sorgular (p95 çalıştırma süresi)")
+            st.dataframe(QUERY_LOG.slowest_sql(10, days=log_days), use_container_width=True, hide_index=True)
+        st.caption("Günlük önbellek isabet oranları")
+        st.dataframe(QUERY_LOG.cache_rates(days=log_days), use_container_width=True, hide_index=True)
+    except Exception as e:
+        st.warning(f"Sorgu günlüğü okunamadı: {e}")
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import pandas as pd
+
+from ui.db import get_schema_overview
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+ALLOWLIST_PATH = REPO_ROOT / "data" / "metadata" / "allowlist.json"
+SCHEMA_PATH = REPO_ROOT / "data" / "metadata" / "schema.json"
+
+# Categorical columns whose values may be listed in schema.json and the LLM
+# prompt. Names, gender, age etc. are never listed, however few values they have.
+VALUE_COLUMNS = frozenset({"Mode", "MerchantCategory", "Category", "City", "TransactionType"})
+
+
+def _file_stat(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class Catalog:
+    """
+    Process-wide cache of schema metadata shared by the sidebar and the prompt
+    builder:
+      - allowlist.json, re-read only when its mtime/size change
+      - column statistics from schema.json (scripts/export_metadata.py), likewise
+      - the schema overview of a database, per snapshot version (and, for an
+        unversioned file, its mtime/size)
+    Reads are a dict lookup plus a stat(), independent of catalog size.
+    """
+
+    def __init__(self, allowlist_path: Path = ALLOWLIST_PATH, schema_path: Path = SCHEMA_PATH):
+        self.allowlist_path = Path(allowlist_path)
+        self.schema_path = Path(schema_path)
+        self._lock = threading.Lock()
+        self._allowlist_stat: Optional[Tuple[int, int]] = None
+        self._allowlist: Dict[str, Any] = {}
+        self._columns: Dict[str, Tuple[List[str], FrozenSet[str]]] = {}
+        self._schema_stat: Optional[Tuple[int, int]] = None
+        self._relations: Dict[str, dict] = {}
+        self._stats: Dict[str, Dict[str, dict]] = {}
+        self._overviews: Dict[tuple, pd.DataFrame] = {}
+        self.loads = 0
+
+    def allowlist(self) -> Dict[str, Any]:
+        stat = _file_stat(self.allowlist_path)
+        if stat is None:
+            raise FileNotFoundError(self.allowlist_path)
+        with self._lock:
+            if stat != self._allowlist_stat:
+                self._allowlist = json.loads(self.allowlist_path.read_text(encoding="utf-8"))
+                self._columns = {
+                    table: (list(cols), frozenset(c.lower() for c in cols))
+                    for table, cols in self._allowlist.get("tables", {}).items()
+                }
+                self._allowlist_stat = stat
+                self.loads += 1
+            return self._allowlist
+
+    def columns(self, table: str) -> List[str]:
+        """Allowed columns of `table`, in allowlist order."""
+        self.allowlist()
+        return self._columns[table][0]
+
+    def column_set(self, table: str) -> FrozenSet[str]:
+        """Allowed columns of `table`, lower-cased, for membership checks."""
+        self.allowlist()
+        return self._columns[table][1]
+
+    def _schema(self) -> Dict[str, dict]:
+        stat = _file_stat(self.schema_path)
+        with self._lock:
+            if stat != self._schema_stat:
+                tables = json.loads(self.schema_path.read_text(encoding="utf-8"))["tables"] if stat else []
+                self._relations = {t["table"]: t for t in tables}
+                self._stats = {
+                    t["table"]: {c["name"]: c["stats"] for c in t["columns"] if c.get("stats")}
+                    for t in tables
+                }
+                self._schema_stat = stat
+            return self._relations
+
+    def relations(self) -> Dict[str, dict]:
+        """schema.json entries (type, columns, optional descriptions) by qualified name."""
+        return self._schema()
+
+    def column_stats(self, table: str) -> Dict[str, dict]:
+        """
+        Profile of each column of `table` (distinct, null_frac, min/max,
+        values), or {} when schema.json is missing or predates profiling.
+        """
+        self._schema()
+        return self._stats.get(table, {})
+
+    def version(self) -> Tuple[Optional[Tuple[int, int]], Optional[Tuple[int, int]]]:
+        """Changes whenever allowlist.json or schema.json does; for derived caches."""
+        return _file_stat(self.allowlist_path), _file_stat(self.schema_path)
+
+    def schema_overview(self, db, schema_name: str = "bank") -> pd.DataFrame:
+        """
+        get_schema_overview for the snapshot `db` (a ui.db.SnapshotManager)
+        currently serves, computed once per snapshot.
+        """
+        version, path = db.version, db.path
+        key = (version, path, _file_stat(Path(path)) if version == "unversioned" else None, schema_name)
+        with self._lock:
+            cached = self._overviews.get(key)
+        if cached is not None:
+            return cached
+
+        with db.acquire() as conn:
+            overview = get_schema_overview(conn, schema_name=schema_name)
+        with self._lock:
+            # Only the current snapshot's overview is worth keeping
+            self._overviews = {k: v for k, v in self._overviews.items() if k[:3] == key[:3]}
+            self._overviews[key] = overview
+        return overview
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"allowlist_loads": self.loads, "overviews": len(self._overviews)}
+
+
+# Shared by all sessions of this process
+CATALOG = Catalog()
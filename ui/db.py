@@ -1,42 +1,553 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from functools import partial
+from pathlib import Path
+from typing import Callable, ContextManager, Iterator, Optional, Tuple
+
 import duckdb
 import pandas as pd
+import pyarrow as pa
 
-def init_conn(db_path: str = ":memory:") -> duckdb.DuckDBPyConnection:
-    return duckdb.connect(database=db_path)
+from ui.execution import QueryControl, guarded
+from ui.paging import BATCH_ROWS, ResultPager
+from ui.parquet import connect_parquet, dataset_version, prune_partitions
+from ui.result_cache import RESULT_CACHE, ResultCache, normalize_sql_key
+from ui.rollups import route_to_rollup
+from ui.tracing import duckdb_profile, profiling_enabled, span
 
-def run_sql(conn: duckdb.DuckDBPyConnection, sql: str) -> pd.DataFrame:
-    return conn.execute(sql).df()
+# A published snapshot is announced by `<db stem>.current` next to the configured
+# DB path (written by scripts/build_duckdb_from_sql.py). Readers leave a lease
+# file beside the snapshot they use so the builder does not delete it.
+POINTER_SUFFIX = ".current"
+LEASE_SUFFIX = ".lease"
 
-def get_schema_overview(conn: duckdb.DuckDBPyConnection, schema_name: str = "bank") -> pd.DataFrame:
+# Cursors checked out at once from one SnapshotManager for queries
+DEFAULT_MAX_CURSORS = int(os.getenv("DUCKDB_MAX_CURSORS", "32"))
+# Result pagers open at once across all sessions (two cursors each); beyond
+# this the least recently opened one is closed
+DEFAULT_MAX_OPEN_PAGERS = int(os.getenv("DUCKDB_MAX_PAGERS", "16"))
+# Idle cursors kept per snapshot for reuse
+DEFAULT_IDLE_CURSORS = 8
+CHECKOUT_TIMEOUT_S = float(os.getenv("DUCKDB_CHECKOUT_TIMEOUT", "30"))
+
+
+def init_conn(db_path: str = ":memory:", read_only: bool = False) -> duckdb.DuckDBPyConnection:
+    if db_path == ":memory:":
+        return duckdb.connect(database=db_path)
+    return duckdb.connect(database=db_path, read_only=read_only)
+
+
+def resolve_db_path(db_path: str) -> Tuple[str, str]:
     """
-    Returns a small overview of tables/views in a schema, including column counts.
-    Used by the Streamlit sidebar.
+    Returns (version, path) of the database to open: the published snapshot
+    when a pointer file exists, otherwise `db_path` itself.
     """
-    # List tables & views
-    objects = conn.execute(
+    if db_path != ":memory:":
+        pointer_path = Path(db_path).with_suffix(POINTER_SUFFIX)
+        try:
+            pointer = json.loads(pointer_path.read_text(encoding="utf-8"))
+            return pointer["version"], str((pointer_path.parent / pointer["path"]).resolve())
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+    return "unversioned", db_path
+
+
+def _file_fingerprint(path: str) -> Optional[str]:
+    # Only a file on disk has something to fingerprint results against
+    if path == ":memory:" or not Path(path).exists():
+        return None
+    st = Path(path).stat()
+    return f"{path}@{st.st_mtime_ns}:{st.st_size}"
+
+
+class SnapshotManager:
+    """
+    Hands out connections to the currently published snapshot of a DuckDB file.
+
+    Each `acquire()` re-checks the pointer file; when a new version has been
+    published, new queries go to it while queries already running keep their
+    connection to the old snapshot. An old snapshot's connection (and lease) is
+    closed once its last query finishes.
+
+    One manager is meant to be shared by every session of the process: each
+    snapshot is opened once, read-only, and queries get cursors from a bounded
+    pool (`max_cursors` in use at once). Idle cursors are health-checked before
+    reuse; a connection that fails the check is reopened. Result pagers keep
+    their cursors open between pages, so at most `max_pagers` are open at once:
+    opening one more closes the least recently opened, and its session
+    executes the query again when it next needs a page.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_cursors: int = DEFAULT_MAX_CURSORS,
+        max_idle: int = DEFAULT_IDLE_CURSORS,
+        parquet_dir: Optional[str] = None,
+        max_pagers: int = DEFAULT_MAX_OPEN_PAGERS,
+    ):
+        self.db_path = db_path
+        # Serve bank.* from a Parquet export (scripts/export_parquet.py) instead of the DuckDB file
+        self.parquet_dir = Path(parquet_dir) if parquet_dir else None
+        self._pointer = Path(db_path).with_suffix(POINTER_SUFFIX) if db_path != ":memory:" else None
+        self._pointer_mtime: Optional[int] = None
+        self._version, self._path = "unversioned", db_path
+        self._lock = threading.Lock()
+        self._open: dict = {}  # version -> {"conn", "path", "refs", "lease", "fingerprint", "idle"}
+        self.max_cursors = max(1, max_cursors)
+        self.max_idle = max_idle
+        self._slots = threading.BoundedSemaphore(self.max_cursors)
+        self._in_use = 0
+        self.max_pagers = max(1, max_pagers)
+        # Open pagers, oldest first; None while one is being opened
+        self._pagers: "OrderedDict[object, Optional[ResultPager]]" = OrderedDict()
+        self.pagers_evicted = 0
+        self.reconnects = 0
+
+    @property
+    def version(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._version
+
+    @property
+    def path(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._path
+
+    @property
+    def fingerprint(self) -> Optional[str]:
         """
-        SELECT table_name, table_type
-        FROM information_schema.tables
-        WHERE table_schema = ?
-        ORDER BY table_type, table_name
-        """,
-        [schema_name],
-    ).df()
+        What results on the current snapshot are keyed by: the snapshot version,
+        or path/mtime/size of an unversioned file (None for :memory:).
+        """
+        with self._lock:
+            self._refresh()
+            if self._version == "unversioned" and self.parquet_dir is None:
+                return _file_fingerprint(self._path)
+            return self._version
+
+    def _refresh(self) -> None:
+        if self.parquet_dir is not None:
+            # New or replaced partitions make a new version (fresh cache keys)
+            self._version, self._path = dataset_version(self.parquet_dir), str(self.parquet_dir)
+            return
+        # Re-read the pointer only when its mtime changed.
+        mtime = None
+        if self._pointer is not None:
+            try:
+                mtime = self._pointer.stat().st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+        if mtime != self._pointer_mtime or not self._open:
+            self._pointer_mtime = mtime
+            self._version, self._path = resolve_db_path(self.db_path)
+
+    def _connect(self, version: str, path: str) -> dict:
+        if self.parquet_dir is not None:
+            return {
+                "conn": connect_parquet(Path(path)), "path": path, "refs": 0, "lease": None,
+                "fingerprint": version, "idle": [], "version": version,
+            }
+        if version == "unversioned":
+            return {
+                "conn": init_conn(path, read_only=True), "path": path, "refs": 0, "lease": None,
+                "fingerprint": _file_fingerprint(path), "idle": [], "version": version,
+            }
+        conn = duckdb.connect(database=path, read_only=True)
+        lease = Path(f"{path}.{os.getpid()}-{id(self)}{LEASE_SUFFIX}")
+        lease.touch()
+        return {
+            "conn": conn, "path": path, "refs": 0, "lease": lease, "fingerprint": version, "idle": [],
+            "version": version,
+        }
+
+    @staticmethod
+    def _close_entry(entry: dict) -> None:
+        for cur in entry["idle"]:
+            cur.close()
+        entry["idle"] = []
+        entry["conn"].close()
+        if entry["lease"] is not None:
+            entry["lease"].unlink(missing_ok=True)
+
+    def _retire(self) -> None:
+        # Close connections to superseded snapshots nobody is using anymore.
+        for version in [v for v, e in self._open.items() if v != self._version and e["refs"] == 0]:
+            self._close_entry(self._open.pop(version))
+
+    @contextmanager
+    def acquire(self) -> Iterator[duckdb.DuckDBPyConnection]:
+        """Yields a cursor on the current snapshot, pinned for the duration of the block."""
+        with self._pin() as (cur, _):
+            yield cur
+
+    def query(
+        self,
+        sql: str,
+        trace: Optional[dict] = None,
+        use_rollups: bool = True,
+        role: Optional[str] = None,
+        control: Optional[QueryControl] = None,
+        cache: Optional[ResultCache] = RESULT_CACHE,
+        profile: Optional[bool] = None,
+    ) -> pd.DataFrame:
+        """
+        run_sql on the current snapshot, with results cached per snapshot
+        (`cache=None` always executes).
+        Execution waits for an admission slot and is interrupted after the
+        role's deadline or on control.cancel() (see ui.execution).
+        """
+        guard = partial(guarded, role=role, trace=trace, control=control)
+        sql, use_rollups = self._for_source(sql, trace, use_rollups)
+        with self._pin() as (cur, fingerprint):
+            return run_sql(
+                cur, sql, trace=trace, use_rollups=use_rollups, snapshot=fingerprint, cache=cache, guard=guard,
+                profile=profile,
+            )
+
+    def open_pager(
+        self,
+        sql: str,
+        trace: Optional[dict] = None,
+        use_rollups: bool = True,
+        role: Optional[str] = None,
+        control: Optional[QueryControl] = None,
+        profile: Optional[bool] = None,
+    ) -> ResultPager:
+        """
+        page_sql on the current snapshot, guarded like query(). The snapshot
+        stays pinned (and its cursors open) until the pager is closed.
+        """
+        guard = partial(guarded, role=role, trace=trace, control=control)
+        sql, use_rollups = self._for_source(sql, trace, use_rollups)
+        token = self._reserve_pager()
+        entry = self._checkout()
+
+        def release() -> None:
+            with self._lock:
+                self._pagers.pop(token, None)
+            self._checkin(entry)
+
+        try:
+            pager = page_sql(
+                entry["conn"], sql, trace=trace, use_rollups=use_rollups,
+                snapshot=entry["fingerprint"], release=release, guard=guard,
+                profile=profile,
+            )
+        except BaseException:
+            release()
+            raise
+        with self._lock:
+            if token in self._pagers:
+                self._pagers[token] = pager
+        self._evict_pagers(keep=token)
+        return pager
+
+    def _reserve_pager(self) -> object:
+        # Takes a place among the open pagers (filled in once the pager is open)
+        token = object()
+        with self._lock:
+            self._pagers[token] = None
+        self._evict_pagers()
+        return token
 
-    if objects.empty:
-        return objects
+    def _evict_pagers(self, keep: Optional[object] = None) -> None:
+        # Closes the oldest open pagers beyond max_pagers, except `keep` (just
+        # handed out). Pagers still being opened cannot be closed yet: they are
+        # evicted once open, if still over.
+        evicted = []
+        with self._lock:
+            for key, pager in list(self._pagers.items()):
+                if len(self._pagers) <= self.max_pagers:
+                    break
+                if pager is not None and key is not keep:
+                    del self._pagers[key]
+                    evicted.append(pager)
+            self.pagers_evicted += len(evicted)
+        # Closing runs the pager's release, which takes the lock
+        for pager in evicted:
+            pager.close()
 
-    # Column counts per object
-    col_counts = conn.execute(
+    def _for_source(self, sql: str, trace: Optional[dict], use_rollups: bool) -> Tuple[str, bool]:
+        # A Parquet export has no rollup tables; date filters prune partitions instead
+        if self.parquet_dir is None:
+            return sql, use_rollups
+        with span(trace, "prune"):
+            pruned = prune_partitions(sql)
+        if trace is not None:
+            trace["partition_pruned"] = pruned != sql
+        return pruned, False
+
+    def _checkout(self) -> dict:
+        with self._lock:
+            self._refresh()
+            version = self._version
+            entry = self._open.get(version)
+            if entry is None:
+                entry = self._open[version] = self._connect(version, self._path)
+            entry["refs"] += 1
+            if entry["lease"] is not None:
+                os.utime(entry["lease"])
+            self._retire()
+        return entry
+
+    def _checkin(self, entry: dict) -> None:
+        with self._lock:
+            entry["refs"] -= 1
+            self._retire()
+
+    def _cursor(self, entry: dict) -> duckdb.DuckDBPyConnection:
+        # Reuse an idle cursor that still answers; otherwise open a new one.
+        while True:
+            with self._lock:
+                cur = entry["idle"].pop() if entry["idle"] else None
+            if cur is None:
+                break
+            try:
+                cur.execute("SELECT 1").fetchone()
+                return cur
+            except duckdb.Error:
+                cur.close()
+        try:
+            return entry["conn"].cursor()
+        except duckdb.Error:
+            # The shared connection itself is unusable: reopen it in place
+            with self._lock:
+                try:
+                    entry["conn"].close()
+                except duckdb.Error:
+                    pass
+                entry["conn"], entry["idle"] = self._connect(entry["version"], entry["path"])["conn"], []
+                self.reconnects += 1
+            return entry["conn"].cursor()
+
+    def _release_cursor(self, entry: dict, cur: duckdb.DuckDBPyConnection) -> None:
+        with self._lock:
+            if len(entry["idle"]) < self.max_idle and self._open.get(self._version) is entry:
+                entry["idle"].append(cur)
+                return
+        cur.close()
+
+    @contextmanager
+    def _pin(self) -> Iterator[Tuple[duckdb.DuckDBPyConnection, Optional[str]]]:
+        if not self._slots.acquire(timeout=CHECKOUT_TIMEOUT_S):
+            raise RuntimeError(f"DuckDB bağlantı havuzu dolu ({self.max_cursors} imleç kullanımda)")
+        try:
+            entry = self._checkout()
+            try:
+                cur = self._cursor(entry)
+                with self._lock:
+                    self._in_use += 1
+                try:
+                    yield cur, entry["fingerprint"]
+                finally:
+                    with self._lock:
+                        self._in_use -= 1
+                    self._release_cursor(entry, cur)
+            finally:
+                self._checkin(entry)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "snapshots_open": len(self._open),
+                "cursors_in_use": self._in_use,
+                "cursors_idle": sum(len(e["idle"]) for e in self._open.values()),
+                "max_cursors": self.max_cursors,
+                "pagers_open": len(self._pagers),
+                "max_pagers": self.max_pagers,
+                "pagers_evicted": self.pagers_evicted,
+                "reconnects": self.reconnects,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            for entry in self._open.values():
+                self._close_entry(entry)
+            self._open.clear()
+
+
+def _profile_slot(trace: Optional[dict], profile: Optional[bool]) -> Optional[dict]:
+    # Where the DuckDB profile goes, or None when not capturing
+    if trace is None or not (profiling_enabled() if profile is None else profile):
+        return None
+    trace["duckdb_profile"] = {}
+    return trace["duckdb_profile"]
+
+
+def run_sql(
+    conn: duckdb.DuckDBPyConnection,
+    sql: str,
+    trace: Optional[dict] = None,
+    use_rollups: bool = True,
+    snapshot: Optional[str] = None,
+    cache: Optional[ResultCache] = RESULT_CACHE,
+    guard: Optional[Callable[[duckdb.DuckDBPyConnection], ContextManager]] = None,
+    profile: Optional[bool] = None,
+) -> pd.DataFrame:
+    """
+    Executes a validated query. Aggregates that a rollup table answers exactly
+    are rewritten to read it (see ui.rollups); `trace` records which one.
+
+    When `snapshot` fingerprints the data behind `conn` (SnapshotManager.query
+    passes it), results are served from / stored in the shared result cache.
+    `guard(conn)` wraps the execution (admission, timeout; see ui.execution).
+    Stages are timed into trace["spans"]; with `profile` (default: the
+    DUCKDB_PROFILE env) DuckDB's query profile goes to trace["duckdb_profile"].
+    """
+    guard = guard or (lambda cur: nullcontext())
+    key = (snapshot, normalize_sql_key(sql)) if snapshot is not None and cache is not None else None
+    cached = cache.get(key) if key is not None else None
+    if cached is not None:
+        table, meta = cached
+        if trace is not None:
+            trace.update(meta)
+            trace["result_cache"] = "hit"
+        with span(trace, "to_frame"):
+            return conn.from_arrow(table).df()
+
+    prof = _profile_slot(trace, profile)
+    with span(trace, "route"):
+        routed, rollup = route_to_rollup(conn, sql) if use_rollups else (sql, None)
+    with guard(conn), span(trace, "execute"), duckdb_profile(conn, prof):
+        if rollup is not None:
+            try:
+                table = conn.execute(routed).to_arrow_table()
+            except duckdb.CatalogException:
+                # Snapshot built without rollup tables
+                rollup = None
+                table = conn.execute(sql).to_arrow_table()
+        else:
+            table = conn.execute(sql).to_arrow_table()
+
+    meta: dict = {"rollup": rollup}
+    if rollup is not None:
+        meta["rollup_sql"] = routed
+    if key is not None:
+        cache.put(key, table, meta)
+    if trace is not None:
+        trace.update(meta)
+        trace["result_cache"] = "miss" if key is not None else "off"
+    with span(trace, "to_frame"):
+        return conn.from_arrow(table).df()
+
+
+def page_sql(
+    conn: duckdb.DuckDBPyConnection,
+    sql: str,
+    trace: Optional[dict] = None,
+    use_rollups: bool = True,
+    snapshot: Optional[str] = None,
+    cache: Optional[ResultCache] = RESULT_CACHE,
+    release=None,
+    guard: Optional[Callable[[duckdb.DuckDBPyConnection], ContextManager]] = None,
+    profile: Optional[bool] = None,
+) -> ResultPager:
+    """
+    Like run_sql, but returns a ResultPager that streams the result in Arrow
+    record batches (fetch_record_batch) instead of materializing a DataFrame.
+    The total row count is computed by DuckDB; a result read to the end in one
+    pass is stored in the result cache for other sessions. `guard` wraps the
+    count and every fetch, as in run_sql. Spans and the DuckDB profile are
+    recorded as in run_sql; the profile is that of the count(*) pass, which
+    runs the full query plan.
+    """
+    guard = guard or (lambda cur: nullcontext())
+    text = sql.strip().rstrip(";")
+    key = (snapshot, normalize_sql_key(text)) if snapshot is not None and cache is not None else None
+    cached = cache.get(key) if key is not None else None
+    convert = conn.cursor()
+
+    def to_frame(table: pa.Table) -> pd.DataFrame:
+        return convert.from_arrow(table).df()
+
+    def close_cursors() -> None:
+        for cur in cursors:
+            cur.close()
+        if release is not None:
+            release()
+
+    cursors = [convert]
+    if cached is not None:
+        table, meta = cached
+        if trace is not None:
+            trace.update(meta)
+            trace["result_cache"] = "hit"
+        return ResultPager(
+            lambda: pa.RecordBatchReader.from_batches(table.schema, table.to_batches(max_chunksize=BATCH_ROWS)),
+            table.num_rows, to_frame, release=close_cursors,
+        )
+
+    prof = _profile_slot(trace, profile)
+    with span(trace, "route"):
+        routed, rollup = route_to_rollup(conn, text) if use_rollups else (text, None)
+    try:
+        with guard(convert), span(trace, "count"), duckdb_profile(convert, prof):
+            try:
+                total = convert.execute(f"SELECT count(*) FROM (\n{routed}\n)").fetchone()[0]
+            except duckdb.CatalogException:
+                if rollup is None:
+                    raise
+                # Snapshot built without rollup tables
+                routed, rollup = text, None
+                total = convert.execute(f"SELECT count(*) FROM (\n{text}\n)").fetchone()[0]
+    except BaseException:
+        convert.close()
+        raise
+
+    meta: dict = {"rollup": rollup}
+    if rollup is not None:
+        meta["rollup_sql"] = routed
+    if trace is not None:
+        trace.update(meta)
+        trace["result_cache"] = "miss" if key is not None else "off"
+        trace["total_rows"] = total
+
+    reader_cur = conn.cursor()
+    cursors.append(reader_cur)
+
+    def open_reader() -> pa.RecordBatchReader:
+        result = reader_cur.execute(routed)
+        # fetch_record_batch is deprecated in favour of to_arrow_reader in newer DuckDB
+        if hasattr(result, "to_arrow_reader"):
+            return result.to_arrow_reader(BATCH_ROWS)
+        return result.fetch_record_batch(BATCH_ROWS)
+
+    def on_complete(table: pa.Table) -> None:
+        if key is not None:
+            cache.put(key, table, meta)
+
+    @contextmanager
+    def fetch_guard() -> Iterator[None]:
+        with guard(reader_cur), span(trace, "fetch"):
+            yield
+
+    return ResultPager(
+        open_reader, total, to_frame, on_complete=on_complete, release=close_cursors, guard=fetch_guard,
+    )
+
+
+def get_schema_overview(conn: duckdb.DuckDBPyConnection, schema_name: str = "bank") -> pd.DataFrame:
+    """
+    Returns a small overview of tables/views in a schema, including column counts.
+    Used by the Streamlit sidebar (through ui.catalog, once per snapshot).
+    """
+    return conn.execute(
         """
-        SELECT table_name, COUNT(*) AS column_count
-        FROM information_schema.columns
-        WHERE table_schema = ?
-        GROUP BY table_name
+        SELECT t.table_name, t.table_type, COUNT(c.column_name)::INTEGER AS column_count
+        FROM information_schema.tables t
+        LEFT JOIN information_schema.columns c
+          ON c.table_schema = t.table_schema AND c.table_name = t.table_name
+        WHERE t.table_schema = ?
+        GROUP BY t.table_name, t.table_type
+        ORDER BY t.table_type, t.table_name
         """,
         [schema_name],
     ).df()
-
-    out = objects.merge(col_counts, on="table_name", how="left")
-    out["column_count"] = out["column_count"].fillna(0).astype(int)
-    return out
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Set
+
+import duckdb
+
+# Lower runs first when queries queue for a slot
+ROLE_PRIORITY = {"bank_employee": 0, "manager": 1, "auditor": 2}
+
+# Seconds a query may run before it is interrupted; QUERY_TIMEOUT_<ROLE> overrides
+ROLE_TIMEOUT_S = {"bank_employee": 30.0, "manager": 60.0, "auditor": 300.0}
+DEFAULT_TIMEOUT_S = float(os.getenv("QUERY_TIMEOUT", "60"))
+
+# Concurrent DuckDB queries across all sessions of this process
+DEFAULT_MAX_CONCURRENT = int(os.getenv("DUCKDB_MAX_CONCURRENT", str(max(2, (os.cpu_count() or 4) // 2))))
+
+
+class QueryCancelled(RuntimeError):
+    pass
+
+
+class QueryTimeout(QueryCancelled):
+    pass
+
+
+def role_timeout(role: Optional[str]) -> float:
+    raw = os.getenv(f"QUERY_TIMEOUT_{(role or '').upper()}", "").strip() if role else ""
+    return float(raw) if raw else ROLE_TIMEOUT_S.get(role or "", DEFAULT_TIMEOUT_S)
+
+
+class QueryControl:
+    """
+    Cancel switch for one UI run: cancel() interrupts every cursor currently
+    executing under it, runs the registered on_cancel callbacks (e.g. closing
+    an LLM response) and makes queued work give up its place.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._cursors: Set[duckdb.DuckDBPyConnection] = set()
+        self._callbacks: Set[Callable[[], None]] = set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        self._event.set()
+        with self._lock:
+            for cur in self._cursors:
+                cur.interrupt()
+            callbacks = list(self._callbacks)
+        for fn in callbacks:
+            fn()
+
+    def wait(self, timeout: float) -> bool:
+        """Sleeps up to `timeout` seconds; True as soon as the run is cancelled."""
+        return self._event.wait(timeout)
+
+    def on_cancel(self, fn: Callable[[], None]) -> None:
+        with self._lock:
+            self._callbacks.add(fn)
+        if self.cancelled:
+            fn()
+
+    def remove_callback(self, fn: Callable[[], None]) -> None:
+        with self._lock:
+            self._callbacks.discard(fn)
+
+    def attach(self, cur: duckdb.DuckDBPyConnection) -> None:
+        with self._lock:
+            self._cursors.add(cur)
+        if self.cancelled:
+            cur.interrupt()
+
+    def detach(self, cur: duckdb.DuckDBPyConnection) -> None:
+        with self._lock:
+            self._cursors.discard(cur)
+
+
+class AdmissionController:
+    """
+    Bounds concurrent DuckDB queries. Waiting queries are admitted by role
+    priority (see ROLE_PRIORITY), first come first served within a role.
+    """
+
+    def __init__(self, max_concurrent: int = DEFAULT_MAX_CONCURRENT):
+        self.max_concurrent = max(1, max_concurrent)
+        self._cond = threading.Condition()
+        self._queue: list = []  # heap of (priority, seq)
+        self._seq = itertools.count()
+        self.running = 0
+
+    @contextmanager
+    def slot(self, role: Optional[str], control: Optional[QueryControl] = None) -> Iterator[None]:
+        ticket = (ROLE_PRIORITY.get(role or "", len(ROLE_PRIORITY)), next(self._seq))
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            while self.running >= self.max_concurrent or self._queue[0] != ticket:
+                if control is not None and control.cancelled:
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+                    self._cond.notify_all()
+                    raise QueryCancelled("sorgu iptal edildi")
+                # Short waits so a cancel is noticed while queued
+                self._cond.wait(timeout=0.1)
+            heapq.heappop(self._queue)
+            self.running += 1
+            self._cond.notify_all()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.running -= 1
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"running": self.running, "queued": len(self._queue), "max_concurrent": self.max_concurrent}
+
+
+# Shared by every Streamlit session in this process
+ADMISSION = AdmissionController()
+
+
+@contextmanager
+def guarded(
+    cur: duckdb.DuckDBPyConnection,
+    role: Optional[str] = None,
+    trace: Optional[dict] = None,
+    control: Optional[QueryControl] = None,
+    admission: AdmissionController = ADMISSION,
+) -> Iterator[None]:
+    """
+    Runs the block (work on `cur`) once admitted, with a watchdog that calls
+    cur.interrupt() after the role's deadline. An interrupted query surfaces
+    as QueryTimeout / QueryCancelled; `trace` accumulates queue_ms and exec_ms.
+    """
+    timeout = role_timeout(role)
+    start = time.perf_counter()
+    with admission.slot(role, control):
+        admitted = time.perf_counter()
+        fired = threading.Event()
+
+        def expire() -> None:
+            fired.set()
+            cur.interrupt()
+
+        timer = threading.Timer(timeout, expire)
+        timer.daemon = True
+        timer.start()
+        if control is not None:
+            control.attach(cur)
+        try:
+            yield
+        except (duckdb.InterruptException, OSError) as e:
+            # Arrow readers report an interrupt as OSError
+            if fired.is_set():
+                raise QueryTimeout(f"sorgu zaman aşımına uğradı ({timeout:g} sn)") from e
+            if control is not None and control.cancelled:
+                raise QueryCancelled("sorgu iptal edildi") from e
+            raise
+        finally:
+            timer.cancel()
+            if control is not None:
+                control.detach(cur)
+            if trace is not None:
+                end = time.perf_counter()
+                trace["queue_ms"] = round(trace.get("queue_ms", 0) + (admitted - start) * 1000, 1)
+                trace["exec_ms"] = round(trace.get("exec_ms", 0) + (end - admitted) * 1000, 1)
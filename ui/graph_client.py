@@ -3,11 +3,21 @@ from __future__ import annotations
 import json
 import os
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, Tuple
-
-import requests
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
+from ui.catalog import CATALOG, VALUE_COLUMNS
+from ui.execution import QueryCancelled, QueryControl
+from ui.intents import intents_enabled, match_intent
+from ui.json_stream import JsonFieldStream
+from ui.llm_cache import LLM_CACHE
+from ui.schema_index import SCHEMA_INDEX, SchemaSelection, estimate_tokens
+from ui.sql_analysis import analyze
+from ui.tracing import span
+from ui.transport import RateLimiter, base_url, get_transport
+from ui.validators import enforce_readonly
 
 
 def _parse_json_loose(content: str) -> dict:
@@ -63,24 +73,53 @@ def _parse_json_loose(content: str) -> dict:
 
 # Repo paths
 REPO_ROOT = Path(__file__).resolve().parents[1]
-ALLOWLIST_PATH = REPO_ROOT / "data" / "metadata" / "allowlist.json"
 
 ALLOWED_VIEW = "bank.v_transactions_enriched"
 
+# INTENT_MATCHER=0 sends every question to the LLM
+INTENTS_ENABLED = intents_enabled()
+
+# Run instead of a generated query that failed or did not pass validation
+FALLBACK_SQL = f"""
+SELECT TransactionID, TransactionDate, CustomerName, Amount, MerchantName, MerchantCategory, City
+FROM {ALLOWED_VIEW}
+ORDER BY TransactionDate DESC, TransactionID DESC
+LIMIT 20
+""".strip()
+
 
 def _load_allowlist() -> Dict[str, Any]:
-    return json.loads(ALLOWLIST_PATH.read_text(encoding="utf-8"))
+    # Parsed once per file version by the shared catalog
+    return CATALOG.allowlist()
+
+
+def _column_fact(view: str, column: str) -> str:
+    """
+    Prompt line with the valid values of a low-cardinality categorical column
+    (VALUE_COLUMNS) or the range of an ordered one, from the profile in
+    schema.json; "" when there is none.
+    """
+    st = CATALOG.column_stats(view).get(column)
+    if not st:
+        return ""
+    if st.get("values") and column in VALUE_COLUMNS:
+        return f"  {column}: " + ", ".join("'" + str(v).replace("'", "''") + "'" for v in st["values"])
+    if st.get("min") is not None and not column.endswith("ID"):
+        # Key ranges say nothing useful about the data
+        return f"  {column}: {st['min']} .. {st['max']}"
+    return ""
 
 
-def _allowed_columns() -> list[str]:
-    allow = _load_allowlist()
-    return allow["tables"][ALLOWED_VIEW]
+def _column_cost(view: str, column: str) -> int:
+    # Prompt tokens a column takes: its name in the list plus its facts line
+    return estimate_tokens(column) + 1 + estimate_tokens(_column_fact(view, column))
 
 
-_TABLE_REF_RE = re.compile(r"\b(from|join)\s+([a-zA-Z_][\w.]*)(?:\s+[a-zA-Z_]\w*)?\b", re.IGNORECASE)
+def _select_schema(question: str) -> SchemaSelection:
+    return SCHEMA_INDEX.select(question, cost=_column_cost)
 
 
-def _validate_sql(sql: str) -> Tuple[bool, str]:
+def _validate_sql(sql: str, selection: Optional[SchemaSelection] = None) -> Tuple[bool, str]:
     s = (sql or "").strip().rstrip(";")
     if not s:
         return False, "Empty SQL"
@@ -89,37 +128,57 @@ def _validate_sql(sql: str) -> Tuple[bool, str]:
     if not re.match(r"^(select|with)\b", s, flags=re.IGNORECASE):
         return False, "Only SELECT/WITH allowed"
 
-    # Block dangerous / out-of-scope keywords
-    banned = ["information_schema", "pragma", "attach", "copy ", "install ", "load ", "create ", "drop ", "alter ", "update ", "delete ", "insert "]
-    low = s.lower()
-    if any(b in low for b in banned):
-        return False, "Banned keyword detected"
-
-    # Ensure only allowed view referenced in FROM/JOIN
-    refs = [m.group(2) for m in _TABLE_REF_RE.finditer(s)]
-    bad = [t for t in refs if t.lower() != ALLOWED_VIEW.lower()]
+    # One parse (shared with enforce_readonly, rollup routing and cache keys):
+    # DuckDB only serializes SELECT statements, so DDL/DML/PRAGMA/ATTACH/COPY fail here.
+    a = analyze(s)
+    if a.error is not None:
+        return False, f"Only SELECT/WITH allowed ({a.error})"
+    if a.statements != 1:
+        return False, "Exactly one statement allowed"
+
+    if a.table_functions:
+        return False, f"Table functions not allowed: {sorted(a.table_functions)}"
+
+    # Ensure only the views offered to the model (all queryable views when no
+    # selection is given) or the query's own CTEs are referenced
+    views = list(selection.views) if selection is not None else SCHEMA_INDEX.queryable_views()
+    by_name = {v.lower(): v for v in views}
+    bad = sorted(t for t in a.tables if t not in by_name and t not in a.ctes)
     if bad:
-        return False, f"Disallowed table(s) referenced: {bad}. Allowed: {ALLOWED_VIEW}"
+        return False, f"Disallowed table(s) referenced: {bad}. Allowed: {', '.join(views)}"
+
+    allowed = frozenset().union(*(CATALOG.column_set(by_name[t]) for t in a.tables if t in by_name))
+    allowed |= a.aliases | a.ctes
+    bad_cols = sorted(c for c in a.columns if c not in allowed)
+    if bad_cols:
+        return False, f"Unknown column(s): {bad_cols}"
 
     return True, "OK"
 
 
-def _build_messages(question: str, role: str) -> list[dict]:
-    cols = _allowed_columns()
-    cols_list = ", ".join(cols)
+def _build_messages(question: str, role: str, selection: Optional[SchemaSelection] = None) -> list[dict]:
+    # Only the views/columns relevant to the question, within the prompt budget
+    selection = selection if selection is not None else _select_schema(question)
+    views_block = "\n".join(f"  {view}: {', '.join(cols)}" for view, cols in selection.views.items())
+    facts = "\n".join(
+        f for view, cols in selection.views.items() for f in (_column_fact(view, c) for c in cols) if f
+    )
+    facts_block = (
+        "\nColumn values (use these exact spellings in filters; ranges bound date filters):\n" + facts + "\n"
+        if facts else ""
+    )
 
     system = f"""
 You are a Text-to-SQL translator for DuckDB.
 
 You MUST:
 - Generate a single READ-ONLY SQL query (SELECT/WITH only).
-- Query ONLY this view: {ALLOWED_VIEW}
-- Use ONLY these columns (no other tables, no information_schema):
-  {cols_list}
+- Query ONLY these views, using ONLY the listed columns (no other tables, no information_schema):
+{views_block}
 - Prefer explicit column lists (avoid SELECT *).
 - Add ORDER BY TransactionDate DESC, TransactionID DESC when user asks for latest/son.
 - Always include a LIMIT (default 10–50 based on question).
-
+{facts_block}
 Return STRICT JSON that matches this schema:
 {{
   "sql": "string",
@@ -139,12 +198,30 @@ Role context:
     ]
 
 
-def _openrouter_chat(messages: list[dict], model: str, debug: bool) -> Dict[str, Any]:
+def _openrouter_chat(
+    messages: list[dict],
+    model: str,
+    debug: bool,
+    rate_limiter: Optional[RateLimiter] = None,
+    trace: Optional[dict] = None,
+    stream: Optional[bool] = None,
+    on_field: Optional[Callable[[str, str], None]] = None,
+    control: Optional[QueryControl] = None,
+) -> Dict[str, Any]:
+    """
+    One chat completion returning {"obj", "raw", "attempts", "rate_wait_s"}.
+    With stream (default: OPENROUTER_STREAM), the completion is read as
+    server-sent events and on_field(name, value) is called as soon as each
+    top-level string field of the JSON answer closes, before the rest of the
+    answer has been generated. control.cancel() aborts the request
+    (QueryCancelled).
+    """
+    stream = streaming_enabled() if stream is None else stream
     api_key = os.getenv("OPENROUTER_API_KEY", "").strip()
     if not api_key:
         raise RuntimeError("Missing OPENROUTER_API_KEY env var")
 
-    url = "https://openrouter.ai/api/v1/chat/completions"
+    url = f"{base_url()}/chat/completions"
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
@@ -182,44 +259,166 @@ def _openrouter_chat(messages: list[dict], model: str, debug: bool) -> Dict[str,
         },
     }
 
-    r = requests.post(url, headers=headers, json=payload, timeout=60)
-    r.raise_for_status()
-    data = r.json()
+    # Pooled keep-alive session with retries/hedging; every HTTP attempt is timed
+    attempts: list[dict] = []
+    rate_wait = 0.0
+    if rate_limiter is not None:
+        with span(trace, "rate_wait"):
+            rate_wait = rate_limiter.acquire()
+    try:
+        with span(trace, "llm_http"):
+            if stream:
+                data, obj = _read_stream(url, headers, payload, attempts, trace, on_field, control)
+            else:
+                data = get_transport().post_json(
+                    url, headers=headers, payload=payload, attempts=attempts, control=control
+                )
+    except Exception as e:
+        e.attempts = attempts
+        raise
 
-    content = data["choices"][0]["message"]["content"]
-    obj = _parse_json_loose(content)
-    return {"obj": obj, "raw": data}
+    if not stream:
+        with span(trace, "json_parse"):
+            content = data["choices"][0]["message"]["content"]
+            obj = _parse_json_loose(content)
+    return {"obj": obj, "raw": data, "attempts": attempts, "rate_wait_s": rate_wait}
 
 
+def streaming_enabled() -> bool:
+    return os.getenv("OPENROUTER_STREAM", "").strip().lower() in ("1", "true", "on")
 
-def text2sql(question: str, role: str, debug: bool = False) -> Dict[str, Any]:
-    model = os.getenv("OPENROUTER_MODEL", "openai/gpt-5.1-codex-max").strip()
+
+def _read_stream(
+    url: str,
+    headers: Dict[str, str],
+    payload: Dict[str, Any],
+    attempts: list,
+    trace: Optional[dict],
+    on_field: Optional[Callable[[str, str], None]],
+    control: Optional[QueryControl] = None,
+) -> Tuple[Dict[str, Any], dict]:
+    """
+    Consumes a streamed completion: returns a non-streamed-shaped body (id,
+    model, usage, the whole message) and the parsed JSON object. Fields are
+    parsed incrementally as deltas arrive; the loose parser is only the
+    fallback for an answer that is not one plain JSON object.
+    """
+    start = time.perf_counter()
+    parser = JsonFieldStream()
+    parts: List[str] = []
+    data: Dict[str, Any] = {}
+    events = get_transport().post_stream(url, headers=headers, payload=payload, attempts=attempts, control=control)
+    for event in events:
+        for k in ("id", "model", "usage"):
+            if event.get(k):
+                data[k] = event[k]
+        for choice in event.get("choices") or []:
+            delta = (choice.get("delta") or {}).get("content") or ""
+            if not delta:
+                continue
+            if not parts and trace is not None:
+                trace["llm_first_token_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            parts.append(delta)
+            for name, value in parser.feed(delta):
+                if trace is not None:
+                    trace.setdefault("llm_field_ms", {})[name] = round((time.perf_counter() - start) * 1000, 1)
+                if on_field is not None:
+                    on_field(name, value)
+
+    content = "".join(parts)
+    data["choices"] = [{"index": 0, "message": {"role": "assistant", "content": content}}]
+    obj = parser.fields if parser.done else _parse_json_loose(content)
+    return data, obj
+
+
+def text2sql(
+    question: str,
+    role: str,
+    debug: bool = False,
+    rate_limiter: Optional[RateLimiter] = None,
+    stream: Optional[bool] = None,
+    on_sql: Optional[Callable[[str, dict], None]] = None,
+    control: Optional[QueryControl] = None,
+) -> Dict[str, Any]:
+    """
+    Question -> {"sql", "answer", "trace"}. When streaming, on_sql(sql, trace)
+    is called with the generated SQL as soon as it has arrived and passed
+    validation, while the model is still writing the answer, so the caller
+    can start executing it early. It is not called for cached answers or SQL
+    that fails validation. control.cancel() aborts the LLM request; the call
+    then raises QueryCancelled instead of falling back to a sample query.
+    """
+    model = current_model()
 
     trace: Dict[str, Any] = {"debug": debug, "model": model}
     try:
-        messages = _build_messages(question, role)
-        out = _openrouter_chat(messages, model=model, debug=debug)
+        # Common question shapes are answered from templates, without the LLM
+        if INTENTS_ENABLED:
+            with span(trace, "intent"):
+                match = match_intent(question)
+            if match is not None:
+                ok, msg = _validate_sql(match.sql)
+                if ok:
+                    trace.update({"path": "intent", "intent": match.intent, "intent_params": match.params})
+                    return {"sql": match.sql, "answer": match.answer, "trace": trace}
+                trace["intent_rejected"] = msg
+
+        # Same question (after Turkish-aware normalization), role, model and
+        # allowlist -> reuse the earlier answer without calling OpenRouter.
+        with span(trace, "llm_cache"):
+            cached = LLM_CACHE.get(question, role, model) if LLM_CACHE is not None else None
+        trace["llm_cache"] = "off" if LLM_CACHE is None else ("hit" if cached else "miss")
+
+        selection = None
+        trace["path"] = "llm_cache" if cached is not None else "llm"
+        if cached is not None:
+            obj = cached
+        else:
+            with span(trace, "prompt"):
+                selection = _select_schema(question)
+                messages = _build_messages(question, role, selection)
+            trace["schema"] = selection.summary()
+
+            def on_field(name: str, value: str) -> None:
+                if name != "sql" or on_sql is None:
+                    return
+                with span(trace, "validate_early"):
+                    ok_early, _ = _validate_sql(value.strip(), selection)
+                if ok_early:
+                    trace["sql_early"] = True
+                    try:
+                        on_sql(value.strip(), trace)
+                    except Exception as e:
+                        # Early execution is an optimization; the answer still completes
+                        trace["sql_early_error"] = str(e)
+
+            out = _openrouter_chat(
+                messages, model=model, debug=debug, rate_limiter=rate_limiter, trace=trace, stream=stream,
+                on_field=on_field, control=control,
+            )
+            obj = out["obj"]
+            trace["http_attempts"] = out["attempts"]
+            if rate_limiter is not None:
+                trace["rate_wait_ms"] = round(out["rate_wait_s"] * 1000, 1)
+
+            if debug:
+                # Keep trace lightweight
+                trace["openrouter_id"] = out["raw"].get("id")
+                trace["usage"] = out["raw"].get("usage")
 
-        obj = out["obj"]
         sql = (obj.get("sql") or "").strip()
         answer = (obj.get("answer") or "").strip()
 
-        ok, msg = _validate_sql(sql)
+        with span(trace, "validate"):
+            ok, msg = _validate_sql(sql, selection)
         trace["sql_ok"] = ok
         trace["sql_check"] = msg
 
-        if debug:
-            # Keep trace lightweight
-            trace["openrouter_id"] = out["raw"].get("id")
-            trace["usage"] = out["raw"].get("usage")
+        if ok and cached is None and LLM_CACHE is not None:
+            LLM_CACHE.put(question, role, model, {"sql": sql, "answer": answer})
 
         if not ok:
-            safe_sql = f"""
-SELECT TransactionID, TransactionDate, CustomerName, Amount, MerchantName, MerchantCategory, City
-FROM {ALLOWED_VIEW}
-ORDER BY TransactionDate DESC, TransactionID DESC
-LIMIT 20
-""".strip()
+            safe_sql = FALLBACK_SQL
             return {
                 "sql": safe_sql,
                 "answer": f"AI sorgusu güvenlik kontrolünden geçmedi ({msg}). Güvenli bir sorgu çalıştırıyorum.",
@@ -232,16 +431,86 @@ LIMIT 20
             "trace": trace,
         }
 
+    except QueryCancelled:
+        trace["cancelled"] = True
+        raise
     except Exception as e:
         trace["error"] = str(e)
-        fallback = f"""
-SELECT TransactionID, TransactionDate, CustomerName, Amount, MerchantName, MerchantCategory, City
-FROM {ALLOWED_VIEW}
-ORDER BY TransactionDate DESC, TransactionID DESC
-LIMIT 20
-""".strip()
+        if getattr(e, "attempts", None):
+            trace["http_attempts"] = e.attempts
+        fallback = FALLBACK_SQL
         return {
             "sql": fallback,
             "answer": f"AI sorgu üretimi başarısız oldu: {e}. Geçici olarak örnek sorgu çalıştırıyorum.",
             "trace": trace,
         }
+
+
+def current_model() -> str:
+    return os.getenv("OPENROUTER_MODEL", "openai/gpt-5.1-codex-max").strip()
+
+
+def warm_llm_cache(answers: Sequence[Dict[str, Any]]) -> int:
+    """
+    Puts earlier answers ({"question", "role", "model", "sql", "answer"}, e.g.
+    from the query log) back into LLM_CACHE when they are missing (expired,
+    evicted, or dropped by an allowlist change) and their SQL still passes
+    validation against the current schema. Only answers of the current model
+    are used. Returns how many were added; no LLM calls are made.
+    """
+    if LLM_CACHE is None:
+        return 0
+    model, added = current_model(), 0
+    for a in answers:
+        if a.get("model") != model or not a.get("sql") or LLM_CACHE.get(a["question"], a["role"], model):
+            continue
+        ok, _ = _validate_sql(a["sql"].strip())
+        if ok:
+            LLM_CACHE.put(a["question"], a["role"], model, {"sql": a["sql"].strip(), "answer": a.get("answer") or ""})
+            added += 1
+    return added
+
+
+def text2sql_batch(
+    questions: Sequence[str],
+    role: str,
+    concurrency: int = 8,
+    debug: bool = False,
+    requests_per_second: Optional[float] = None,
+    db: Any = None,
+    default_limit: int = 200,
+) -> List[Dict[str, Any]]:
+    """
+    Runs text2sql for many questions at once, e.g. for nightly jobs.
+
+    At most `concurrency` questions are in flight; `requests_per_second`
+    (default: OPENROUTER_RPS env, unset = unlimited) caps calls to OpenRouter
+    across all workers. With `db` (a ui.db.SnapshotManager) each valid SQL is
+    also made read-only and executed. Results come back in input order, one
+    dict per question: question, sql, answer, trace, ok, error and, when
+    executed, df.
+    """
+    if requests_per_second is None:
+        rps = os.getenv("OPENROUTER_RPS", "").strip()
+        requests_per_second = float(rps) if rps else None
+    limiter = RateLimiter(requests_per_second, burst=concurrency) if requests_per_second else None
+
+    def one(question: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        result = text2sql(question, role=role, debug=debug, rate_limiter=limiter)
+        trace = result["trace"]
+        error = trace.get("error") or (None if trace.get("sql_ok") else trace.get("sql_check"))
+        item: Dict[str, Any] = {"question": question, **result, "ok": error is None, "error": error}
+        if db is not None and error is None:
+            try:
+                item["df"] = db.query(
+                    enforce_readonly(result["sql"], default_limit=default_limit), trace=trace, role=role
+                )
+            except Exception as e:
+                item["ok"], item["error"] = False, f"execution: {e}"
+        trace["batch_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return item
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="text2sql") as pool:
+        # map() keeps input order regardless of completion order
+        return list(pool.map(one, questions))
@@ -0,0 +1,315 @@
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from ui.catalog import CATALOG
+from ui.llm_cache import normalize_question
+
+# Local answers for the common question shapes (the sidebar quick queries,
+# smoke_db.py): matched and parameterized without calling the LLM.
+VIEW = "bank.v_transactions_enriched"
+
+DEFAULT_N = 10
+MAX_N = 1000
+
+_MONTHS = {
+    "ocak": 1, "subat": 2, "mart": 3, "nisan": 4, "mayis": 5, "haziran": 6, "temmuz": 7, "agustos": 8,
+    "eylul": 9, "ekim": 10, "kasim": 11, "aralik": 12,
+    "january": 1, "february": 2, "march": 3, "april": 4, "may": 5, "june": 6, "july": 7, "august": 8,
+    "september": 9, "october": 10, "november": 11, "december": 12,
+}
+_MONTH_RE = "|".join(sorted(_MONTHS, key=len, reverse=True))
+_UNIT = r"(gun|day|hafta|week|ay|month|yil|year)"
+
+# Turkish words for MerchantCategory values; used only when the profiled
+# values in schema.json contain the target
+CATEGORY_SYNONYMS = {
+    "restoran": "Restaurant", "lokanta": "Restaurant", "yemek": "Restaurant", "akaryakit": "Fuel",
+    "benzin": "Fuel", "yakit": "Fuel", "seyahat": "Travel", "tatil": "Travel", "fatura": "Utilities",
+    "egitim": "Education", "elektronik": "Electronics", "giyim": "Clothing", "market": "Grocery",
+    "saglik": "Health", "eglence": "Entertainment",
+}
+
+# Words naming a filtered column ("restoran kategorisinde"); allowed once
+# that column has a filter value
+FILTER_WORDS = {
+    "City": frozenset("sehir sehr city".split()),
+    "MerchantCategory": frozenset("kategori category sektor".split()),
+    "Mode": frozenset("odeme mode payment tip tipi tipler ile".split()),
+}
+
+# Words that carry no meaning for any intent (incl. suffixes split off by an
+# apostrophe: İstanbul'daki -> "istanbul daki")
+FILLER = frozenset(
+    "en ve ile icin bana lutfen nedir neler nelerdir hangi hangileri hangisi olan goster listele getir ver "
+    "tum butun tane adet da de ta te daki deki taki teki dan den tan ten nin in un nun yi yu i u "
+    "yili yilinda yilindaki ayi ayinda ayindaki "
+    "show list me the of by per for what are is which a all please give in during".split()
+)
+
+
+def _fold(text: str) -> str:
+    return normalize_question(text)
+
+
+def _months_back(d: date, n: int) -> date:
+    y, m = divmod(d.year * 12 + d.month - 1 - n, 12)
+    return date(y, m + 1, 1)
+
+
+@dataclass
+class Params:
+    n: Optional[int] = None
+    since: Optional[date] = None
+    until: Optional[date] = None  # exclusive
+    filters: Dict[str, str] = field(default_factory=dict)  # column -> value
+
+    def where(self) -> str:
+        conds = []
+        if self.since is not None:
+            conds.append(f"TransactionDate >= DATE '{self.since.isoformat()}'")
+        if self.until is not None:
+            conds.append(f"TransactionDate < DATE '{self.until.isoformat()}'")
+        for col, value in self.filters.items():
+            conds.append(f"{col} = '" + value.replace("'", "''") + "'")
+        return ("WHERE " + " AND ".join(conds) + "\n") if conds else ""
+
+    def describe(self) -> str:
+        parts = []
+        if self.since or self.until:
+            lo = self.since.isoformat() if self.since else "…"
+            hi = (self.until - timedelta(days=1)).isoformat() if self.until else "…"
+            parts.append(f"{lo} – {hi}")
+        parts.extend(self.filters.values())
+        return f" ({', '.join(parts)})" if parts else ""
+
+
+@dataclass(frozen=True)
+class Intent:
+    name: str
+    # Each group must be hit by at least one token
+    requires: Tuple[FrozenSet[str], ...]
+    # Every other token must be one of these (or filler), else the question
+    # says something the template would ignore and goes to the LLM
+    vocab: FrozenSet[str]
+    build: Callable[[Params], Tuple[str, str]]
+    # Column the result is grouped by: a filter on it leaves nothing to group
+    group_by: Optional[str] = None
+
+
+def _stems(words: str) -> FrozenSet[str]:
+    return frozenset(words.split())
+
+
+def _hit(token: str, stems: FrozenSet[str]) -> bool:
+    # Stems of 4+ letters also match with Turkish suffixes (islemler, kategoriye)
+    return token in stems or any(len(s) >= 4 and token.startswith(s) for s in stems)
+
+
+def _latest(p: Params) -> Tuple[str, str]:
+    n = p.n or DEFAULT_N
+    sql = (
+        "SELECT TransactionID, TransactionDate, CustomerName, Amount, MerchantName, MerchantCategory, City\n"
+        f"FROM {VIEW}\n{p.where()}ORDER BY TransactionDate DESC, TransactionID DESC\nLIMIT {n}"
+    )
+    return sql, f"Son {n} işlem{p.describe()}."
+
+
+def _top_merchants(p: Params) -> Tuple[str, str]:
+    n = p.n or DEFAULT_N
+    sql = (
+        "SELECT MerchantName, SUM(Amount) AS total_spend\n"
+        f"FROM {VIEW}\n{p.where()}GROUP BY MerchantName\nORDER BY total_spend DESC\nLIMIT {n}"
+    )
+    return sql, f"En çok harcama yapılan {n} işyeri{p.describe()}."
+
+
+def _group_spend(column: str, label: str) -> Callable[[Params], Tuple[str, str]]:
+    def build(p: Params) -> Tuple[str, str]:
+        sql = (
+            f"SELECT {column}, SUM(Amount) AS total_spend, COUNT(*) AS txn_count\n"
+            f"FROM {VIEW}\n{p.where()}GROUP BY {column}\nORDER BY total_spend DESC\nLIMIT {p.n or 50}"
+        )
+        return sql, f"{label} toplam harcama{p.describe()}."
+
+    return build
+
+
+def _mode_distribution(p: Params) -> Tuple[str, str]:
+    sql = (
+        "SELECT Mode, COUNT(*) AS txn_count, SUM(Amount) AS total_amount\n"
+        f"FROM {VIEW}\n{p.where()}GROUP BY Mode\nORDER BY txn_count DESC\nLIMIT {p.n or 50}"
+    )
+    return sql, f"Ödeme tiplerine göre işlem dağılımı{p.describe()}."
+
+
+_GROUPING = "bazinda bazli gore dagilim distribution harcama spend spending toplam total tutar"
+
+INTENTS: List[Intent] = [
+    Intent(
+        "latest_transactions",
+        (_stems("son latest last recent yeni newest"), _stems("islem transaction hareket txn")),
+        _stems("son latest last recent yeni newest islem transaction hareket txn"),
+        _latest,
+    ),
+    Intent(
+        "top_merchants",
+        (_stems("merchant isyer magaza satici"), _stems("cok fazla top highest most buyuk")),
+        _stems("merchant isyer magaza satici cok fazla top highest most buyuk harcama spend spending "
+               "yapilan yapan toplam total tutar ciro"),
+        _top_merchants,
+    ),
+    Intent(
+        "spend_by_category",
+        (_stems("kategori category sektor"),),
+        _stems("kategori category sektor " + _GROUPING),
+        _group_spend("MerchantCategory", "Kategori bazında"),
+        "MerchantCategory",
+    ),
+    Intent(
+        "mode_distribution",
+        (_stems("odeme mode payment kanal yontem"),),
+        _stems("odeme mode payment kanal yontem tip tipi tipler tur turu type islem sayi count " + _GROUPING),
+        _mode_distribution,
+        "Mode",
+    ),
+    Intent(
+        "spend_by_gender",
+        (_stems("cinsiyet gender"),),
+        _stems("cinsiyet gender " + _GROUPING),
+        _group_spend("Gender", "Cinsiyete göre"),
+        "Gender",
+    ),
+    Intent(
+        "spend_by_city",
+        (_stems("sehir sehr city"),),
+        _stems("sehir sehr city " + _GROUPING),
+        _group_spend("City", "Şehir bazında"),
+        "City",
+    ),
+]
+
+
+@dataclass
+class IntentMatch:
+    intent: str
+    sql: str
+    answer: str
+    params: Dict[str, object]
+
+
+def _take_dates(text: str, today: date, p: Params) -> str:
+    """Sets p.since/p.until from the first date phrase found; returns text without it."""
+    m = re.search(rf"\b(?:son|last|past)\s+(\d{{1,3}})\s+{_UNIT}\w*", text)
+    if m:
+        n, unit = int(m.group(1)), m.group(2)
+        # Calendar months (the current one counts as the first)
+        if unit in ("ay", "month"):
+            p.since = _months_back(today, max(n, 1) - 1)
+        elif unit in ("yil", "year"):
+            p.since = _months_back(today, 12 * max(n, 1) - 1)
+        else:
+            p.since = today - timedelta(days=n * (7 if unit in ("hafta", "week") else 1))
+        return text[:m.start()] + " " + text[m.end():]
+
+    m = re.search(rf"\b(bu|this|gecen|previous|onceki)\s+{_UNIT}\w*", text)
+    if m:
+        back = 0 if m.group(1) in ("bu", "this") else 1
+        unit = m.group(2)
+        if unit in ("ay", "month"):
+            p.since = _months_back(today, back)
+            p.until = _months_back(today, back - 1) if back else None
+        elif unit in ("yil", "year"):
+            p.since = date(today.year - back, 1, 1)
+            p.until = date(today.year, 1, 1) if back else None
+        elif unit in ("hafta", "week"):
+            monday = today - timedelta(days=today.weekday())
+            p.since = monday - timedelta(days=7 * back)
+            p.until = monday if back else None
+        else:
+            p.since = today - timedelta(days=back)
+            p.until = p.since + timedelta(days=1)
+        return text[:m.start()] + " " + text[m.end():]
+
+    m = re.search(rf"\b(?:({_MONTH_RE})\w*\s+((?:19|20)\d\d)|((?:19|20)\d\d)\s+({_MONTH_RE})\w*)\b", text)
+    if m:
+        month = _MONTHS[m.group(1) or m.group(4)]
+        year = int(m.group(2) or m.group(3))
+        p.since = date(year, month, 1)
+        p.until = _months_back(p.since, -1)
+        return text[:m.start()] + " " + text[m.end():]
+
+    for m in re.finditer(r"\b((?:19|20)\d\d)\b", text):
+        # A number right after son/top/ilk is a count ("son 2000 islem"), not a year
+        if re.search(r"\b(?:son|last|past|top|ilk|first)\s+$", text[:m.start()]):
+            continue
+        year = int(m.group(1))
+        p.since, p.until = date(year, 1, 1), date(year + 1, 1, 1)
+        return text[:m.start()] + " " + text[m.end():]
+    return text
+
+
+def _take_values(text: str, p: Params) -> str:
+    """Filters on City / MerchantCategory / Mode values named in the text (profiled values only)."""
+    stats = CATALOG.column_stats(VIEW)
+    names: List[Tuple[str, str, str]] = []  # (folded phrase, column, value)
+    for column in ("City", "MerchantCategory", "Mode"):
+        for value in (stats.get(column) or {}).get("values") or []:
+            names.append((_fold(str(value)), column, str(value)))
+    categories = set((stats.get("MerchantCategory") or {}).get("values") or [])
+    names += [(word, "MerchantCategory", value) for word, value in CATEGORY_SYNONYMS.items() if value in categories]
+    # Longest first, so "is bankasi"-style multi-word values win over parts
+    for phrase, column, value in sorted(names, key=lambda x: -len(x[0])):
+        if not phrase or column in p.filters:
+            continue
+        m = re.search(rf"\b{re.escape(phrase)}\w*", text)
+        if m:
+            p.filters[column] = value
+            text = text[:m.start()] + " " + text[m.end():]
+    return text
+
+
+def match_intent(question: str, today: Optional[date] = None) -> Optional[IntentMatch]:
+    """
+    SQL for `question` when it is one of the known shapes (INTENTS) with
+    optional N, date range, city, category and payment mode; None otherwise.
+    Conservative: any word the template would ignore sends the question to
+    the LLM instead.
+    """
+    text = _fold(question)
+    if not text:
+        return None
+    p = Params()
+    text = _take_dates(text, today or date.today(), p)
+    text = _take_values(text, p)
+    numbers = re.findall(r"\b\d+\b", text)
+    if len(numbers) > 1:
+        return None
+    if numbers:
+        # Silently capping a larger N would answer a different question
+        if int(numbers[0]) > MAX_N:
+            return None
+        p.n = max(1, int(numbers[0]))
+    tokens = [t for t in re.sub(r"\b\d+\b", " ", text).split() if t not in FILLER]
+
+    extra = frozenset().union(*(FILTER_WORDS[c] for c in p.filters))
+    for intent in INTENTS:
+        if intent.group_by in p.filters:
+            continue
+        if not all(any(_hit(t, group) for t in tokens) for group in intent.requires):
+            continue
+        if all(_hit(t, intent.vocab) or _hit(t, extra) for t in tokens):
+            sql, answer = intent.build(p)
+            params = {"n": p.n, "since": p.since, "until": p.until, **p.filters}
+            return IntentMatch(intent.name, sql, answer, {
+                k: v.isoformat() if isinstance(v, date) else v for k, v in params.items() if v is not None
+            })
+    return None
+
+
+def intents_enabled() -> bool:
+    return os.getenv("INTENT_MATCHER", "1").strip().lower() not in ("0", "false", "off")
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from ui.execution import QueryCancelled, QueryControl
+
+# Questions answered (LLM + first execution) at once across all sessions of this process
+DEFAULT_WORKERS = int(os.getenv("TEXT2SQL_WORKERS", "16"))
+# Questions allowed to wait for a worker before new ones are refused
+DEFAULT_MAX_QUEUED = int(os.getenv("TEXT2SQL_MAX_QUEUED", "64"))
+
+# Job states; the last three are final
+QUEUED, LLM, SQL, DONE, FAILED, CANCELLED = "queued", "llm", "sql", "done", "failed", "cancelled"
+FINAL = (DONE, FAILED, CANCELLED)
+
+
+class JobsFull(RuntimeError):
+    pass
+
+
+class Job:
+    """
+    One question being answered in the background. The script thread keeps
+    the handle in session state and polls state/elapsed() on reruns; the
+    worker fills `result` (and whatever else the job function sets on
+    `outputs`). control.cancel() aborts the LLM request and interrupts DuckDB.
+    """
+
+    def __init__(self, job_id: str, control: Optional[QueryControl] = None):
+        self.id = job_id
+        self.control = control or QueryControl()
+        self.state = QUEUED
+        self.result: Optional[Dict[str, Any]] = None
+        self.outputs: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+        self.created = time.perf_counter()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return self.state in FINAL
+
+    def stage(self, state: str) -> None:
+        # Set by the job function as it moves from the LLM to execution
+        if not self.done:
+            self.state = state
+
+    def cancel(self) -> None:
+        self.control.cancel()
+
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.created
+
+    def progress(self) -> dict:
+        queued = (self.started or self.finished or time.perf_counter()) - self.created
+        return {
+            "state": self.state,
+            "elapsed_s": round(self.elapsed(), 1),
+            "queued_s": round(queued, 1),
+            "error": self.error,
+        }
+
+
+class JobRunner:
+    """
+    Bounded background executor for questions: `max_workers` run at once,
+    up to `max_queued` more wait, and submit() raises JobsFull beyond that,
+    so a burst of analysts queues instead of piling up threads.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, max_queued: int = DEFAULT_MAX_QUEUED):
+        self.max_workers = max(1, max_workers)
+        self.max_queued = max(0, max_queued)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="text2sql-job")
+        self._lock = threading.Lock()
+        self._active = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+
+    def submit(self, job: Job, fn: Callable[[Job], Dict[str, Any]]) -> Job:
+        """Runs fn(job) on a worker; its return value becomes job.result."""
+        with self._lock:
+            if self._active >= self.max_workers + self.max_queued:
+                raise JobsFull(f"Sunucu meşgul: {self._active} soru sırada, biraz sonra tekrar deneyin")
+            self._active += 1
+        self._pool.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job: Job, fn: Callable[[Job], Dict[str, Any]]) -> None:
+        job.started = time.perf_counter()
+        state = FAILED
+        try:
+            if job.control.cancelled:
+                raise QueryCancelled("soru iptal edildi")
+            job.result = fn(job)
+            state = DONE
+        except QueryCancelled as e:
+            # A role deadline (QueryTimeout) is a failure, not a cancel
+            job.error, state = str(e), CANCELLED if job.control.cancelled else FAILED
+        except Exception as e:
+            job.error, state = f"{type(e).__name__}: {e}", FAILED
+        finally:
+            job.finished = time.perf_counter()
+            with self._lock:
+                self._active -= 1
+                if state == DONE:
+                    self.completed += 1
+                elif state == CANCELLED:
+                    self.cancelled += 1
+                else:
+                    self.failed += 1
+        # Published last: once the script sees a final state, result/outputs are complete
+        job.state = state
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "active": self._active,
+                "running": min(self._active, self.max_workers),
+                "queued": max(0, self._active - self.max_workers),
+                "max_workers": self.max_workers,
+                "max_queued": self.max_queued,
+                "completed": self.completed,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+            }
+
+
+# Shared by every Streamlit session in this process
+JOBS = JobRunner()
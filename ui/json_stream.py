@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import json
+from typing import Dict, List, Tuple
+
+
+class JsonFieldStream:
+    """
+    Incremental reader for the top-level string fields of one JSON object
+    arriving in chunks (a streamed completion). feed() returns the fields
+    whose string value closed in that chunk, so {"sql": "...", "answer": ...}
+    yields "sql" while "answer" is still being generated. Each character is
+    looked at once; text before the first "{" (```json fences, prose) is
+    skipped. Non-string values are stepped over and not reported.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, str] = {}
+        self.done = False
+        self.started = False
+        self._depth = 0
+        self._in_str = False
+        self._esc = False
+        self._capture = False  # collecting a top-level key/value string
+        self._buf: List[str] = []
+        self._expect = "key"  # key | colon | value | comma
+        self._key = ""
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        out: List[Tuple[str, str]] = []
+        for ch in chunk:
+            if self.done:
+                break
+            if self._in_str:
+                if self._capture:
+                    self._buf.append(ch)
+                if self._esc:
+                    self._esc = False
+                elif ch == "\\":
+                    self._esc = True
+                elif ch == '"':
+                    self._in_str = False
+                    if self._capture:
+                        self._capture = False
+                        text = json.loads('"' + "".join(self._buf))
+                        self._buf = []
+                        if self._expect == "key":
+                            self._key, self._expect = text, "colon"
+                        else:
+                            self.fields[self._key] = text
+                            out.append((self._key, text))
+                            self._expect = "comma"
+                continue
+
+            if not self.started:
+                if ch == "{":
+                    self.started, self._depth = True, 1
+                continue
+
+            if ch == '"':
+                self._in_str = True
+                self._capture = self._depth == 1 and self._expect in ("key", "value")
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.done = True
+                elif self._depth == 1:
+                    self._expect = "comma"
+            elif self._depth == 1:
+                if ch == ":" and self._expect == "colon":
+                    self._expect = "value"
+                elif ch == ",":
+                    self._expect = "key"
+                elif not ch.isspace() and self._expect == "value":
+                    # Number / true / false / null: nothing to report
+                    self._expect = "comma"
+        return out
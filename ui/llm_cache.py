@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+ALLOWLIST_PATH = REPO_ROOT / "data" / "metadata" / "allowlist.json"
+
+DEFAULT_CACHE_PATH = REPO_ROOT / "data" / "cache" / "llm_cache.sqlite"
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 5000
+# last_used only drives LRU eviction: a hit rewrites it at most this often
+DEFAULT_TOUCH_INTERVAL = 300
+
+# Turkish letters folded to their ASCII keyboard form, so "işlem" == "islem"
+_TR_FOLD = str.maketrans({"ı": "i", "ç": "c", "ğ": "g", "ö": "o", "ş": "s", "ü": "u"})
+
+
+def normalize_question(question: str) -> str:
+    """
+    Canonical form of a question for cache lookups:
+      - Turkish case folding (İ -> i, I -> ı) before lower(), then ı/ç/ğ/ö/ş/ü
+        folded to ASCII so dotted/dotless and keyboard variants match
+      - any Unicode digit -> ASCII digit
+      - punctuation/symbols -> space, whitespace collapsed
+    """
+    text = unicodedata.normalize("NFC", question or "")
+    text = text.replace("İ", "i").replace("I", "ı").lower().translate(_TR_FOLD)
+    out = []
+    for ch in unicodedata.normalize("NFC", text):
+        cat = unicodedata.category(ch)
+        if cat == "Nd":
+            out.append(str(unicodedata.digit(ch)))
+        elif cat[0] in "PSZC":
+            out.append(" ")
+        elif cat == "Mn":
+            # leftover combining marks (e.g. a decomposed dot above)
+            continue
+        else:
+            out.append(ch)
+    return " ".join("".join(out).split())
+
+
+class LLMCache:
+    """
+    Persistent (SQLite) cache of text2sql answers keyed by
+    (normalized question, role, model, allowlist hash), with a TTL and an
+    LRU cap on the number of entries. Entries made against another version of
+    allowlist.json are dropped the first time the new file is seen.
+
+    A hit is a read-only lookup unless the entry's last_used is older than
+    `touch_interval` seconds, so hot entries don't cost a write per request;
+    LRU order is only accurate to that interval.
+    """
+
+    def __init__(
+        self,
+        path: Path = DEFAULT_CACHE_PATH,
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        allowlist_path: Path = ALLOWLIST_PATH,
+        touch_interval: float = DEFAULT_TOUCH_INTERVAL,
+    ):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self.allowlist_path = Path(allowlist_path)
+        self._lock = threading.Lock()
+        self._allowlist_stat: Optional[tuple] = None
+        self._allowlist_hash = ""
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        con = sqlite3.connect(str(self.path), timeout=5)
+        if not self._ready:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    allowlist_hash TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self._ready = True
+        return con
+
+    def allowlist_hash(self) -> str:
+        """sha256 of allowlist.json, re-read only when its mtime/size change."""
+        try:
+            st = self.allowlist_path.stat()
+            stat = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return ""
+        if stat != self._allowlist_stat:
+            digest = hashlib.sha256(self.allowlist_path.read_bytes()).hexdigest()
+            with self._lock:
+                changed = self._allowlist_hash and digest != self._allowlist_hash
+                self._allowlist_stat, self._allowlist_hash = stat, digest
+            if changed:
+                self.invalidate_other_allowlists()
+        return self._allowlist_hash
+
+    def key(self, question: str, role: str, model: str) -> str:
+        raw = json.dumps([normalize_question(question), role, model, self.allowlist_hash()])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, question: str, role: str, model: str) -> Optional[Dict[str, Any]]:
+        key = self.key(question, role, model)
+        now = time.time()
+        con = self._connect()
+        try:
+            row = con.execute(
+                "SELECT payload, created_at, last_used FROM llm_cache WHERE key = ?", [key]
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                con.execute("DELETE FROM llm_cache WHERE key = ?", [key])
+                con.commit()
+                return None
+            if now - row[2] >= self.touch_interval:
+                con.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", [now, key])
+                con.commit()
+            return json.loads(row[0])
+        finally:
+            con.close()
+
+    def put(self, question: str, role: str, model: str, payload: Dict[str, Any]) -> None:
+        key = self.key(question, role, model)
+        now = time.time()
+        con = self._connect()
+        try:
+            con.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?)",
+                [key, self._allowlist_hash, json.dumps(payload, ensure_ascii=False), now, now],
+            )
+            con.execute("DELETE FROM llm_cache WHERE created_at < ?", [now - self.ttl])
+            con.execute(
+                """
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                [self.max_entries],
+            )
+            con.commit()
+        finally:
+            con.close()
+
+    def invalidate_other_allowlists(self) -> int:
+        con = self._connect()
+        try:
+            n = con.execute(
+                "DELETE FROM llm_cache WHERE allowlist_hash != ?", [self._allowlist_hash]
+            ).rowcount
+            con.commit()
+            return n
+        finally:
+            con.close()
+
+    def stats(self) -> Dict[str, Any]:
+        con = self._connect()
+        try:
+            n = con.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        finally:
+            con.close()
+        return {"entries": n, "path": str(self.path), "ttl": self.ttl, "max_entries": self.max_entries}
+
+
+def _default_cache() -> Optional[LLMCache]:
+    if os.getenv("LLM_CACHE", "1").strip().lower() in ("0", "false", "off"):
+        return None
+    return LLMCache(
+        path=Path(os.getenv("LLM_CACHE_PATH", str(DEFAULT_CACHE_PATH))),
+        ttl=float(os.getenv("LLM_CACHE_TTL", str(DEFAULT_TTL))),
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", str(DEFAULT_MAX_ENTRIES))),
+        touch_interval=float(os.getenv("LLM_CACHE_TOUCH_INTERVAL", str(DEFAULT_TOUCH_INTERVAL))),
+    )
+
+
+# Shared by all sessions; None when disabled with LLM_CACHE=0
+LLM_CACHE = _default_cache()
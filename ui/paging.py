@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import Callable, ContextManager, Hashable, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+# Rows per Arrow record batch pulled from DuckDB (a multiple of its vector size)
+BATCH_ROWS = 2048
+
+# Arrow bytes a Streamlit session may keep for paged results
+DEFAULT_SESSION_BYTES = int(os.getenv("RESULT_PAGE_MEMORY_BYTES", str(64 * 1024 * 1024)))
+DEFAULT_MAX_PAGERS = 4
+
+
+class ResultPager:
+    """
+    One query result, read page by page from a DuckDB record batch reader.
+
+    Batches are pulled only as far as the requested page. Batches before the
+    current page are dropped when `max_bytes` is exceeded; going back to them
+    re-opens the reader. `total_rows` is counted by DuckDB up front, so the UI
+    knows the result size without fetching it.
+
+    - open_reader: returns a fresh pa.RecordBatchReader over the result
+    - to_frame: converts an Arrow table to the DataFrame shown in the UI
+    - on_complete: receives the full table once every batch was read in one pass
+    - release: called once by close()
+    - guard: context manager entered around reader execution and fetches
+    """
+
+    def __init__(
+        self,
+        open_reader: Callable[[], pa.RecordBatchReader],
+        total_rows: int,
+        to_frame: Callable[[pa.Table], pd.DataFrame],
+        on_complete: Optional[Callable[[pa.Table], None]] = None,
+        release: Optional[Callable[[], None]] = None,
+        max_bytes: int = DEFAULT_SESSION_BYTES,
+        guard: Optional[Callable[[], ContextManager]] = None,
+    ):
+        self.total_rows = total_rows
+        self.max_bytes = max_bytes
+        self._open_reader = open_reader
+        self._to_frame = to_frame
+        self._on_complete = on_complete
+        self._release = release
+        self._guard = guard or nullcontext
+        self._lock = threading.Lock()
+        self._reader: Optional[pa.RecordBatchReader] = None
+        self._schema: Optional[pa.Schema] = None
+        self._batches: List[pa.RecordBatch] = []
+        self._first_row = 0  # row number of self._batches[0]
+        self._read_rows = 0  # rows pulled from the current reader
+        self._exhausted = False
+        self._complete = True  # no batch dropped during the current pass
+        self.reopens = 0
+        self.closed = False
+
+    @property
+    def nbytes(self) -> int:
+        return sum(b.nbytes for b in self._batches)
+
+    def page_count(self, page_size: int) -> int:
+        return max(1, -(-self.total_rows // page_size))
+
+    def _reopen(self) -> None:
+        self._reader = self._open_reader()
+        self._schema = self._reader.schema
+        self._batches, self._first_row, self._read_rows = [], 0, 0
+        self._exhausted, self._complete = False, True
+
+    def _fetch(self, keep_from: int) -> bool:
+        try:
+            batch = self._reader.read_next_batch()
+        except StopIteration:
+            self._exhausted = True
+            if self._complete and self._on_complete is not None:
+                self._on_complete(pa.Table.from_batches(self._batches, schema=self._schema))
+                self._on_complete = None
+            return False
+        self._batches.append(batch)
+        self._read_rows += batch.num_rows
+        # Over budget: drop batches that end before the page being read
+        while self.nbytes > self.max_bytes and len(self._batches) > 1:
+            first = self._batches[0]
+            if self._first_row + first.num_rows > keep_from:
+                break
+            self._batches.pop(0)
+            self._first_row += first.num_rows
+            self._complete = False
+        return True
+
+    def rows(self, start: int, count: int) -> pa.Table:
+        """Rows [start, start + count) as an Arrow table."""
+        with self._lock:
+            if self.closed:
+                raise RuntimeError("pager is closed")
+            end = start + count
+            reopen = self._reader is None or start < self._first_row
+            if reopen or (self._read_rows < end and not self._exhausted):
+                try:
+                    with self._guard():
+                        if reopen:
+                            if self._reader is not None:
+                                self.reopens += 1
+                            self._reopen()
+                        while self._read_rows < end and not self._exhausted:
+                            self._fetch(keep_from=start)
+                except BaseException:
+                    # An interrupted reader cannot continue; start over next time
+                    self._reader, self._batches, self._first_row, self._read_rows = None, [], 0, 0
+                    raise
+            table = pa.Table.from_batches(self._batches, schema=self._schema)
+            return table.slice(start - self._first_row, count)
+
+    def page(self, number: int, page_size: int) -> pd.DataFrame:
+        """Page `number` (0-based) as a DataFrame."""
+        return self._to_frame(self.rows(number * page_size, page_size))
+
+    def trim(self) -> None:
+        """Drops every fetched batch (the reader is re-opened on next access)."""
+        with self._lock:
+            self._batches, self._first_row, self._read_rows = [], 0, 0
+            self._reader = None
+
+    def close(self) -> None:
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            self._batches = []
+            self._reader = None
+            if self._release is not None:
+                self._release()
+
+
+class PagerSession:
+    """
+    The open pagers of one UI session, keyed by history entry, under a shared
+    memory cap. Least recently used pagers give up their batches first and are
+    closed (releasing their cursor) beyond `max_pagers`.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_SESSION_BYTES, max_pagers: int = DEFAULT_MAX_PAGERS):
+        self.max_bytes = max_bytes
+        self.max_pagers = max_pagers
+        self._pagers: "OrderedDict[Hashable, ResultPager]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[ResultPager]:
+        pager = self._pagers.get(key)
+        if pager is not None and pager.closed:
+            # Closed under the process-wide pager cap (SnapshotManager.max_pagers)
+            del self._pagers[key]
+            return None
+        if pager is not None:
+            self._pagers.move_to_end(key)
+        return pager
+
+    def put(self, key: Hashable, pager: ResultPager) -> ResultPager:
+        old = self._pagers.pop(key, None)
+        if old is not None and old is not pager:
+            old.close()
+        pager.max_bytes = self.max_bytes
+        self._pagers[key] = pager
+        while len(self._pagers) > self.max_pagers:
+            _, evicted = self._pagers.popitem(last=False)
+            evicted.close()
+        return pager
+
+    def keys(self) -> List[Hashable]:
+        return list(self._pagers)
+
+    def discard(self, key: Hashable) -> None:
+        pager = self._pagers.pop(key, None)
+        if pager is not None:
+            pager.close()
+
+    def page(self, key: Hashable, number: int, page_size: int) -> pd.DataFrame:
+        pager = self._pagers[key]
+        df = pager.page(number, page_size)
+        self._enforce(keep=key)
+        return df
+
+    def _enforce(self, keep: Hashable) -> None:
+        for key, pager in list(self._pagers.items()):
+            if self.nbytes <= self.max_bytes:
+                return
+            if key != keep:
+                pager.trim()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(p.nbytes for p in self._pagers.values())
+
+    def stats(self) -> dict:
+        return {"pagers": len(self._pagers), "bytes": self.nbytes, "max_bytes": self.max_bytes}
+
+    def close(self) -> None:
+        for pager in self._pagers.values():
+            pager.close()
+        self._pagers.clear()
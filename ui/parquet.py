@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+import duckdb
+
+from ui.sql_analysis import analyze, deserialize, serialize
+
+# Layout written by scripts/export_parquet.py under the export root:
+#   transactions/year=YYYY/month=M/*.parquet           bank.Transactions_Bank
+#   transactions_enriched/year=YYYY/month=M/*.parquet  bank.v_transactions_enriched
+#   <dimension table>.parquet                          bank.Customers_Bank, ...
+SCHEMA = "bank"
+VIEW = "v_transactions_enriched"
+# Same rows as VIEW plus the year/month partition columns filters can prune on
+PARTITIONED_VIEW = "p_transactions_enriched"
+PARTITIONED = {"transactions": "Transactions_Bank", "transactions_enriched": PARTITIONED_VIEW}
+DIMENSIONS = ["Customers_Bank", "Cards_Master", "Merchants_Master"]
+PARTITION_COLUMNS = ("year", "month")
+DATE_COLUMN = "transactiondate"
+
+
+def dataset_version(root: Path) -> str:
+    """
+    Fingerprint of an export: changes when a partition directory or a
+    dimension file is added, replaced or removed (directory mtimes), without
+    listing every data file.
+    """
+    root = Path(root)
+    h = hashlib.sha256()
+    for p in sorted([root, *root.glob("*/"), *root.glob("*/year=*"), *root.glob("*/year=*/month=*"),
+                     *root.glob("*.parquet")]):
+        try:
+            st = p.stat()
+        except FileNotFoundError:
+            continue
+        h.update(f"{p.relative_to(root)}:{st.st_mtime_ns}:{st.st_size}\n".encode("utf-8"))
+    return f"parquet-{h.hexdigest()[:16]}"
+
+
+def connect_parquet(root: Path) -> duckdb.DuckDBPyConnection:
+    """
+    In-memory database whose bank.* views read the Parquet export under
+    `root`. Views glob the files on every query, so new months show up
+    without reconnecting.
+    """
+    root = Path(root).resolve()
+    con = duckdb.connect(database=":memory:")
+    try:
+        # Footers are read once per file instead of once per query
+        con.execute("SET parquet_metadata_cache = true")
+    except duckdb.Error:
+        pass
+    con.execute(f"CREATE SCHEMA {SCHEMA}")
+    for sub, name in PARTITIONED.items():
+        if (root / sub).is_dir():
+            pattern = (root / sub).as_posix() + "/year=*/month=*/*.parquet"
+            con.execute(
+                f"CREATE VIEW {SCHEMA}.{name} AS SELECT * FROM read_parquet('{pattern}', "
+                "hive_partitioning = true, union_by_name = true)"
+            )
+    if (root / "transactions_enriched").is_dir():
+        con.execute(
+            f"CREATE VIEW {SCHEMA}.{VIEW} AS SELECT * EXCLUDE ({', '.join(PARTITION_COLUMNS)}) "
+            f"FROM {SCHEMA}.{PARTITIONED_VIEW}"
+        )
+    for name in DIMENSIONS:
+        path = root / f"{name}.parquet"
+        if path.exists():
+            con.execute(f"CREATE VIEW {SCHEMA}.{name} AS SELECT * FROM read_parquet('{path.as_posix()}')")
+    return con
+
+
+# ----------------------------
+# Partition pruning
+# ----------------------------
+
+_LOWER = {"COMPARE_GREATERTHANOREQUALTO", "COMPARE_GREATERTHAN"}
+_UPPER = {"COMPARE_LESSTHANOREQUALTO", "COMPARE_LESSTHAN"}
+_FLIP = {
+    "COMPARE_GREATERTHANOREQUALTO": "COMPARE_LESSTHANOREQUALTO",
+    "COMPARE_GREATERTHAN": "COMPARE_LESSTHAN",
+    "COMPARE_LESSTHANOREQUALTO": "COMPARE_GREATERTHANOREQUALTO",
+    "COMPARE_LESSTHAN": "COMPARE_GREATERTHAN",
+    "COMPARE_EQUAL": "COMPARE_EQUAL",
+}
+
+
+def _date_constant(node: Any) -> Optional[date]:
+    if isinstance(node, dict) and node.get("class") == "CAST":
+        if node["cast_type"]["id"] not in ("DATE", "TIMESTAMP", "TIMESTAMP WITH TIME ZONE"):
+            return None
+        node = node["child"]
+    if not isinstance(node, dict) or node.get("class") != "CONSTANT" or node["value"].get("is_null"):
+        return None
+    try:
+        return date.fromisoformat(str(node["value"]["value"])[:10])
+    except ValueError:
+        return None
+
+
+def _is_midnight(node: Any) -> bool:
+    if isinstance(node, dict) and node.get("class") == "CAST":
+        node = node["child"]
+    text = str(node["value"]["value"])
+    return len(text) == 10 or text[10:].strip(" T:0.") == ""
+
+
+def _is_date_column(node: Any, qualifiers: set) -> bool:
+    if not isinstance(node, dict) or node.get("class") != "COLUMN_REF":
+        return False
+    *qual, name = node["column_names"]
+    return name.lower() == DATE_COLUMN and (not qual or qual[-1].lower() in qualifiers)
+
+
+def _bounds(where: Any, qualifiers: set) -> Tuple[Optional[date], Optional[date]]:
+    """(lowest, highest) TransactionDate the top-level AND conjuncts of `where` allow."""
+    lo = hi = None
+    if not where:
+        return lo, hi
+    conjuncts = where["children"] if where.get("type") == "CONJUNCTION_AND" else [where]
+    for c in conjuncts:
+        found: list = []
+        if c.get("class") == "BETWEEN" and _is_date_column(c["input"], qualifiers):
+            found = [("lo", _date_constant(c["lower"])), ("hi", _date_constant(c["upper"]))]
+        elif c.get("class") == "COMPARISON":
+            op, left, right = c["type"], c["left"], c["right"]
+            if _is_date_column(right, qualifiers):
+                op, left, right = _FLIP.get(op, ""), right, left
+            if _is_date_column(left, qualifiers):
+                d = _date_constant(right)
+                if op in _LOWER or op == "COMPARE_EQUAL":
+                    found.append(("lo", d))
+                if op == "COMPARE_LESSTHAN" and d is not None and _is_midnight(right):
+                    # < 'YYYY-MM-01' excludes that whole month
+                    d -= timedelta(days=1)
+                if op in _UPPER or op == "COMPARE_EQUAL":
+                    found.append(("hi", d))
+        for side, d in found:
+            if d is None:
+                continue
+            if side == "lo":
+                lo = d if lo is None else max(lo, d)
+            else:
+                hi = d if hi is None else min(hi, d)
+    return lo, hi
+
+
+def _partition_predicate(lo: Optional[date], hi: Optional[date]) -> str:
+    parts = []
+    if lo is not None:
+        parts.append(f"(year > {lo.year} OR (year = {lo.year} AND month >= {lo.month}))")
+    if hi is not None:
+        parts.append(f"(year < {hi.year} OR (year = {hi.year} AND month <= {hi.month}))")
+    return " AND ".join(parts)
+
+
+def _rewrite(node: Any) -> bool:
+    changed = False
+    if isinstance(node, list):
+        for v in node:
+            changed |= _rewrite(v)
+        return changed
+    if not isinstance(node, dict):
+        return False
+    src = node.get("from_table") if node.get("type") == "SELECT_NODE" else None
+    if (
+        isinstance(src, dict)
+        and src.get("type") == "BASE_TABLE"
+        and src.get("schema_name", "").lower() == SCHEMA
+        and src.get("table_name", "").lower() == VIEW
+        and src.get("sample") is None
+        and src.get("at_clause") is None
+    ):
+        alias = src.get("alias") or VIEW
+        lo, hi = _bounds(node.get("where_clause"), {alias.lower(), VIEW})
+        if lo is not None or hi is not None:
+            sub = serialize(
+                f"SELECT * FROM (SELECT * EXCLUDE ({', '.join(PARTITION_COLUMNS)}) "
+                f"FROM {SCHEMA}.{PARTITIONED_VIEW} WHERE {_partition_predicate(lo, hi)}) AS \"{alias}\""
+            )
+            node["from_table"] = sub["statements"][0]["node"]["from_table"]
+            changed = True
+    for v in node.values():
+        if isinstance(v, (dict, list)):
+            changed |= _rewrite(v)
+    return changed
+
+
+def prune_partitions(sql: str) -> str:
+    """
+    Adds year/month predicates implied by TransactionDate range filters on
+    bank.v_transactions_enriched, so a query over the Parquet export only
+    opens the partitions (files) that can match. The rewritten query returns
+    the same rows and columns; anything not understood is left unchanged.
+    """
+    analysis = analyze(sql)
+    if not analysis.ok:
+        return sql
+    # The analysis is memoized and shared, so rewrite a copy
+    tree = copy.deepcopy(analysis.tree)
+    try:
+        if not _rewrite(tree["statements"]):
+            return sql
+        return deserialize(tree)
+    except (duckdb.Error, KeyError):
+        return sql
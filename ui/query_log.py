@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import atexit
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_LOG_DIR = REPO_ROOT / "data" / "query_log"
+
+# Buffered records are written as one Parquet segment when either limit is reached
+DEFAULT_FLUSH_ROWS = int(os.getenv("QUERY_LOG_FLUSH_ROWS", "50"))
+DEFAULT_FLUSH_S = float(os.getenv("QUERY_LOG_FLUSH_S", "30"))
+
+SCHEMA = pa.schema([
+    ("ts", pa.timestamp("ms", tz="UTC")),
+    ("entry_id", pa.string()),
+    ("question", pa.string()),
+    ("role", pa.string()),
+    ("model", pa.string()),
+    ("path", pa.string()),  # intent | llm_cache | llm | quick
+    ("intent", pa.string()),
+    ("sql", pa.string()),  # as generated (model, template or quick query)
+    ("executed_sql", pa.string()),  # read-only form with the LIMIT applied, when it ran
+    ("sql_ok", pa.bool_()),
+    ("answer", pa.string()),
+    ("error", pa.string()),
+    ("cancelled", pa.bool_()),
+    ("snapshot", pa.string()),
+    ("llm_cache", pa.string()),
+    ("result_cache", pa.string()),
+    ("rollup", pa.string()),
+    ("llm_ms", pa.float64()),
+    ("queue_ms", pa.float64()),
+    ("exec_ms", pa.float64()),
+    ("fetch_ms", pa.float64()),
+    ("total_rows", pa.int64()),
+])
+
+
+class QueryLog:
+    """
+    Append-only log of answered questions. Records are buffered and written
+    as immutable Parquet segments (log-<time>-<id>.parquet) in `directory`,
+    so several processes can log to the same place and nothing is ever
+    rewritten except by compact(). Analytics read every segment plus the
+    unflushed buffer with DuckDB.
+    """
+
+    def __init__(
+        self,
+        directory: Path = DEFAULT_LOG_DIR,
+        flush_rows: int = DEFAULT_FLUSH_ROWS,
+        flush_s: float = DEFAULT_FLUSH_S,
+    ):
+        self.directory = Path(directory)
+        self.flush_rows = max(1, flush_rows)
+        self.flush_s = flush_s
+        self._lock = threading.Lock()
+        self._buffer: List[Dict[str, Any]] = []
+        self._last_flush = time.monotonic()
+        self.appended = 0
+        self.segments_written = 0
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """Adds one record (SCHEMA columns; missing ones are null, ts defaults to now)."""
+        row = {name: record.get(name) for name in SCHEMA.names}
+        row["ts"] = row["ts"] or datetime.now(timezone.utc)
+        with self._lock:
+            self._buffer.append(row)
+            self.appended += 1
+            due = len(self._buffer) >= self.flush_rows or time.monotonic() - self._last_flush >= self.flush_s
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        """Writes the buffer as a new segment; returns the number of records written."""
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+        if not rows:
+            return 0
+        self._write(pa.Table.from_pylist(rows, schema=SCHEMA))
+        return len(rows)
+
+    def _write(self, table: pa.Table) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f"log-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}.parquet"
+        # Written under a temporary name so readers never see half a segment
+        tmp = self.directory / f".{name}.tmp"
+        pq.write_table(table, tmp, compression="zstd")
+        path = self.directory / name
+        tmp.replace(path)
+        with self._lock:
+            self.segments_written += 1
+        return path
+
+    def segments(self) -> List[Path]:
+        return sorted(self.directory.glob("log-*.parquet")) if self.directory.exists() else []
+
+    def compact(self) -> int:
+        """
+        Merges all segments into one; returns how many were replaced. Readers
+        running meanwhile may count the merged records twice.
+        """
+        segments = self.segments()
+        if len(segments) < 2:
+            return 0
+        self._write(pq.ParquetDataset(segments, schema=SCHEMA).read())
+        for path in segments:
+            path.unlink(missing_ok=True)
+        return len(segments)
+
+    def query(self, sql: str, params: Optional[list] = None) -> pd.DataFrame:
+        """Runs `sql` against a `log` relation: every segment plus the unflushed buffer."""
+        with self._lock:
+            pending = pa.Table.from_pylist(list(self._buffer), schema=SCHEMA)
+        con = duckdb.connect()
+        try:
+            con.register("pending", pending)
+            files = ", ".join("'" + str(p).replace("'", "''") + "'" for p in self.segments())
+            if files:
+                # A view cannot take parameters: the (own) file names are inlined as literals
+                con.execute(
+                    f"CREATE VIEW log AS SELECT * FROM read_parquet([{files}], union_by_name = true) "
+                    "UNION ALL BY NAME SELECT * FROM pending"
+                )
+            else:
+                con.execute("CREATE VIEW log AS SELECT * FROM pending")
+            return con.execute(sql, params or []).df()
+        finally:
+            con.close()
+
+    def top_questions(self, limit: int = 10, days: Optional[float] = None) -> pd.DataFrame:
+        return self.query(
+            f"""
+            SELECT lower(trim(question)) AS question, count(*) AS n,
+                   count(DISTINCT role) AS roles, any_value(path) AS path,
+                   round(median(llm_ms), 1) AS llm_ms_p50, max(ts) AS last_asked
+            FROM log WHERE question IS NOT NULL {_since(days)}
+            GROUP BY 1 ORDER BY n DESC, last_asked DESC LIMIT ?
+            """,
+            [limit],
+        )
+
+    def slowest_sql(self, limit: int = 10, days: Optional[float] = None) -> pd.DataFrame:
+        return self.query(
+            f"""
+            SELECT executed_sql AS sql, count(*) AS runs, round(max(exec_ms), 1) AS exec_ms_max,
+                   round(quantile_cont(exec_ms, 0.95), 1) AS exec_ms_p95,
+                   round(median(exec_ms), 1) AS exec_ms_p50, max(total_rows) AS rows_max
+            FROM log WHERE exec_ms IS NOT NULL AND executed_sql IS NOT NULL {_since(days)}
+            GROUP BY executed_sql ORDER BY exec_ms_p95 DESC LIMIT ?
+            """,
+            [limit],
+        )
+
+    def cache_rates(self, days: Optional[float] = None) -> pd.DataFrame:
+        """Per day: questions, the share answered without the LLM, and LLM/result cache hit rates."""
+        return self.query(
+            f"""
+            SELECT CAST(ts AS DATE) AS day, count(*) AS questions,
+                   round(avg(CASE WHEN path IN ('intent', 'llm_cache', 'quick') THEN 1 ELSE 0 END), 3)
+                       AS without_llm,
+                   round(count(*) FILTER (WHERE llm_cache = 'hit')
+                         / nullif(count(*) FILTER (WHERE llm_cache IN ('hit', 'miss')), 0), 3) AS llm_cache_hit,
+                   round(count(*) FILTER (WHERE result_cache = 'hit')
+                         / nullif(count(*) FILTER (WHERE result_cache IN ('hit', 'miss')), 0), 3)
+                       AS result_cache_hit,
+                   count(*) FILTER (WHERE error IS NOT NULL) AS errors,
+                   count(*) FILTER (WHERE cancelled) AS cancelled
+            FROM log WHERE TRUE {_since(days)}
+            GROUP BY 1 ORDER BY 1 DESC
+            """
+        )
+
+    def frequent_sql(self, limit: int, days: Optional[float] = None, max_rows: Optional[int] = None) -> List[str]:
+        """Most often executed SQL (successful runs), for warming the result cache."""
+        rows_filter = "AND total_rows <= ?" if max_rows is not None else ""
+        df = self.query(
+            f"""
+            SELECT executed_sql AS sql FROM log
+            WHERE exec_ms IS NOT NULL AND error IS NULL AND executed_sql IS NOT NULL {rows_filter} {_since(days)}
+            GROUP BY executed_sql ORDER BY count(*) DESC, max(ts) DESC LIMIT ?
+            """,
+            ([max_rows] if max_rows is not None else []) + [limit],
+        )
+        return df["sql"].tolist()
+
+    def frequent_answers(self, limit: int, days: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Most often asked LLM-answered questions with their latest valid answer
+        (question, role, model, sql, answer), for warming the LLM cache.
+        """
+        df = self.query(
+            f"""
+            SELECT question, role, model,
+                   arg_max(sql, ts) AS sql, arg_max(answer, ts) AS answer, count(*) AS n
+            FROM log
+            WHERE path IN ('llm', 'llm_cache') AND sql_ok AND answer IS NOT NULL {_since(days)}
+            GROUP BY question, role, model ORDER BY n DESC LIMIT ?
+            """,
+            [limit],
+        )
+        return df.drop(columns="n").to_dict("records")
+
+    def stats(self) -> dict:
+        with self._lock:
+            buffered = len(self._buffer)
+        return {
+            "directory": str(self.directory),
+            "segments": len(self.segments()),
+            "buffered": buffered,
+            "appended": self.appended,
+            "segments_written": self.segments_written,
+        }
+
+
+def _since(days: Optional[float]) -> str:
+    # Inlined as a literal: a float from our own callers, not user input
+    return f"AND ts >= now() - INTERVAL '{float(days) * 86400:.0f} seconds'" if days else ""
+
+
+def _default_log() -> Optional[QueryLog]:
+    if os.getenv("QUERY_LOG", "1").strip().lower() in ("0", "false", "off"):
+        return None
+    log = QueryLog(directory=Path(os.getenv("QUERY_LOG_DIR", str(DEFAULT_LOG_DIR))))
+    # Whatever is still buffered is written when the process exits
+    atexit.register(log.flush)
+    return log
+
+
+# Shared by all sessions; None when disabled with QUERY_LOG=0
+QUERY_LOG = _default_log()
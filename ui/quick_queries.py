@@ -0,0 +1,24 @@
+# Sidebar demo queries; scripts/benchmark.py times the same set
+QUICK_QUERIES = {
+    "Top 10 merchant (harcama)": """
+        SELECT MerchantName, SUM(Amount) AS total_spend
+        FROM bank.v_transactions_enriched
+        GROUP BY MerchantName
+        ORDER BY total_spend DESC
+        LIMIT 10
+    """,
+    "Kategori bazlı harcama": """
+        SELECT MerchantCategory, SUM(Amount) AS total_spend, COUNT(*) AS txn_count
+        FROM bank.v_transactions_enriched
+        GROUP BY MerchantCategory
+        ORDER BY total_spend DESC
+        LIMIT 50
+    """,
+    "Ödeme tipi dağılımı": """
+        SELECT Mode, COUNT(*) AS txn_count, SUM(Amount) AS total_amount
+        FROM bank.v_transactions_enriched
+        GROUP BY Mode
+        ORDER BY txn_count DESC
+        LIMIT 50
+    """,
+}
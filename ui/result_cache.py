@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import pyarrow as pa
+
+from ui.sql_analysis import analyze
+
+# Process-wide budget for cached query results (bytes of Arrow buffers)
+DEFAULT_MAX_BYTES = int(os.getenv("RESULT_CACHE_BYTES", str(256 * 1024 * 1024)))
+
+_TOKEN_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\s+|[^'\"\s]+")
+
+
+def normalize_sql_key(sql: str) -> str:
+    """
+    Canonical form of a query for cache keys: DuckDB's formatting of the parse
+    tree (shared with validation via ui.sql_analysis). Unparseable text falls
+    back to collapsing whitespace outside quotes and dropping a trailing ';'.
+    """
+    a = analyze(sql)
+    if a.ok:
+        return a.canonical
+    parts = []
+    for tok in _TOKEN_RE.findall((sql or "").strip().rstrip(";").strip()):
+        parts.append(" " if tok.isspace() else tok)
+    return "".join(parts)
+
+
+class ResultCache:
+    """
+    Thread-safe LRU of query results as Arrow tables, bounded by total bytes.
+    Keys are (snapshot fingerprint, normalized SQL), so a new snapshot never
+    sees results computed on an old one.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[Tuple[str, str], Tuple[pa.Table, Dict[str, Any]]]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Tuple[str, str]) -> Optional[Tuple[pa.Table, Dict[str, Any]]]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item
+
+    def put(self, key: Tuple[str, str], table: pa.Table, meta: Optional[Dict[str, Any]] = None) -> bool:
+        """Stores a result; returns False when it alone exceeds the budget."""
+        size = table.nbytes
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= old[0].nbytes
+            self._items[key] = (table, meta or {})
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (evicted, _) = self._items.popitem(last=False)
+                self.bytes -= evicted.nbytes
+                self.evictions += 1
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# Shared by every Streamlit session in this process
+RESULT_CACHE = ResultCache()
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import copy
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+import duckdb
+
+from ui.sql_analysis import analyze, deserialize, serialize
+
+SCHEMA = "bank"
+SOURCE_VIEW = "v_transactions_enriched"
+
+# Same buckets as the "Age group-wise spend" query in scripts/smoke_db.py
+AGE_GROUP_SQL = """
+CASE
+  WHEN Age BETWEEN 18 AND 25 THEN '18-25'
+  WHEN Age BETWEEN 26 AND 35 THEN '26-35'
+  WHEN Age BETWEEN 36 AND 45 THEN '36-45'
+  WHEN Age BETWEEN 46 AND 60 THEN '46-60'
+  ELSE '60+'
+END
+""".strip()
+
+# Rollup tables maintained by scripts/build_duckdb_from_sql.py, smallest first.
+# Each maps dimension column -> source expression over the enriched view.
+ROLLUPS: Dict[str, Dict[str, str]] = {
+    "r_demographics": {
+        "Gender": "Gender",
+        "AgeGroup": AGE_GROUP_SQL,
+        "MerchantCategory": "MerchantCategory",
+        "Mode": "Mode",
+    },
+    "r_daily_merchant": {
+        "TransactionDate": "TransactionDate",
+        "MerchantName": "MerchantName",
+        "MerchantCategory": "MerchantCategory",
+        "Mode": "Mode",
+    },
+}
+
+# Measures stored per rollup row, and how an aggregate over Amount is re-aggregated.
+MEASURES_SQL = """
+    SUM(Amount) AS total_amount,
+    COUNT(*) AS txn_count,
+    COUNT(Amount) AS amount_count,
+    MIN(Amount) AS min_amount,
+    MAX(Amount) AS max_amount
+"""
+_REAGGREGATE_SQL = {
+    "sum": "sum(total_amount)",
+    # COUNT is 0, not NULL, when no rollup row matches
+    "count_star": "COALESCE(CAST(sum(txn_count) AS BIGINT), 0)",
+    "count": "COALESCE(CAST(sum(amount_count) AS BIGINT), 0)",
+    "min": "min(min_amount)",
+    "max": "max(max_amount)",
+}
+# Aggregates that give the same answer over rollup rows when applied to a dimension.
+_DIMENSION_SAFE_AGGREGATES = {"min", "max", "any_value", "first", "arbitrary"}
+
+
+def rollup_create_sql(name: str) -> str:
+    dims = ROLLUPS[name]
+    select_dims = ",\n        ".join(f"{expr} AS {col}" for col, expr in dims.items())
+    order = ", ".join(dims)
+    return f"""
+        CREATE OR REPLACE TABLE {SCHEMA}.{name} AS
+        SELECT
+        {select_dims},
+        {MEASURES_SQL}
+        FROM {SCHEMA}.{SOURCE_VIEW}
+        GROUP BY ALL
+        ORDER BY {order}
+    """
+
+
+# ----------------------------
+# Query routing
+# ----------------------------
+
+class _NotRoutable(Exception):
+    pass
+
+
+_aggregate_names: Optional[frozenset] = None
+
+
+def _aggregates(conn: duckdb.DuckDBPyConnection) -> frozenset:
+    global _aggregate_names
+    if _aggregate_names is None:
+        rows = conn.execute(
+            "SELECT DISTINCT function_name FROM duckdb_functions() WHERE function_type = 'aggregate'"
+        ).fetchall()
+        _aggregate_names = frozenset(r[0].lower() for r in rows)
+    return _aggregate_names
+
+
+@lru_cache(maxsize=1)
+def _templates() -> Tuple[Dict[str, dict], Any]:
+    # Parse trees of the re-aggregations and of the age bucket CASE, parsed once
+    tree = serialize("SELECT " + ", ".join(_REAGGREGATE_SQL.values()) + f", {AGE_GROUP_SQL}")
+    select_list = tree["statements"][0]["node"]["select_list"]
+    return dict(zip(_REAGGREGATE_SQL, select_list)), _strip_locations(select_list[-1])
+
+
+def _strip_locations(node: Any) -> Any:
+    # Structural form for comparing expressions regardless of position/alias.
+    if isinstance(node, dict):
+        return {k: _strip_locations(v) for k, v in node.items() if k not in ("query_location", "alias")}
+    if isinstance(node, list):
+        return [_strip_locations(v) for v in node]
+    return node
+
+
+class _Rewriter:
+    def __init__(self, conn: duckdb.DuckDBPyConnection, qualifiers: set, select_aliases: set):
+        self.aggregates = _aggregates(conn)
+        self.qualifiers = qualifiers
+        self.select_aliases = select_aliases
+        self.dims_used: set = set()
+        self.has_aggregate = False
+        self.dimensions = {d.lower(): d for dims in ROLLUPS.values() for d in dims}
+        self.reaggregate, self.age_group = _templates()
+
+    def _column(self, node: dict) -> Optional[str]:
+        if node.get("class") != "COLUMN_REF":
+            return None
+        *qual, name = node["column_names"]
+        if qual and qual[-1].lower() not in self.qualifiers:
+            raise _NotRoutable(f"column {'.'.join(node['column_names'])}")
+        return name
+
+    def expr(self, node: Any) -> Any:
+        if isinstance(node, list):
+            return [self.expr(v) for v in node]
+        if not isinstance(node, dict):
+            return node
+        if "class" not in node:
+            return {k: self.expr(v) for k, v in node.items()}
+
+        cls = node["class"]
+        if cls in ("SUBQUERY", "WINDOW", "STAR", "LAMBDA"):
+            raise _NotRoutable(cls)
+
+        if _strip_locations(node) == self.age_group:
+            self.dims_used.add("AgeGroup")
+            return {"class": "COLUMN_REF", "type": "COLUMN_REF", "alias": node.get("alias", ""),
+                    "query_location": node.get("query_location"), "column_names": ["AgeGroup"]}
+
+        if cls == "COLUMN_REF":
+            name = self._column(node)
+            dim = self.dimensions.get(name.lower())
+            if dim is None:
+                if len(node["column_names"]) == 1 and name in self.select_aliases:
+                    return node
+                raise _NotRoutable(f"column {name}")
+            self.dims_used.add(dim)
+            out = dict(node)
+            out["column_names"] = node["column_names"][:-1] + [dim]
+            return out
+
+        if cls == "FUNCTION" and node["function_name"].lower() in self.aggregates:
+            fn = node["function_name"].lower()
+            plain = not node.get("distinct") and node.get("filter") is None and not node["order_bys"]["orders"]
+            children = node.get("children") or []
+            arg = self._column(children[0]) if len(children) == 1 else None
+            if plain and fn in self.reaggregate and (
+                (fn == "count_star" and not children) or (arg is not None and arg.lower() == "amount")
+            ):
+                self.has_aggregate = True
+                out = copy.deepcopy(self.reaggregate[fn])
+                out["alias"] = node.get("alias", "")
+                return out
+            if plain and fn in _DIMENSION_SAFE_AGGREGATES and arg is not None:
+                self.has_aggregate = True
+                return {**node, "children": self.expr(children)}
+            raise _NotRoutable(f"aggregate {fn}")
+
+        return {k: self.expr(v) for k, v in node.items()}
+
+
+def route_to_rollup(conn: duckdb.DuckDBPyConnection, sql: str) -> Tuple[str, Optional[str]]:
+    """
+    Rewrites an aggregate query over bank.v_transactions_enriched to read a
+    rollup table when that gives exactly the same result: every column used
+    outside SUM/COUNT/MIN/MAX(Amount) and COUNT(*) is a rollup dimension.
+    Output column names are preserved. Returns (sql, rollup name or None).
+    """
+    try:
+        analysis = analyze(sql)
+        if not analysis.ok:
+            return sql, None
+        # The analysis is memoized and shared, so rewrite a copy
+        tree = copy.deepcopy(analysis.tree)
+        node = tree["statements"][0]["node"]
+        src = node.get("from_table") or {}
+        if (
+            node.get("type") != "SELECT_NODE"
+            or node["cte_map"]["map"]
+            or src.get("type") != "BASE_TABLE"
+            or src.get("schema_name", "").lower() != SCHEMA
+            or src.get("table_name", "").lower() != SOURCE_VIEW
+            or src.get("sample") is not None
+            or src.get("at_clause") is not None
+            or node.get("sample") is not None
+            or node.get("qualify") is not None
+        ):
+            return sql, None
+
+        alias = src.get("alias") or SOURCE_VIEW
+        select_aliases = {e["alias"] for e in node["select_list"] if e.get("alias")}
+        rw = _Rewriter(conn, {alias.lower(), SOURCE_VIEW}, select_aliases)
+
+        names = conn.sql(analysis.sql).columns
+        select_list = []
+        for expr, name in zip(node["select_list"], names):
+            out = rw.expr(expr)
+            if not out.get("alias") and out != expr:
+                out["alias"] = name
+            select_list.append(out)
+        node["select_list"] = select_list
+        for key in ("where_clause", "group_expressions", "having", "modifiers"):
+            node[key] = rw.expr(node[key])
+
+        grouped = node["group_expressions"] or node["aggregate_handling"] == "FORCE_AGGREGATES"
+        if not (grouped or rw.has_aggregate):
+            return sql, None
+
+        for name, dims in ROLLUPS.items():
+            if rw.dims_used <= set(dims):
+                src.update({"table_name": name, "alias": alias})
+                return deserialize(tree), name
+        return sql, None
+    except (_NotRoutable, duckdb.Error, KeyError):
+        return sql, None
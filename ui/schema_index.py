@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import math
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from ui.catalog import CATALOG, Catalog
+
+# Views the model may query when schema.json lists none (older metadata)
+DEFAULT_VIEW = "bank.v_transactions_enriched"
+
+# Schema part of the prompt (column lists + value facts), in estimated tokens
+DEFAULT_TOKEN_BUDGET = int(os.getenv("PROMPT_SCHEMA_TOKENS", "1200"))
+DEFAULT_TOP_VIEWS = int(os.getenv("PROMPT_TOP_VIEWS", "3"))
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Tokens are cut to this many characters ("F5" stemming): a cheap, robust
+# stemmer for Turkish suffixes (müşterilerin -> muste) that leaves English
+# identifiers comparable (merchant -> merch).
+STEM_CHARS = 5
+
+# Question words attached to identifier tokens, so Turkish (and everyday
+# English) questions reach the right columns.
+SYNONYMS: Dict[str, Tuple[str, ...]] = {
+    "transaction": ("işlem", "hareket", "txn"),
+    "date": ("tarih", "gün", "ay", "yıl", "hafta", "son", "en son", "dönem", "zaman", "latest", "recent",
+             "month", "year", "day"),
+    "amount": ("tutar", "harcama", "miktar", "para", "ciro", "toplam", "ortalama", "spend", "spending", "total"),
+    "type": ("tip", "tür", "çeşit"),
+    "mode": ("ödeme", "kanal", "yöntem", "payment", "channel"),
+    "city": ("şehir", "il", "lokasyon", "konum", "location"),
+    "customer": ("müşteri", "kişi", "client", "user"),
+    "name": ("ad", "isim"),
+    "gender": ("cinsiyet", "kadın", "erkek", "sex", "female", "male"),
+    "age": ("yaş", "genç", "yaşlı"),
+    "card": ("kart",),
+    "issuer": ("banka", "veren", "bank"),
+    "bank": ("banka",),
+    "merchant": ("işyeri", "mağaza", "satıcı", "firma", "dükkan", "store", "shop", "vendor"),
+    "category": ("kategori", "sektör", "segment", "sector"),
+    "debit": ("borç", "harcama"),
+    "credit": ("alacak", "iade", "kredi"),
+}
+
+STOPWORDS = frozenset(
+    "ve veya ile en göre için bir bu şu kaç ne nedir hangi hangisi olan mi mı mu mü da de ki gibi "
+    "the a an of by for in on per to and or what which how many top show list".split()
+)
+
+_ASCII = str.maketrans("çğıöşüâîû", "cgiosuaiu")
+_CAMEL = re.compile(r"(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased, diacritic-folded, stemmed tokens of text or an identifier."""
+    text = _CAMEL.sub(" ", str(text)).replace("İ", "i").replace("I", "ı").lower().translate(_ASCII)
+    return [w[:STEM_CHARS] for w in re.findall(r"[a-z0-9]+", text) if w not in _STOP_FOLDED]
+
+
+_STOP_FOLDED = frozenset(w.lower().translate(_ASCII) for w in STOPWORDS)
+_SYNONYMS_FOLDED = {k[:STEM_CHARS]: v for k, v in SYNONYMS.items()}
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token is close enough for budgeting
+    return max(1, len(text) // 4)
+
+
+@dataclass
+class SchemaSelection:
+    """Views and columns shown to the model for one question."""
+
+    views: Dict[str, List[str]] = field(default_factory=dict)  # view -> columns, in allowlist order
+    scores: Dict[str, float] = field(default_factory=dict)  # view -> relevance
+    tokens: int = 0
+    pruned_columns: int = 0
+
+    def summary(self) -> dict:
+        return {
+            "views": {v: len(cols) for v, cols in self.views.items()},
+            "tokens": self.tokens,
+            "pruned_columns": self.pruned_columns,
+        }
+
+
+class SchemaIndex:
+    """
+    BM25 index over the queryable views: one document per view (name and
+    description) and one per column (name, description, known values and the
+    synonyms of its name tokens); descriptions are optional "description" keys
+    in schema.json. Rebuilt whenever the catalog files change.
+    """
+
+    def __init__(self, catalog: Catalog = CATALOG):
+        self.catalog = catalog
+        self._lock = threading.Lock()
+        self._version = None
+        self._docs: List[Tuple[str, Optional[str], Counter, int]] = []  # (view, column, tf, length)
+        self._df: Counter = Counter()
+        self._avg_len = 1.0
+        self._views: List[str] = []
+        self.builds = 0
+
+    def queryable_views(self) -> List[str]:
+        """
+        TEXT2SQL_VIEWS (comma separated) when set, else every allowlisted view
+        schema.json lists, else DEFAULT_VIEW.
+        """
+        env = [v.strip() for v in os.getenv("TEXT2SQL_VIEWS", "").split(",") if v.strip()]
+        allowed = self.catalog.allowlist().get("tables", {})
+        if env:
+            return [v for v in env if v in allowed]
+        views = [
+            name for name, rel in self.catalog.relations().items()
+            if str(rel.get("type", "")).upper() == "VIEW" and name in allowed
+        ]
+        return views or [DEFAULT_VIEW]
+
+    def _document(self, view: str, rel: dict, column: str) -> List[str]:
+        parts = [column]
+        col_meta = next((c for c in rel.get("columns", []) if c.get("name") == column), {})
+        parts.append(col_meta.get("description", ""))
+        values = self.catalog.column_stats(view).get(column, {}).get("values") or []
+        parts.extend(str(v) for v in values)
+        tokens = tokenize(" ".join(parts))
+        for t in tokenize(column):
+            for syn in _SYNONYMS_FOLDED.get(t, ()):
+                tokens.extend(tokenize(syn))
+        return tokens
+
+    def _build(self) -> None:
+        relations = self.catalog.relations()
+        self._views = self.queryable_views()
+        docs = []
+        for view in self._views:
+            rel = relations.get(view, {})
+            # The view itself is a document too (column None): its name and
+            # description rank the view without matching all of its columns
+            tokens = tokenize(view.split(".")[-1] + " " + rel.get("description", ""))
+            docs.append((view, None, Counter(tokens), len(tokens)))
+            for column in self.catalog.columns(view):
+                tokens = self._document(view, rel, column)
+                docs.append((view, column, Counter(tokens), len(tokens)))
+        self._docs = docs
+        self._df = Counter(t for _, _, tf, _ in docs for t in tf)
+        self._avg_len = sum(n for *_, n in docs) / len(docs) if docs else 1.0
+        self.builds += 1
+
+    def _ensure(self) -> None:
+        version = self.catalog.version()
+        with self._lock:
+            if version != self._version:
+                self._build()
+                self._version = version
+
+    def score(self, question: str) -> Dict[Tuple[str, str], float]:
+        """BM25 score of every (view, column) for `question`; (view, None) scores the view itself."""
+        self._ensure()
+        # A question word also matches indexed terms that are its prefixes
+        # (şubelere -> "subel" matches "sube"), for stems shorter than STEM_CHARS
+        terms = {w[:k] for w in tokenize(question) for k in range(3, len(w) + 1) if w[:k] in self._df}
+        n = len(self._docs)
+        scores = {}
+        for view, column, tf, length in self._docs:
+            s = 0.0
+            for t in terms:
+                f = tf.get(t)
+                if not f:
+                    continue
+                idf = math.log(1 + (n - self._df[t] + 0.5) / (self._df[t] + 0.5))
+                s += idf * f * (K1 + 1) / (f + K1 * (1 - B + B * length / self._avg_len))
+            scores[(view, column)] = s
+        return scores
+
+    def select(
+        self,
+        question: str,
+        token_budget: int = DEFAULT_TOKEN_BUDGET,
+        top_views: int = DEFAULT_TOP_VIEWS,
+        cost=None,
+    ) -> SchemaSelection:
+        """
+        Picks the `top_views` most relevant views (at least one) and, within
+        `token_budget`, their columns matching the question plus every other
+        column of views small enough to list whole. `cost(view, column)`
+        estimates the prompt tokens a column takes (default: its name).
+        """
+        cost = cost or (lambda view, column: estimate_tokens(column) + 1)
+        scores = self.score(question)
+        view_score: Dict[str, float] = {}
+        for (view, column), s in scores.items():
+            if column is not None:
+                view_score[view] = max(view_score.get(view, 0.0), s)
+        for view in view_score:
+            view_score[view] += scores.get((view, None), 0.0)
+
+        ranked = sorted(self._views, key=lambda v: -view_score.get(v, 0.0))
+        chosen = [v for v in ranked[:max(1, top_views)] if view_score.get(v, 0.0) > 0]
+        if not chosen:
+            chosen = [DEFAULT_VIEW if DEFAULT_VIEW in self._views else ranked[0]]
+
+        candidates = [(view, c) for view in chosen for c in self.catalog.columns(view)]
+        costs = {vc: cost(*vc) for vc in candidates}
+        spent = sum(estimate_tokens(v) for v in chosen)
+        keep = set()
+        # Matching columns first, best first; then whole views that still fit
+        # (small views stay complete, wide ones keep what the question needs)
+        for vc in sorted((vc for vc in candidates if scores.get(vc, 0.0) > 0), key=lambda vc: -scores[vc]):
+            if spent + costs[vc] <= token_budget:
+                keep.add(vc)
+                spent += costs[vc]
+        for view in chosen:
+            rest = [(view, c) for c in self.catalog.columns(view) if (view, c) not in keep]
+            extra = sum(costs[vc] for vc in rest)
+            if spent + extra <= token_budget:
+                keep.update(rest)
+                spent += extra
+        if not keep:
+            # Nothing matched and no view fits whole: the top view's leading columns
+            for vc in (vc for vc in candidates if vc[0] == chosen[0]):
+                if keep and spent + costs[vc] > token_budget:
+                    break
+                keep.add(vc)
+                spent += costs[vc]
+        total = spent
+
+        selection = SchemaSelection(tokens=total, pruned_columns=len(candidates) - len(keep))
+        for view in chosen:
+            cols = [c for c in self.catalog.columns(view) if (view, c) in keep]
+            if cols:
+                selection.views[view] = cols
+                selection.scores[view] = round(view_score.get(view, 0.0), 3)
+        return selection
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"builds": self.builds, "views": len(self._views), "columns": sum(1 for d in self._docs if d[1] is not None)}
+
+
+# Shared by all sessions of this process
+SCHEMA_INDEX = SchemaIndex()
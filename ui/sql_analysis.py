@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import json
+import threading
+from functools import lru_cache
+from typing import Any, FrozenSet, Optional, Tuple
+
+import duckdb
+
+# Parsing only needs DuckDB's parser, not a database: one private in-memory
+# connection serves every caller.
+_PARSER = duckdb.connect(database=":memory:")
+_PARSER_LOCK = threading.Lock()
+
+
+def _scalar(sql: str, params: list) -> Any:
+    with _PARSER_LOCK:
+        return _PARSER.execute(sql, params).fetchone()[0]
+
+
+def serialize(sql: str) -> dict:
+    """DuckDB's own parse tree (json_serialize_sql) for `sql`."""
+    return json.loads(_scalar("SELECT json_serialize_sql(?)", [sql]))
+
+
+def deserialize(tree: dict) -> str:
+    """SQL text for a (possibly rewritten) tree from serialize()."""
+    return _scalar("SELECT json_deserialize_sql(?)", [json.dumps(tree)])
+
+
+class SqlAnalysis:
+    """
+    Everything validation, LIMIT injection, rollup routing and cache keys need
+    to know about one query, read from a single parse.
+
+    - error: parser message (non-SELECT statements cannot be serialized)
+    - statements: number of statements in the text
+    - tree: the parse tree (shared; copy before mutating)
+    - tables: referenced base tables as lower-case "schema.table" / "table"
+    - ctes: lower-case CTE names
+    - table_functions: lower-case table function names (read_csv, ...)
+    - columns: lower-case names of every column reference (not CURRENT_DATE etc.)
+    - aliases: lower-case names introduced by the query (select/table/CTE aliases)
+    - outer_limit: whether the outermost query has a row LIMIT
+    - canonical: normalized SQL text (DuckDB's formatting of the parse tree)
+    """
+
+    __slots__ = (
+        "sql", "error", "statements", "tree", "tables", "ctes", "table_functions",
+        "columns", "aliases", "outer_limit", "outer_modifiers", "canonical",
+    )
+
+    def __init__(self, sql: str):
+        self.sql = sql
+        self.error: Optional[str] = None
+        self.statements = 0
+        self.tree: Optional[dict] = None
+        self.tables: FrozenSet[str] = frozenset()
+        self.ctes: FrozenSet[str] = frozenset()
+        self.table_functions: FrozenSet[str] = frozenset()
+        self.columns: FrozenSet[str] = frozenset()
+        self.aliases: FrozenSet[str] = frozenset()
+        self.outer_limit = False
+        self.outer_modifiers: Tuple[str, ...] = ()
+        self.canonical = sql
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.statements == 1
+
+
+# Keywords DuckDB parses as unqualified column references
+SPECIAL_KEYWORDS = frozenset({
+    "current_date", "current_time", "current_timestamp", "localtime", "localtimestamp",
+    "current_schema", "current_user",
+})
+
+
+def _walk(node: Any, out: dict) -> None:
+    if isinstance(node, list):
+        for v in node:
+            _walk(v, out)
+        return
+    if not isinstance(node, dict):
+        return
+
+    kind = node.get("type")
+    if node.get("alias"):
+        out["aliases"].add(node["alias"].lower())
+    for a in node.get("column_name_alias") or []:
+        out["aliases"].add(a.lower())
+
+    if kind == "BASE_TABLE" and "table_name" in node:
+        name = node["table_name"].lower()
+        schema = (node.get("schema_name") or "").lower()
+        out["tables"].add(f"{schema}.{name}" if schema else name)
+    elif kind == "TABLE_FUNCTION":
+        out["table_functions"].add(node["function"]["function_name"].lower())
+    elif node.get("class") == "COLUMN_REF":
+        names = node["column_names"]
+        if len(names) > 1 or names[0].lower() not in SPECIAL_KEYWORDS:
+            out["columns"].add(names[-1].lower())
+
+    cte_map = node.get("cte_map")
+    if isinstance(cte_map, dict):
+        for entry in cte_map.get("map", []):
+            out["ctes"].add(entry["key"].lower())
+            for a in entry["value"].get("aliases", []):
+                out["aliases"].add(a.lower())
+
+    for v in node.values():
+        if isinstance(v, (dict, list)):
+            _walk(v, out)
+
+
+@lru_cache(maxsize=2048)
+def analyze(sql: str) -> SqlAnalysis:
+    """Parses `sql` once (memoized per text) and extracts what callers check."""
+    text = (sql or "").strip().rstrip(";").strip()
+    a = SqlAnalysis(text)
+    if not text:
+        a.error = "empty SQL"
+        return a
+    try:
+        tree = serialize(text)
+    except duckdb.Error as e:
+        a.error = str(e)
+        return a
+    if tree.get("error"):
+        a.error = tree.get("error_message") or tree.get("error_type") or "parse error"
+        return a
+
+    a.tree = tree
+    a.statements = len(tree["statements"])
+    out: dict = {k: set() for k in ("tables", "ctes", "table_functions", "columns", "aliases")}
+    _walk(tree["statements"], out)
+    a.tables = frozenset(out["tables"])
+    a.ctes = frozenset(out["ctes"])
+    a.table_functions = frozenset(out["table_functions"])
+    a.columns = frozenset(out["columns"])
+    a.aliases = frozenset(out["aliases"])
+
+    if a.statements == 1:
+        modifiers = tree["statements"][0]["node"].get("modifiers", [])
+        a.outer_modifiers = tuple(m["type"] for m in modifiers)
+        a.outer_limit = any(m["type"] == "LIMIT_MODIFIER" and m.get("limit") is not None for m in modifiers)
+        try:
+            a.canonical = deserialize(tree)
+        except duckdb.Error:
+            pass
+    return a
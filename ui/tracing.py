@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import duckdb
+
+# Histogram buckets (ms) for stage durations, from cache lookups to slow LLM calls
+BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+# Operator-level detail kept from a DuckDB JSON profile
+_PROFILE_KEYS = ("operator_name", "operator_timing", "operator_cardinality", "operator_rows_scanned")
+
+
+class StageMetrics:
+    """
+    Process-wide histograms of span durations per stage, rendered in the
+    Prometheus text exposition format.
+    """
+
+    def __init__(self, buckets_ms=BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self._lock = threading.Lock()
+        self._stages: Dict[str, dict] = {}
+
+    def observe(self, stage: str, ms: float) -> None:
+        with self._lock:
+            h = self._stages.get(stage)
+            if h is None:
+                h = self._stages[stage] = {"counts": [0] * (len(self.buckets_ms) + 1), "sum": 0.0, "count": 0}
+            h["counts"][bisect.bisect_left(self.buckets_ms, ms)] += 1
+            h["sum"] += ms
+            h["count"] += 1
+
+    def render(self) -> str:
+        lines = [
+            "# HELP text2sql_stage_duration_ms Duration of text2sql pipeline stages.",
+            "# TYPE text2sql_stage_duration_ms histogram",
+        ]
+        with self._lock:
+            for stage, h in sorted(self._stages.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets_ms + ("+Inf",), h["counts"]):
+                    cumulative += n
+                    lines.append(f'text2sql_stage_duration_ms_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'text2sql_stage_duration_ms_sum{{stage="{stage}"}} {h["sum"]:.3f}')
+                lines.append(f'text2sql_stage_duration_ms_count{{stage="{stage}"}} {h["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(self.render(), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+# Shared by all sessions of this process
+METRICS = StageMetrics()
+
+
+@contextmanager
+def span(trace: Optional[dict], stage: str) -> Iterator[None]:
+    """
+    Times the block as `stage`: appended to trace["spans"] as {"stage", "ms"}
+    (when a trace is given) and recorded in METRICS. Failed blocks are marked
+    with "error".
+    """
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        ms = (time.perf_counter() - start) * 1000
+        METRICS.observe(stage, ms)
+        if trace is not None:
+            rec: Dict[str, Any] = {"stage": stage, "ms": round(ms, 2)}
+            if error:
+                rec["error"] = error
+            trace.setdefault("spans", []).append(rec)
+
+
+def profiling_enabled() -> bool:
+    return os.getenv("DUCKDB_PROFILE", "").strip().lower() in ("1", "true", "on")
+
+
+def _operators(node: dict) -> dict:
+    out = {k: node[k] for k in _PROFILE_KEYS if k in node}
+    out["operator_timing"] = round(out.get("operator_timing", 0.0) * 1000, 3)  # s -> ms
+    children = [_operators(c) for c in node.get("children", [])]
+    if children:
+        out["children"] = children
+    return out
+
+
+@contextmanager
+def duckdb_profile(conn: duckdb.DuckDBPyConnection, out: Optional[dict]) -> Iterator[None]:
+    """
+    Captures DuckDB's JSON profile of the last query run on `conn` inside the
+    block into `out`: latency_ms, rows_scanned, cardinality and the operator
+    tree (timings in ms). Profiling is switched off again afterwards, since
+    pooled cursors are reused. With out=None this does nothing.
+    """
+    if out is None:
+        yield
+        return
+    fd, path = tempfile.mkstemp(prefix="duckdb-profile-", suffix=".json")
+    os.close(fd)
+    try:
+        conn.execute("SET enable_profiling = 'json'")
+        conn.execute(f"SET profiling_output = '{path}'")
+        try:
+            yield
+        finally:
+            conn.execute("PRAGMA disable_profiling")
+        text = Path(path).read_text(encoding="utf-8")
+        if text.strip():
+            raw = json.loads(text)
+            out.update({
+                "latency_ms": round(raw.get("latency", 0.0) * 1000, 3),
+                "rows_scanned": raw.get("cumulative_rows_scanned"),
+                "cardinality": raw.get("cumulative_cardinality"),
+                "peak_buffer_bytes": raw.get("system_peak_buffer_memory"),
+                "operators": [_operators(c) for c in raw.get("children", [])],
+            })
+    finally:
+        Path(path).unlink(missing_ok=True)
+
+
+def profile_metrics(conn: duckdb.DuckDBPyConnection, sql: str) -> dict:
+    """Runs `sql` once under the profiler and returns the profile summary."""
+    out: dict = {}
+    with duckdb_profile(conn, out):
+        conn.execute(sql).fetchall()
+    return out
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):  # noqa: A002 - stdlib signature
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = METRICS.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_exporters: List[Any] = []
+_exporters_lock = threading.Lock()
+
+
+def start_exporters(port: Optional[int] = None, path: Optional[str] = None, every: float = 15.0) -> None:
+    """
+    Exposes METRICS once per process: on http://127.0.0.1:PORT/metrics
+    (METRICS_PORT) and/or rewritten to a file every `every` seconds
+    (METRICS_FILE, e.g. for node_exporter's textfile collector).
+    """
+    with _exporters_lock:
+        if _exporters:
+            return
+        port = port if port is not None else int(os.getenv("METRICS_PORT", "0") or 0)
+        path = path if path is not None else os.getenv("METRICS_FILE", "").strip()
+        if port:
+            server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+            _exporters.append(server)
+        if path:
+            def loop() -> None:
+                while True:
+                    METRICS.write(Path(path))
+                    time.sleep(every)
+
+            threading.Thread(target=loop, name="metrics-file", daemon=True).start()
+            _exporters.append(path)
@@ -0,0 +1,349 @@
+from __future__ import annotations
+
+import json
+import os
+import random
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FuturesTimeout
+from functools import partial
+from typing import Any, Dict, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ui.execution import QueryCancelled, QueryControl
+
+# Point at a local stub (e.g. http://127.0.0.1:8765/api/v1) for tests/load runs
+DEFAULT_BASE_URL = "https://openrouter.ai/api/v1"
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# How often a cancellable request checks its QueryControl while waiting for the server
+CANCEL_POLL_S = 0.1
+
+
+def _env_float(name: str, default: Optional[float]) -> Optional[float]:
+    raw = os.getenv(name, "").strip()
+    return float(raw) if raw else default
+
+
+class Transport:
+    """
+    Keep-alive HTTP transport for the LLM API, shared by all sessions.
+
+    - one pooled requests.Session (connections reused across questions)
+    - bounded retries on connection errors, timeouts and 429/5xx, with
+      full-jitter exponential backoff (Retry-After is honoured up to the cap)
+    - optional hedging: if an attempt has not answered after `hedge_after`
+      seconds a second identical request is fired and the first to succeed wins
+
+    Every HTTP request made is appended to the caller's `attempts` list as
+    {"attempt", "hedge", "status", "error", "ms"}.
+
+    With a `control` (ui.execution.QueryControl), control.cancel() makes the
+    call raise QueryCancelled at once: a streaming response is closed
+    mid-read, and a request still waiting for its response is abandoned to
+    its worker thread, which closes the response when it arrives.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 32,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 8.0,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        hedge_after: Optional[float] = None,
+    ):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.timeout = (connect_timeout, read_timeout)
+        self.hedge_after = hedge_after
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # Hedged requests run here so the caller can wait on whichever finishes first
+        self._pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="llm-http")
+
+    def _send(
+        self,
+        url: str,
+        headers: Dict[str, str],
+        payload: Dict[str, Any],
+        attempts: List[Dict[str, Any]],
+        attempt: int,
+        hedge: bool,
+    ) -> requests.Response:
+        rec: Dict[str, Any] = {"attempt": attempt, "hedge": hedge, "status": None, "error": None}
+        start = time.perf_counter()
+        try:
+            r = self.session.post(url, headers=headers, json=payload, timeout=self.timeout)
+            rec["status"] = r.status_code
+            return r
+        except requests.RequestException as e:
+            rec["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            rec["ms"] = round((time.perf_counter() - start) * 1000, 1)
+            attempts.append(rec)
+
+    def _hedged(self, url, headers, payload, attempts, attempt, control=None) -> requests.Response:
+        if not self.hedge_after and control is None:
+            return self._send(url, headers, payload, attempts, attempt, hedge=False)
+
+        futures: List[Future] = [self._pool.submit(self._send, url, headers, payload, attempts, attempt, False)]
+        hedge_at = time.monotonic() + self.hedge_after if self.hedge_after else None
+        error: Optional[BaseException] = None
+        pending = set(futures)
+        while pending:
+            timeout = CANCEL_POLL_S if control is not None else None
+            if hedge_at is not None:
+                left = max(0.0, hedge_at - time.monotonic())
+                timeout = left if timeout is None else min(timeout, left)
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if control is not None and control.cancelled:
+                for fut in futures:
+                    fut.add_done_callback(_close_response)
+                raise QueryCancelled("LLM isteği iptal edildi")
+            if hedge_at is not None and time.monotonic() >= hedge_at:
+                hedge_at = None
+                if not done and len(futures) == 1:
+                    futures.append(self._pool.submit(self._send, url, headers, payload, attempts, attempt, True))
+                    pending.add(futures[-1])
+            for fut in done:
+                try:
+                    r = fut.result()
+                except requests.RequestException as e:
+                    error = e
+                    continue
+                if r.status_code < 400 or not pending:
+                    # The loser is no longer read: release its connection when it answers
+                    for other in pending:
+                        other.add_done_callback(_close_response)
+                    return r
+                error = requests.HTTPError(f"{r.status_code} from {url}", response=r)
+        raise error  # every attempt failed
+
+    @staticmethod
+    def _await(future: Future, control: Optional[QueryControl]) -> requests.Response:
+        # Waits for response headers; a cancel abandons the request to the pool
+        while control is not None:
+            try:
+                return future.result(timeout=CANCEL_POLL_S)
+            except FuturesTimeout:
+                if control.cancelled:
+                    future.add_done_callback(_close_response)
+                    raise QueryCancelled("LLM isteği iptal edildi") from None
+        return future.result()
+
+    @staticmethod
+    def _pause(seconds: float, control: Optional[QueryControl]) -> None:
+        # Backoff between retries, cut short by a cancel
+        if control is None:
+            time.sleep(seconds)
+        elif control.wait(seconds):
+            raise QueryCancelled("LLM isteği iptal edildi")
+
+    def _delay(self, retry: int, response: Optional[requests.Response]) -> float:
+        cap = min(self.backoff_cap, self.backoff_base * (2 ** retry))
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.replace(".", "", 1).isdigit():
+                return min(self.backoff_cap, float(retry_after))
+        return random.uniform(0, cap)
+
+    def post_json(
+        self,
+        url: str,
+        headers: Dict[str, str],
+        payload: Dict[str, Any],
+        attempts: Optional[List[Dict[str, Any]]] = None,
+        control: Optional[QueryControl] = None,
+    ) -> Dict[str, Any]:
+        """POSTs `payload` and returns the decoded JSON body, retrying transient failures."""
+        attempts = attempts if attempts is not None else []
+        for retry in range(self.max_retries + 1):
+            last = retry == self.max_retries
+            try:
+                r = self._hedged(url, headers, payload, attempts, retry + 1, control)
+            except (requests.ConnectionError, requests.Timeout):
+                if last:
+                    raise
+                self._pause(self._delay(retry, None), control)
+                continue
+            except requests.HTTPError as e:
+                r = e.response
+            if r.status_code in RETRY_STATUSES and not last:
+                self._pause(self._delay(retry, r), control)
+                continue
+            r.raise_for_status()
+            return r.json()
+        raise RuntimeError("unreachable")
+
+    def post_stream(
+        self,
+        url: str,
+        headers: Dict[str, str],
+        payload: Dict[str, Any],
+        attempts: Optional[List[Dict[str, Any]]] = None,
+        control: Optional[QueryControl] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        POSTs `payload` with "stream": true and yields each server-sent event's
+        decoded data as it arrives. Transient failures are retried like
+        post_json, but only until the response starts streaming; streams are
+        not hedged. An error event mid-stream raises RuntimeError.
+        """
+        attempts = attempts if attempts is not None else []
+        payload = {**payload, "stream": True}
+        for retry in range(self.max_retries + 1):
+            last = retry == self.max_retries
+            if control is not None and control.cancelled:
+                raise QueryCancelled("LLM isteği iptal edildi")
+            rec: Dict[str, Any] = {"attempt": retry + 1, "hedge": False, "status": None, "error": None}
+            start = time.perf_counter()
+            try:
+                r = self._await(
+                    self._pool.submit(
+                        self.session.post, url, headers=headers, json=payload, timeout=self.timeout, stream=True
+                    ),
+                    control,
+                )
+                rec["status"] = r.status_code
+            except (requests.ConnectionError, requests.Timeout) as e:
+                rec["error"] = f"{type(e).__name__}: {e}"
+                r, error = None, e
+            # Time to response headers; the body streams afterwards
+            rec["ms"] = round((time.perf_counter() - start) * 1000, 1)
+            attempts.append(rec)
+            if r is None:
+                if last:
+                    raise error
+                self._pause(self._delay(retry, None), control)
+                continue
+            if r.status_code in RETRY_STATUSES and not last:
+                r.close()
+                self._pause(self._delay(retry, r), control)
+                continue
+            abort = partial(_abort, r)
+            if control is not None:
+                # Aborting the response ends the stream mid-read
+                control.on_cancel(abort)
+            try:
+                r.raise_for_status()
+                for event in _sse_events(r):
+                    if control is not None and control.cancelled:
+                        break
+                    yield event
+            except Exception:
+                if control is not None and control.cancelled:
+                    raise QueryCancelled("LLM isteği iptal edildi") from None
+                raise
+            finally:
+                if control is not None:
+                    control.remove_callback(abort)
+                r.close()
+            if control is not None and control.cancelled:
+                raise QueryCancelled("LLM isteği iptal edildi")
+            return
+        raise RuntimeError("unreachable")
+
+
+def _close_response(future: Future) -> None:
+    # A cancelled caller no longer reads this attempt: release its connection
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def _abort(response: requests.Response) -> None:
+    # close() alone does not wake a read blocked on the socket; a shutdown does
+    sock = getattr(getattr(response.raw, "_connection", None), "sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    response.close()
+
+
+def _sse_events(response: requests.Response) -> Iterator[Dict[str, Any]]:
+    """Decoded `data:` payloads of a text/event-stream response, up to [DONE]."""
+    data: List[str] = []
+    response.encoding = "utf-8"  # SSE is always UTF-8, whatever Content-Type says
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line.startswith(":"):
+            # Comment / keep-alive (OpenRouter sends ": OPENROUTER PROCESSING")
+            continue
+        if line.startswith("data:"):
+            data.append(line[5:].lstrip())
+            continue
+        if line or not data:
+            continue
+        # A blank line ends the event
+        text = "\n".join(data)
+        data = []
+        if text == "[DONE]":
+            return
+        event = json.loads(text)
+        if isinstance(event, dict) and event.get("error"):
+            raise RuntimeError(f"LLM stream error: {event['error']}")
+        yield event
+    if data and "\n".join(data) != "[DONE]":
+        yield json.loads("\n".join(data))
+
+
+class RateLimiter:
+    """Token bucket shared by worker threads: at most `rate` calls/s, bursts of `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Blocks until a call is allowed; returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+_transport: Optional[Transport] = None
+_transport_lock = threading.Lock()
+
+
+def base_url() -> str:
+    return os.getenv("OPENROUTER_BASE_URL", DEFAULT_BASE_URL).strip().rstrip("/")
+
+
+def get_transport() -> Transport:
+    """Process-wide transport, configured from env on first use."""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = Transport(
+                max_retries=int(os.getenv("OPENROUTER_MAX_RETRIES", "2")),
+                connect_timeout=_env_float("OPENROUTER_CONNECT_TIMEOUT", 5.0),
+                read_timeout=_env_float("OPENROUTER_TIMEOUT", 60.0),
+                hedge_after=_env_float("OPENROUTER_HEDGE_AFTER", None),
+            )
+        return _transport
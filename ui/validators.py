@@ -1,5 +1,8 @@
 import re
 
+from ui.sql_analysis import analyze
+
+
 def enforce_readonly(sql: str, default_limit: int = 200) -> str:
     s = (sql or "").strip().rstrip(";")
     if not s:
@@ -8,7 +11,21 @@ def enforce_readonly(sql: str, default_limit: int = 200) -> str:
     if not re.match(r"^(select|with)\b", s, flags=re.IGNORECASE):
         raise ValueError("sadece SELECT/WITH sorgularına izin var")
 
-    if re.search(r"\blimit\b", s, flags=re.IGNORECASE) is None:
-        s = f"{s} LIMIT {default_limit}"
+    # Only a single SELECT can be serialized by DuckDB's parser, so this also
+    # rejects DML/DDL and stacked statements.
+    a = analyze(s)
+    if a.error is not None:
+        raise ValueError(f"sadece SELECT/WITH sorgularına izin var ({a.error})")
+    if a.statements != 1:
+        raise ValueError("tek bir sorguya izin var")
+
+    # LIMIT inside a subquery/CTE does not bound the outer result.
+    if not a.outer_limit:
+        if "LIMIT_PERCENT_MODIFIER" in a.outer_modifiers or "LIMIT_MODIFIER" in a.outer_modifiers:
+            # LIMIT n% / OFFSET-only: a second LIMIT clause would not parse
+            s = f"SELECT * FROM (\n{s}\n) LIMIT {default_limit}"
+        else:
+            # newline so a trailing -- comment cannot swallow the LIMIT
+            s = f"{s}\nLIMIT {default_limit}"
 
     return s + ";"
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from ui.graph_client import warm_llm_cache
+from ui.query_log import QUERY_LOG, QueryLog
+
+# Most frequent questions / queries of the last WARMUP_DAYS replayed at startup (0 disables)
+DEFAULT_TOP = int(os.getenv("WARMUP_QUERIES", "20"))
+DEFAULT_DAYS = float(os.getenv("WARMUP_DAYS", "7"))
+# Results larger than this (rows, as logged) are not worth a slot in the result cache
+DEFAULT_MAX_ROWS = int(os.getenv("WARMUP_MAX_ROWS", "100000"))
+
+
+def warm_caches(
+    db,
+    log: Optional[QueryLog] = QUERY_LOG,
+    top: int = DEFAULT_TOP,
+    days: float = DEFAULT_DAYS,
+    max_rows: int = DEFAULT_MAX_ROWS,
+    status: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Pre-warms the caches from the query log: the `top` most asked LLM
+    questions go back into the LLM cache (see warm_llm_cache), and the `top`
+    most executed queries are run once through db.query (a SnapshotManager)
+    so their results sit in the result cache for the current snapshot.
+    Queries run without a role, so they queue behind every user's query.
+    Progress is kept in `status`.
+    """
+    status = status if status is not None else {}
+    status.update({"state": "running", "llm_added": 0, "queries": 0, "failed": 0})
+    if log is None or top <= 0:
+        status["state"] = "off"
+        return status
+    start = time.perf_counter()
+    try:
+        # The two caches are warmed independently: one failing leaves the other useful
+        try:
+            status["llm_added"] = warm_llm_cache(log.frequent_answers(top, days))
+        except Exception as e:
+            status["llm_error"] = str(e)
+        for sql in log.frequent_sql(top, days, max_rows):
+            try:
+                db.query(sql)
+                status["queries"] += 1
+            except Exception as e:
+                status["failed"] += 1
+                status["last_error"] = str(e)
+        status["state"] = "done"
+    except Exception as e:
+        status.update({"state": "failed", "error": str(e)})
+    status["ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return status
+
+
+def start_warmup(db, **kwargs) -> Dict[str, Any]:
+    """Runs warm_caches on a daemon thread; returns its (live) status dict."""
+    status: Dict[str, Any] = {"state": "queued"}
+    threading.Thread(
+        target=warm_caches, args=(db,), kwargs={**kwargs, "status": status}, name="cache-warmup", daemon=True
+    ).start()
+    return status